@@ -0,0 +1,19 @@
+from django.urls import path
+
+from . import urls
+from .views import AsyncFeedView, AsyncPostDetailView, AsyncPostListView
+
+app_name = 'blog'
+
+# The pages served as async views under ASGI, by URL name. The others are the same as in blog.urls.
+ASYNC_VIEWS = {
+    'posts': AsyncPostListView,
+    'post-detail': AsyncPostDetailView,
+    'feed': AsyncFeedView,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name].as_view(), name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in urls.urlpatterns
+]
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.utils.decorators import classonlymethod
+
+
+@lru_cache(maxsize=None)
+def view_executor():
+    return ThreadPoolExecutor(settings.ASYNC_VIEW_THREADS, thread_name_prefix='async-view')
+
+
+def in_pool(func):
+    """
+    ``func`` as a coroutine function running in the ASYNC_VIEW_THREADS pool.
+    The connections it opens there are closed as the end of a request would.
+    """
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False, executor=view_executor())
+
+
+def render_view(view, request, *args, **kwargs):
+    """Run the sync ``view`` to a rendered response."""
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return response
+
+
+class AsyncViewMixin:
+    """
+    Serve a class-based view as a coroutine.
+
+    Under ASGI, Django runs every sync view in one shared thread, so a slow
+    page holds up all the others. This view runs in a pool of
+    ASYNC_VIEW_THREADS threads instead, ORM queries, rendering and side
+    effects included, and the event loop goes on serving other requests.
+    Only ASGI_URLCONF mounts these views: under WSGI the sync view is
+    served, as there is no event loop to free.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super(AsyncViewMixin, cls).as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await in_pool(render_view)(view, request, *args, **kwargs)
+
+        update_wrapper(async_view, view)
+        return async_view
+
+
+class AsyncViewsHandler(ASGIHandler):
+    """The ASGI handler, resolving requests with ASGI_URLCONF, where some pages are async views."""
+
+    async def get_response_async(self, request):
+        request.urlconf = settings.ASGI_URLCONF
+        return await super(AsyncViewsHandler, self).get_response_async(request)
@@ -0,0 +1,189 @@
+import hashlib
+import time
+from functools import wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+PREFIX = 'blog:cache'
+
+
+def get_cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def version_key(name):
+    return f'{PREFIX}:version:{name}'
+
+
+def versions(*names):
+    """
+    The current version of each of ``names``, joined into one string to build
+    cache keys from. Bumping any of the versions retires every key built
+    with it.
+    """
+    cache = get_cache()
+    keys = [version_key(name) for name in names]
+    found = cache.get_many(keys)
+    tokens = []
+    for key in keys:
+        token = found.get(key)
+        if token is None:
+            token = uuid4().hex
+            # Evicted or never set: another request may be setting it right now.
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+        tokens.append(token)
+    return '.'.join(tokens)
+
+
+def bump(*names):
+    get_cache().set_many({version_key(name): uuid4().hex for name in names}, None)
+
+
+def post_versions(post_id):
+    return [f'post:{post_id}']
+
+
+def list_versions(blog_id=None):
+    return ['posts'] if blog_id is None else [f'blog:{blog_id}']
+
+
+def feed_versions(user_id):
+    return [f'feed:{user_id}']
+
+
+def invalidate_post(post):
+    """
+    Once the current transaction commits, retire the cached pages showing
+    ``post``: its detail page, its blog's list and the list of all posts.
+    """
+    names = post_versions(post.pk) + list_versions(post.blog_id) + list_versions()
+    transaction.on_commit(lambda: bump(*names))
+
+
+def versioned_key(name, names):
+    return f'{PREFIX}:{name}:{versions(*names)}'
+
+
+def count(name):
+    cache = get_cache()
+    key = f'{PREFIX}:stats:{name}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.set(key, 1, None)
+
+
+def stats():
+    cache = get_cache()
+    keys = {name: f'{PREFIX}:stats:{name}' for name in ('hits', 'misses')}
+    found = cache.get_many(keys.values())
+    return {name: found.get(key, 0) for name, key in keys.items()}
+
+
+def get_or_set(key, render, timeout, cacheable=lambda value: True):
+    """
+    Return the value cached under ``key``, or ``render`` and cache it. Only one
+    process renders a missing value at a time; the others wait up to
+    PAGE_CACHE_LOCK_TIMEOUT seconds for its result instead of hitting the
+    database as well.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        count('hits')
+        return value
+    count('misses')
+
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+        try:
+            value = render()
+            if cacheable(value):
+                cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock)
+
+    value = wait_for(key, lock)
+    return render() if value is None else value
+
+
+def get_or_stream(key, stream, timeout):
+    """
+    Like get_or_set() for a string produced in chunks by ``stream()``: on a
+    miss the chunks are passed on as they are produced, and the whole string
+    is cached once the last one is. Nothing is read and no lock is taken
+    until the first chunk is asked for, so a response that is never sent
+    holds up nobody.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        count('hits')
+        yield value
+        return
+    count('misses')
+
+    lock = f'{key}:lock'
+    if not cache.add(lock, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+        value = wait_for(key, lock)
+        if value is None:
+            yield from stream()
+        else:
+            yield value
+        return
+
+    chunks = []
+    try:
+        for chunk in stream():
+            chunks.append(chunk)
+            yield chunk
+        cache.set(key, ''.join(chunks), timeout)
+    finally:
+        cache.delete(lock)
+
+
+def wait_for(key, lock):
+    """Wait for the process holding ``lock`` to cache ``key``; None if it gave up or timed out."""
+    cache = get_cache()
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock) is None:
+            return None
+    return None
+
+
+def cache_response(versions_for):
+    """
+    Cache the successful responses of a view to anonymous GET requests.
+    ``versions_for(request, **kwargs)`` names the versions the response
+    depends on, see ``invalidate_post``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f'{PREFIX}:page:{path}:{versions(*versions_for(request, **kwargs))}'
+
+            def render():
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+                return response
+
+            return get_or_set(key, render, settings.PAGE_CACHE_TIMEOUT,
+                              cacheable=lambda response: response.status_code == 200)
+        return wrapper
+    return decorator
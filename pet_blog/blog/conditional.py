@@ -0,0 +1,41 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import counters
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def viewer(request):
+    """What a page shows about the user looking at it: who they are and their unread count."""
+    user = request.user
+    if not user.is_authenticated:
+        return ['anonymous']
+    return [user.pk, counters.unread_count(user)]
+
+
+def conditional(etag_func):
+    """
+    Answer GET requests with 304 Not Modified when the ETag computed by
+    ``etag_func`` matches the client's. The responses
+    vary with the logged in user, are revalidated on every use, and only the
+    browser may keep the pages of a logged in user.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_vary_headers(response, ['Cookie'])
+            patch_cache_control(response, no_cache=True)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,9 @@
+from . import counters
+
+
+def unread_count(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    # Evaluated by the template only where the count is shown.
+    return {'unread_count': lambda: counters.unread_count(user)}
@@ -0,0 +1,131 @@
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache import bump, feed_versions
+from .models import Blog, Feed, Post, Subscription, UnreadCounter
+from .shards import by_shard
+from .timeline import UNREAD, pulled_count, unread_feeds
+
+
+def cache_key(user_id):
+    return f'blog:unread:{user_id}'
+
+
+def unread_count(user):
+    """
+    Unread entries in ``user``'s feed. The counter only covers fanned out Feed
+    rows; posts of fan-out-on-read blogs are counted on a cache miss, so they
+    show up within UNREAD_COUNT_TIMEOUT seconds.
+    """
+    key = cache_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        counter = UnreadCounter.objects.filter(user=user).values_list('unread', flat=True).first()
+        if counter is None:
+            counter = refresh(user, cached=False)
+        count = counter + pulled_count(user)
+        cache.set(key, count, settings.UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def refresh(user, cached=True):
+    """
+    Recount ``user``'s unread Feed rows and write the result through to the
+    cache, which also retires the user's feed version.
+    """
+    unread = unread_feeds(user).count()
+    UnreadCounter.objects.update_or_create(user=user, defaults={'unread': unread})
+    if cached:
+        cache.set(cache_key(user.pk), unread + pulled_count(user), settings.UNREAD_COUNT_TIMEOUT)
+        transaction.on_commit(lambda: bump(*feed_versions(user.pk)))
+    return unread
+
+
+def adjust(user_ids, delta):
+    """Add ``delta`` to the counters of ``user_ids``, a list or a values queryset."""
+    if delta:
+        UnreadCounter.objects.filter(user__in=user_ids).update(unread=F('unread') + delta)
+        invalidate(user_ids)
+
+
+def invalidate(user_ids):
+    """
+    Drop the cached counts of ``user_ids`` and retire their feed versions once
+    the current transaction commits.
+    """
+    def expire():
+        ids = iter(user_ids.iterator() if hasattr(user_ids, 'iterator') else user_ids)
+        while True:
+            batch = list(islice(ids, 1000))
+            if not batch:
+                break
+            cache.delete_many([cache_key(user_id) for user_id in batch])
+            bump(*[name for user_id in batch for name in feed_versions(user_id)])
+    transaction.on_commit(expire)
+
+
+def recount(user_ids):
+    """Recount the counters of ``user_ids``, a list, and return how many were off."""
+    repaired = 0
+    for alias, ids in by_shard(user_ids).items():
+        if alias == DEFAULT_DB_ALIAS:
+            exact = Coalesce(Subquery(
+                Feed.objects.filter(UNREAD, user=OuterRef('user')).values('user').annotate(
+                    unread=Count('pk')).values('unread')), Value(0))
+            repaired += UnreadCounter.objects.filter(user__in=ids).exclude(unread=exact).update(unread=exact)
+            continue
+        # Feeds on other shards are counted one user at a time.
+        for user in get_user_model().objects.filter(pk__in=ids):
+            exact = unread_feeds(user).count()
+            repaired += UnreadCounter.objects.filter(user=user).exclude(unread=exact).update(unread=exact)
+    invalidate(user_ids)
+    return repaired
+
+
+def reconcile(batch_size=1000):
+    """Recount every counter, ``batch_size`` users at a time, and return how many were off."""
+    repaired = 0
+    last = 0
+    while True:
+        ids = list(UnreadCounter.objects.filter(user__gt=last).order_by('user').values_list(
+            'user', flat=True)[:batch_size])
+        if not ids:
+            return repaired
+        with transaction.atomic():
+            repaired += recount(ids)
+        last = ids[-1]
+
+
+def adjust_subscribers(blog_ids, delta):
+    """Add ``delta`` to the subscriber counts of ``blog_ids``, a list or a values queryset."""
+    if delta:
+        Blog.objects.filter(pk__in=blog_ids).update(subscriber_count=F('subscriber_count') + delta)
+
+
+def count_per_blog(queryset):
+    return Coalesce(Subquery(queryset.filter(blog=OuterRef('pk')).values('blog').annotate(
+        count=Count('pk')).values('count')), Value(0))
+
+
+def reconcile_blogs(batch_size=1000):
+    """
+    Recount the subscribers and posts of every blog, ``batch_size`` blogs at
+    a time, and return how many were off.
+    """
+    subscribers = count_per_blog(Subscription.objects.filter(is_deleted=False))
+    posts = count_per_blog(Post.objects.all())
+    repaired = 0
+    last = 0
+    while True:
+        ids = list(Blog.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return repaired
+        repaired += Blog.objects.filter(pk__in=ids).exclude(subscriber_count=subscribers, post_count=posts).update(
+            subscriber_count=subscribers, post_count=posts)
+        last = ids[-1]
@@ -0,0 +1,26 @@
+from operator import attrgetter
+
+from .pagination import KeysetPage, keyset
+
+# Orders of the blog directory: the (position, pk) fields it is sorted by, largest first.
+ORDERS = {
+    'subscribers': ('subscriber_count', 'id'),
+    'posts': ('post_count', 'id'),
+}
+
+
+def author_prefix(blogs, prefix):
+    """
+    The blogs whose author's username starts with ``prefix``. A range over
+    the username instead of LIKE, so the unique index on it is used.
+    """
+    return blogs.filter(author__username__gte=prefix, author__username__lt=prefix + '\U0010ffff')
+
+
+def directory_page(blogs, page_size, order, prefix='', cursor=None, newer=False):
+    """A page of ``blogs`` sorted by ``order``, after ``cursor``, of the authors whose name starts with ``prefix``."""
+    fields = ORDERS[order]
+    if prefix:
+        blogs = author_prefix(blogs, prefix)
+    rows = list(keyset(blogs, fields, cursor, newer)[:page_size + 1])
+    return KeysetPage(rows, page_size, attrgetter(*fields), cursor, newer)
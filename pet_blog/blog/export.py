@@ -0,0 +1,103 @@
+import csv
+import zlib
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import Feed, Post, Subscription
+from .shards import is_local
+
+CHUNK_SIZE = 2000
+
+
+def posts(user):
+    return Post.objects.filter(blog__author=user).values('id', 'title', 'content', 'posted')
+
+
+def feed(user):
+    return Feed.objects.filter(user=user).values(
+        'post_id', 'posted', 'is_read', title=F('post__title'), author=F('blog__author__username'))
+
+
+def subscriptions(user):
+    return Subscription.objects.filter(user=user, is_deleted=False).values(
+        'id', 'blog_id', 'read_until', author=F('blog__author__username'))
+
+
+SECTIONS = {
+    'posts': posts,
+    'feed': feed,
+    'subscriptions': subscriptions,
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def sharded_feed(user):
+    """
+    The feed section of a user whose feed is on a remote shard, which can't
+    join the posts: their titles and authors are read per chunk.
+    """
+    feeds = user.feed_set.values('post_id', 'posted', 'is_read').order_by('pk').iterator(chunk_size=CHUNK_SIZE)
+    while chunk := list(islice(feeds, CHUNK_SIZE)):
+        posts = Post.objects.filter(pk__in=[row['post_id'] for row in chunk]).values_list(
+            'pk', 'title', 'blog__author__username')
+        names = {pk: (title, author) for pk, title, author in posts}
+        for row in chunk:
+            title, author = names.get(row['post_id'], (None, None))
+            yield {**row, 'title': title, 'author': author}
+
+
+def rows(user, section):
+    """The rows of ``section`` of ``user``'s data, read from the database CHUNK_SIZE at a time."""
+    if section == 'feed' and not is_local(user.pk):
+        return sharded_feed(user)
+    return SECTIONS[section](user).order_by('pk').iterator(chunk_size=CHUNK_SIZE)
+
+
+def ndjson(user, sections):
+    """One JSON object per line for every row of ``sections``, each tagged with its section."""
+    encoder = DjangoJSONEncoder()
+    for section in sections:
+        for row in rows(user, section):
+            yield encoder.encode({'type': section, **row}) + '\n'
+
+
+class Line:
+    # csv.writer writes to a file; this one hands the line back instead.
+    def write(self, value):
+        return value
+
+
+def csv_rows(user, section):
+    """The rows of ``section`` as CSV lines, after a header line."""
+    query = SECTIONS[section](user).query
+    writer = csv.writer(Line())
+    yield writer.writerow([*query.values_select, *query.annotation_select])
+    for row in rows(user, section):
+        yield writer.writerow(row.values())
+
+
+def export(user, kind, sections):
+    """
+    ``user``'s data as a stream of ``kind`` ('ndjson' or 'csv') chunks. A CSV
+    export holds a single section.
+    """
+    if kind == 'csv':
+        section, = sections
+        return csv_rows(user, section)
+    return ndjson(user, sections)
+
+
+def gzipped(chunks):
+    """Compress the text ``chunks`` into gzip chunks as they come."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,167 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import F, Value
+from django.utils import timezone
+
+from . import counters
+from .hub import notify
+from .messaging import publish
+from .models import Blog, Feed, Post, Subscription
+from .pagination import keyset
+from .shards import feed_db, split_by_shard
+
+
+def insert_select(model, queryset, using=None, **columns):
+    """
+    Copy the rows selected by ``queryset`` into ``model`` with a single
+    ``INSERT ... SELECT`` statement, skipping rows that would violate a unique
+    constraint. ``columns`` maps the model's field names to the expressions
+    selecting their values. Returns the number of inserted rows.
+
+    When ``using`` is another database than the one ``queryset`` reads, such
+    as a Feed shard, the rows are read and inserted in batches instead.
+    """
+    using = using or router.db_for_write(model)
+    aliases = {'_%s' % name: expression for name, expression in columns.items()}
+    select = queryset.annotate(**aliases).values(*aliases)
+    if using != DEFAULT_DB_ALIAS and select.db != using:
+        return copy_rows(model, select, using, columns)
+
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    select_sql, params = select.query.get_compiler(using=using).as_sql()
+
+    sql = '%s %s (%s) %s %s' % (
+        connection.ops.insert_statement(ignore_conflicts=True),
+        quote_name(model._meta.db_table),
+        ', '.join(quote_name(model._meta.get_field(name).column) for name in columns),
+        select_sql,
+        connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def copy_rows(model, select, using, columns, batch_size=1000):
+    """The cross-database fallback of insert_select(): returns the number of rows copied."""
+    attnames = {'_%s' % name: model._meta.get_field(name).attname for name in columns}
+    rows = select.iterator(chunk_size=batch_size)
+    copied = 0
+    while True:
+        batch = [model(**{attnames[key]: value for key, value in row.items()}) for row in islice(rows, batch_size)]
+        if not batch:
+            return copied
+        model.objects.using(using).bulk_create(batch, ignore_conflicts=True)
+        copied += len(batch)
+
+
+def fan_out_on_read(blog):
+    """
+    Switch ``blog`` to fan-out on read once it has more than
+    FEED_FANOUT_THRESHOLD subscribers. The switch is permanent, so posts never
+    drop out of the feeds that already merge them in.
+    """
+    if not blog.fan_out_on_read:
+        subscribers = Subscription.objects.filter(blog_id=blog.pk, is_deleted=False).count()
+        if subscribers > settings.FEED_FANOUT_THRESHOLD:
+            Blog.objects.filter(pk=blog.pk).update(fan_out_on_read=True)
+            blog.fan_out_on_read = True
+    return blog.fan_out_on_read
+
+
+def fan_out_post(post):
+    """Add ``post`` to the feed of every subscriber of its blog."""
+    if fan_out_on_read(post.blog):
+        return 0
+    created = 0
+    with transaction.atomic():
+        for alias, subscriptions in split_by_shard(
+                Subscription.objects.filter(blog_id=post.blog_id, is_deleted=False)):
+            # The subscribers a backfill already copied the post to are skipped by the insert, and
+            # must not be counted twice.
+            copied = list(Feed.objects.using(alias).filter(post_id=post.pk)
+                          .values_list('subscription_id', flat=True))
+            inserted = insert_select(
+                Feed, subscriptions, using=alias,
+                user=F('user_id'),
+                post=Value(post.pk),
+                subscription=F('pk'),
+                blog=Value(post.blog_id),
+                posted=Value(post.posted),
+                is_read=Value(False),
+            )
+            if inserted:
+                users = subscriptions.exclude(pk__in=copied).values_list('user_id', flat=True)
+                counters.adjust(users, 1)
+                notify(users)
+            created += inserted
+    return created
+
+
+def backfill_subscription(subscription, limit, cursor=None, since=None):
+    """
+    Copy the newest ``limit`` posts of the subscribed blog that are older than
+    ``cursor`` and not older than ``since`` into the subscriber's feed, with a
+    single INSERT ... SELECT. Returns the number of rows created and the
+    (posted, id) position of the batch's last post, or None if the batch
+    wasn't full and there is nothing older to copy.
+    """
+    posts = keyset(Post.objects.filter(blog_id=subscription.blog_id), ('posted', 'id'), cursor)
+    if since is not None:
+        posts = posts.filter(posted__gte=since)
+    batch = posts[:limit]
+    with transaction.atomic():
+        created = insert_select(
+            Feed, Post.objects.filter(pk__in=batch.values('pk')), using=feed_db(subscription.user_id),
+            user=Value(subscription.user_id),
+            post=F('pk'),
+            subscription=Value(subscription.pk),
+            blog=F('blog_id'),
+            posted=F('posted'),
+            is_read=Value(False),
+        )
+        counters.adjust([subscription.user_id], created)
+        if created:
+            notify([subscription.user_id])
+    last = list(batch.values_list('posted', 'pk')[limit - 1:limit])
+    return created, last[0] if last else None
+
+
+def backfill_feed(subscription):
+    """
+    Copy the recent history of a newly subscribed blog into the subscriber's
+    feed: up to FEED_BACKFILL_POSTS posts of the last FEED_BACKFILL_DAYS days.
+    With FEED_BACKFILL_ASYNC set, the worker then copies the whole history in
+    batches of FEED_BACKFILL_BATCH_SIZE. A fan-out-on-read blog isn't copied,
+    the older history is marked as read with the subscription's read_until.
+    """
+    since = None
+    if settings.FEED_BACKFILL_DAYS:
+        since = timezone.now() - timedelta(days=settings.FEED_BACKFILL_DAYS)
+    if subscription.blog.fan_out_on_read:
+        if not settings.FEED_BACKFILL_ASYNC:
+            backfill_watermark(subscription, since)
+        return 0
+    created, _ = backfill_subscription(subscription, settings.FEED_BACKFILL_POSTS, since=since)
+    if settings.FEED_BACKFILL_ASYNC:
+        publish('subscription_backfill', {'subscription_id': subscription.pk})
+    return created
+
+
+def backfill_watermark(subscription, since=None):
+    """
+    Move the read_until of ``subscription`` up to the newest post older than
+    the latest FEED_BACKFILL_POSTS posts of its blog, or to ``since`` if that
+    is later. The watermark never moves back.
+    """
+    posts = Post.objects.filter(blog_id=subscription.blog_id).order_by('-posted', '-id')
+    limit = settings.FEED_BACKFILL_POSTS
+    watermarks = list(posts.values_list('posted', flat=True)[limit:limit + 1])
+    watermarks += [value for value in (since, subscription.read_until) if value is not None]
+    if watermarks and max(watermarks) != subscription.read_until:
+        subscription.read_until = max(watermarks)
+        Subscription.objects.filter(pk=subscription.pk).update(read_until=subscription.read_until)
@@ -1,7 +1,11 @@
 from django import forms
+from django.conf import settings
+from django.utils.functional import cached_property
 
-from .models import Post, Blog
-from .widgets import FeedWidget
+from .models import Post, Blog, Feed, NotificationPreference
+from .directory import directory_page
+from .timeline import feed_page, pulled_posts, unread_feeds
+from .widgets import BlogWidget, FeedWidget, PostWidget
 
 
 class PostForm(forms.ModelForm):
@@ -18,22 +22,53 @@ class PostForm(forms.ModelForm):
         }
 
 
+class NotificationPreferenceForm(forms.ModelForm):
+    class Meta:
+        model = NotificationPreference
+        fields = ('delivery',)
+        labels = {
+            'delivery': 'Email me about new posts',
+        }
+        widgets = {
+            'delivery': forms.Select(attrs={'class': 'form-select'}),
+        }
+
+
 class SubscriptionForm(forms.Form):
-    def __init__(self, user, *args, **kwargs):
+    def __init__(self, user, *args, cursor=None, newer=False, order='subscribers', author='', page_size=None,
+                 **kwargs):
         super(SubscriptionForm, self).__init__(*args, **kwargs)
+        self.cursor = cursor
+        self.newer = newer
+        self.order = order
+        self.author = author
+        self.page_size = page_size or settings.BLOGS_PAGE_SIZE
+        # The queryset validates the submitted blogs only. The directory
+        # renders one page of it.
         self.fields['blogs'].queryset = Blog.objects.exclude(author=user).exclude(
-            author__in=user.subscription_set.all().values('blog__author'))
+            pk__in=user.subscription_set.filter(is_deleted=False).values('blog')).select_related(
+            'author').only('fan_out_on_read', 'subscriber_count', 'post_count', 'author__username')
+        self.fields['blogs'].widget.choices = []
 
     blogs = forms.ModelMultipleChoiceField(
-        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+        widget=BlogWidget(attrs={'class': 'form-check-input'}),
         queryset=None
     )
 
+    @cached_property
+    def page(self):
+        field = self.fields['blogs']
+        page = directory_page(field.queryset, self.page_size, self.order, self.author, self.cursor, self.newer)
+        iterator = field.iterator(field)
+        field.widget.choices = [iterator.choice(blog) for blog in page]
+        return page
+
 
 class UnSubscriptionForm(forms.Form):
     def __init__(self, user, *args, **kwargs):
         super(UnSubscriptionForm, self).__init__(*args, **kwargs)
-        self.fields['subscriptions'].queryset = user.subscription_set.all()
+        self.fields['subscriptions'].queryset = user.subscription_set.filter(is_deleted=False).select_related(
+            'blog__author').only('user', 'blog__author__username')
 
     subscriptions = forms.ModelMultipleChoiceField(
         widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
@@ -42,11 +77,46 @@ class UnSubscriptionForm(forms.Form):
 
 
 class FeedForm(forms.Form):
-    def __init__(self, user, *args, **kwargs):
+    def __init__(self, user, *args, cursor=None, newer=False, page_size=None, **kwargs):
         super(FeedForm, self).__init__(*args, **kwargs)
-        self.fields['feeds'].queryset = user.feed_set.filter(is_read=False)
+        self.user = user
+        self.cursor = cursor
+        self.newer = newer
+        self.page_size = page_size or settings.FEED_PAGE_SIZE
+        # The querysets validate the submitted entries, wherever they are in
+        # the feed. Only the current page is rendered.
+        self.fields['feeds'].queryset = unread_feeds(user)
+        self.fields['posts'].queryset = pulled_posts(user)
+        self.fields['feeds'].widget.choices = self.fields['posts'].widget.choices = []
 
     feeds = forms.ModelMultipleChoiceField(
         widget=FeedWidget(attrs={'class': 'form-check-input'}),
-        queryset=None
+        queryset=None,
+        required=False
     )
+    posts = forms.ModelMultipleChoiceField(
+        widget=PostWidget(attrs={'class': 'form-check-input'}),
+        queryset=None,
+        required=False
+    )
+
+    def clean(self):
+        cleaned_data = super(FeedForm, self).clean()
+        if not cleaned_data.get('feeds') and not cleaned_data.get('posts') and not self.has_error('feeds'):
+            self.add_error('feeds', self.fields['feeds'].error_messages['required'])
+        return cleaned_data
+
+    @cached_property
+    def page(self):
+        page = feed_page(self.user, self.page_size, self.cursor, self.newer)
+        for name, model in (('feeds', Feed), ('posts', Post)):
+            field = self.fields[name]
+            iterator = field.iterator(field)
+            field.widget.choices = [iterator.choice(entry) for entry in page if isinstance(entry, model)]
+        return page
+
+    def entries(self):
+        """Checkboxes of the current page: fanned out feed entries and pulled posts, newest first."""
+        page = self.page
+        checkboxes = {Feed: iter(self['feeds']), Post: iter(self['posts'])}
+        return [next(checkboxes[type(entry)]) for entry in page]
@@ -0,0 +1,29 @@
+from django.conf import settings
+
+from .fanout import backfill_subscription, fan_out_post
+from .messaging import consumer, publish
+from .models import Post, Subscription
+from .notifications import NotificationDispatcher, new_post_messages, queue_digest_notifications
+from .pagination import decode_cursor, encode_cursor
+
+
+@consumer('post_published')
+def deliver_post(payload):
+    post = Post.objects.select_related('blog').filter(pk=payload['post_id']).first()
+    if post is None:
+        return
+    fan_out_post(post)
+    queue_digest_notifications(post)
+    NotificationDispatcher().send(new_post_messages(post))
+
+
+@consumer('subscription_backfill')
+def backfill_history(payload):
+    """Copy one batch of a subscribed blog's history, then queue the next one."""
+    subscription = Subscription.objects.filter(pk=payload['subscription_id'], is_deleted=False).first()
+    if subscription is None:
+        return
+    cursor = decode_cursor(payload.get('cursor'))
+    _, last = backfill_subscription(subscription, settings.FEED_BACKFILL_BATCH_SIZE, cursor)
+    if last is not None:
+        publish('subscription_backfill', {'subscription_id': subscription.pk, 'cursor': encode_cursor(*last)})
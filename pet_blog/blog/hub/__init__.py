@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+@lru_cache(maxsize=None)
+def get_hub():
+    return import_string(settings.FEED_HUB)()
+
+
+def notify(user_ids):
+    """
+    Wake the feed streams of ``user_ids``, a list or a values queryset, once
+    the current transaction commits and their new Feed rows can be read.
+    """
+    transaction.on_commit(lambda: get_hub().publish(user_ids))
@@ -0,0 +1,22 @@
+class BaseHub:
+    """
+    Tells the feed streams (see blog.stream) of a user that their feed has
+    new entries. The signal carries nothing else: a stream reads the entries
+    itself, from the id of the last one it sent.
+    """
+
+    def subscribe(self, user_id):
+        """An asyncio.Queue that gets an item when ``user_id`` has new entries."""
+        raise NotImplementedError('subclasses of BaseHub must provide a subscribe() method')
+
+    def unsubscribe(self, user_id, queue):
+        raise NotImplementedError('subclasses of BaseHub must provide an unsubscribe() method')
+
+    def publish(self, user_ids):
+        raise NotImplementedError('subclasses of BaseHub must provide a publish() method')
+
+
+def wake(queue):
+    # Signals not read yet are merged into one.
+    if queue.empty():
+        queue.put_nowait(None)
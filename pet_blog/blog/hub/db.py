@@ -0,0 +1,63 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max
+
+from ..asyncviews import in_pool
+from ..models import Feed
+from .local import LocalHub
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseHub(LocalHub):
+    """
+    Cross-process hub: while its process has streams, it polls the Feed
+    tables every FEED_HUB_POLL_SECONDS for rows added by any process, such
+    as the run_worker command, and wakes the streams of their users.
+    """
+
+    def __init__(self, interval=None, batch_size=5000):
+        super(DatabaseHub, self).__init__()
+        self.interval = interval if interval is not None else settings.FEED_HUB_POLL_SECONDS
+        self.batch_size = batch_size
+        self.poller = None
+
+    def subscribe(self, user_id):
+        queue = super(DatabaseHub, self).subscribe(user_id)
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.get_running_loop().create_task(self.poll())
+        return queue
+
+    async def poll(self):
+        cursors = await in_pool(self.latest)()
+        while self.listeners:
+            await asyncio.sleep(self.interval)
+            try:
+                user_ids = await in_pool(self.new_entries)(cursors)
+            except DatabaseError as e:
+                logger.warning(f"Unable to poll the feeds: {e}")
+                continue
+            self.publish(user_ids)
+
+    @staticmethod
+    def latest():
+        return {alias: Feed.objects.using(alias).aggregate(latest=Max('pk'))['latest'] or 0
+                for alias in settings.FEED_SHARDS}
+
+    def new_entries(self, cursors):
+        """The users of the unread Feed rows added after ``cursors``, which move past them."""
+        user_ids = set()
+        for alias, cursor in cursors.items():
+            while True:
+                rows = list(Feed.objects.using(alias).filter(pk__gt=cursor).order_by('pk').values_list(
+                    'pk', 'user_id', 'is_read')[:self.batch_size])
+                if rows:
+                    cursor = cursors[alias] = rows[-1][0]
+                    # Rows marking pulled posts as read have nothing to show.
+                    user_ids.update(user_id for _, user_id, is_read in rows if not is_read)
+                if len(rows) < self.batch_size:
+                    break
+        return user_ids
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from .base import BaseHub, wake
+
+
+class LocalHub(BaseHub):
+    """
+    In-process hub: only the entries fanned out by this process, such as
+    with the ThreadPoolBroker, reach its streams. publish() may be called
+    from any thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listeners = defaultdict(set)
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=1)
+        with self.lock:
+            self.listeners[user_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self.lock:
+            listeners = self.listeners[user_id]
+            listeners.difference_update([listener for listener in listeners if listener[1] is queue])
+            if not listeners:
+                del self.listeners[user_id]
+
+    def publish(self, user_ids):
+        if not self.listeners:
+            # Nobody listens in this process, such as in the worker: don't read user_ids.
+            return
+        for user_id in user_ids:
+            with self.lock:
+                listeners = list(self.listeners.get(user_id, ()))
+            for loop, queue in listeners:
+                loop.call_soon_threadsafe(wake, queue)
@@ -0,0 +1,146 @@
+import csv
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters
+from .cache import bump, list_versions
+from .fanout import insert_select
+from .models import Blog, Feed, Post, Subscription
+from .shards import split_by_shard
+
+FORMATS = ('json', 'ndjson', 'csv')
+
+
+def json_items(file, chunk_size=1 << 16):
+    """The items of the JSON array in ``file``, decoded one at a time as the file is read."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Expected a JSON array of posts')
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().removeprefix(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # The item goes on in the next chunk.
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def read_rows(file, kind):
+    """The rows of a JSON array, NDJSON or CSV ``file``, as dicts."""
+    if kind == 'json':
+        return json_items(file)
+    if kind == 'csv':
+        return csv.DictReader(file)
+    return (json.loads(line) for line in file if line.strip())
+
+
+def to_posts(blog, rows):
+    for number, row in enumerate(rows, 1):
+        # Exports hold other rows too; only the posts are imported.
+        if row.get('type', 'posts') == 'posts':
+            yield to_post(blog, row, number)
+
+
+def to_post(blog, row, number):
+    title, content, posted = row.get('title'), row.get('content') or '', row.get('posted')
+    if not title or len(title) > Post._meta.get_field('title').max_length:
+        raise ValueError(f'Row {number}: the title is missing or too long')
+    if posted:
+        posted = parse_datetime(posted)
+        if posted is None:
+            raise ValueError(f'Row {number}: invalid posted time')
+        if timezone.is_naive(posted):
+            posted = timezone.make_aware(posted)
+    return Post(blog=blog, title=title, content=content, posted=posted or timezone.now())
+
+
+@contextmanager
+def keep_posted():
+    """
+    Let bulk_create() store the posts' own ``posted`` time instead of the
+    current one. Only meant for commands: the field is shared by the process.
+    """
+    field = Post._meta.get_field('posted')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def fan_out_imported(blog, first_id, last_id, batch_size):
+    """
+    Add the imported posts ``first_id``..``last_id`` of ``blog`` to its
+    subscribers' feeds with one INSERT ... SELECT per ``batch_size`` posts,
+    then recount their unread counters once.
+    """
+    created = 0
+    if not blog.fan_out_on_read:
+        for start in range(first_id, last_id + 1, batch_size):
+            with transaction.atomic():
+                # One filter() call, so every post is paired with each live subscription once.
+                posts = Post.objects.filter(blog=blog, pk__gte=start, pk__lte=min(start + batch_size - 1, last_id),
+                                            blog__subscription__is_deleted=False)
+                for alias, shard_posts in split_by_shard(posts, 'blog__subscription__user_id'):
+                    created += insert_select(
+                        Feed, shard_posts, using=alias,
+                        user=F('blog__subscription__user_id'),
+                        post=F('pk'),
+                        subscription=F('blog__subscription__id'),
+                        blog=F('blog_id'),
+                        posted=F('posted'),
+                        is_read=Value(False),
+                    )
+    subscribers = Subscription.objects.filter(blog=blog, is_deleted=False).values_list('user_id', flat=True)
+    users = subscribers.iterator(chunk_size=1000)
+    while batch := list(islice(users, 1000)):
+        with transaction.atomic():
+            counters.recount(batch)
+    return created
+
+
+def import_posts(blog, rows, batch_size=1000, progress=None):
+    """
+    Insert the posts of ``rows`` into ``blog`` with bulk_create(), committing
+    every ``batch_size`` posts, then fan them out at once. Unlike Post.save()
+    it publishes no 'post_published' message, so no one is notified.
+    Returns the number of imported posts and of created Feed rows.
+    """
+    posts = to_posts(blog, rows)
+    imported, first_id, last_id = 0, None, None
+    try:
+        with keep_posted():
+            while batch := list(islice(posts, batch_size)):
+                with transaction.atomic():
+                    batch = Post.objects.bulk_create(batch)
+                ids = [post.pk for post in batch]
+                first_id = min(ids) if first_id is None else first_id
+                last_id = max(ids)
+                imported += len(batch)
+                if progress:
+                    progress(imported)
+    finally:
+        created = 0
+        if imported:
+            Blog.objects.filter(pk=blog.pk).update(post_count=F('post_count') + imported)
+            created = fan_out_imported(blog, first_id, last_id, batch_size)
+            bump(*list_versions(blog.pk), *list_versions())
+    return imported, created
@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Blog, Subscription
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Run a benchmark in a transaction that is rolled back, so synthetic data never reaches the database."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+class Measurement:
+    queries = 0
+    seconds = 0.0
+
+    def __str__(self):
+        return f'{self.queries:>7} queries, {self.seconds * 1000:10.1f} ms'
+
+
+@contextmanager
+def measure():
+    measurement = Measurement()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        yield measurement
+        measurement.seconds = time.perf_counter() - start
+    measurement.queries = len(queries)
+
+
+def create_blog(username, subscribers=0):
+    """Create a blog with ``subscribers`` synthetic subscribers."""
+    User = get_user_model()
+    blog = Blog.objects.create(author=User.objects.create(username=username))
+    User.objects.bulk_create(
+        [User(username=f'{username}-{i}') for i in range(subscribers)], batch_size=5000)
+    readers = User.objects.filter(username__startswith=f'{username}-')
+    Subscription.objects.bulk_create(
+        [Subscription(user_id=pk, blog=blog) for pk in readers.values_list('pk', flat=True)],
+        batch_size=5000)
+    return blog
@@ -0,0 +1,120 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from blog import counters
+from blog.asyncviews import AsyncViewsHandler
+from blog.fanout import fan_out_post
+from blog.management.benchmark import create_blog
+from blog.models import Post
+from blog.purge import purge_blog
+
+
+class Command(BaseCommand):
+    help = ('Serve the feed page to many simultaneous readers in-process, through the WSGI handler with a thread '
+            'pool and through the ASGI handler, and compare the throughput and latencies.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=500, help='Readers requesting their feed at once.')
+        parser.add_argument('--posts', type=int, default=20)
+        parser.add_argument('--threads', type=int, default=8, help='Threads of the WSGI server.')
+        parser.add_argument('--host', default='localhost', help='Host header, one of ALLOWED_HOSTS.')
+
+    def handle(self, *args, readers, posts, threads, host, **options):
+        # The handlers read from other threads, so the data is committed and deleted afterwards.
+        blog = create_blog('bench-asgi', subscribers=readers)
+        cookies = []
+        try:
+            for post in Post.objects.bulk_create(
+                    [Post(blog=blog, title=f'Bench post {n}', content='') for n in range(posts)]):
+                fan_out_post(post)
+            for user in get_user_model().objects.filter(username__startswith='bench-asgi-'):
+                # Regular readers, who already have an unread counter.
+                counters.refresh(user, cached=False)
+                cookies.append(self.login(user))
+            path = reverse('blog:feed')
+
+            wsgi = WSGIHandler()
+            with ThreadPoolExecutor(threads) as executor:
+                self.burst(f'WSGI, {threads} threads', lambda start: list(executor.map(
+                    lambda cookie: self.wsgi_get(wsgi, host, path, cookie, start), cookies)))
+
+            def read_all(application):
+                def run(start):
+                    async def gather():
+                        return await asyncio.gather(*[self.asgi_get(application, host, path, cookie, start)
+                                                      for cookie in cookies])
+                    return asyncio.run(gather())
+                return run
+            # What ASGI does with a sync view: runs it in the one thread shared by all sync code.
+            self.burst('ASGI, sync view', read_all(ASGIHandler()))
+            self.burst(f'ASGI, {settings.ASYNC_VIEW_THREADS} view threads', read_all(AsyncViewsHandler()))
+        finally:
+            Session.objects.filter(session_key__in=[cookie.split('=', 1)[1] for cookie in cookies]).delete()
+            purge_blog(blog.pk, 1000)
+            get_user_model().objects.filter(username__startswith='bench-asgi').delete()
+
+    @staticmethod
+    def login(user):
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def burst(self, label, run):
+        """
+        Send every request at once with ``run(start)``, which returns the
+        status of each response and the time from ``start`` to its end.
+        """
+        start = time.perf_counter()
+        results = run(start)
+        seconds = time.perf_counter() - start
+        latencies = sorted(latency for _, latency in results)
+        failed = sum(status != 200 for status, _ in results)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        self.stdout.write(
+            f'{label:>22}: {len(results)} requests ({failed} failed) in {seconds:6.2f}s, '
+            f'{len(results) / seconds:6.1f} req/s, median {statistics.median(latencies) * 1000:7.0f} ms, '
+            f'p99 {p99 * 1000:7.0f} ms')
+
+    @staticmethod
+    def wsgi_get(application, host, path, cookie, start):
+        statuses = []
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': host,
+            'SERVER_PORT': '80', 'HTTP_HOST': host, 'HTTP_COOKIE': cookie, 'wsgi.input': BytesIO(),
+            'wsgi.url_scheme': 'http', 'wsgi.errors': BytesIO(),
+        }
+        response = application(environ, lambda status, headers: statuses.append(int(status.split()[0])))
+        b''.join(response)
+        response.close()
+        return statuses[0], time.perf_counter() - start
+
+    @staticmethod
+    async def asgi_get(application, host, path, cookie, start):
+        messages = []
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': (host, 80),
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await application(scope, receive, send)
+        return messages[0]['status'], time.perf_counter() - start
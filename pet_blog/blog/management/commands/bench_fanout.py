@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from blog.fanout import fan_out_post
+from blog.management.benchmark import create_blog, measure, rolled_back
+from blog.models import Feed, Post, Subscription
+
+
+class Command(BaseCommand):
+    help = 'Measure queries and time spent fanning a new post out to its subscribers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', nargs='+', type=int, default=[10, 1000, 100000])
+        parser.add_argument('--legacy-max', type=int, default=1000,
+                            help='Largest audience to also measure with the row-by-row fan-out.')
+
+    def handle(self, *args, **options):
+        for size in options['subscribers']:
+            self.bench(size, 'set-based', fan_out_post)
+            if size <= options['legacy_max']:
+                self.bench(size, 'row-by-row', self.legacy_fan_out)
+
+    def bench(self, size, label, fan_out):
+        with rolled_back():
+            blog = create_blog('bench', subscribers=size)
+            # bulk_create skips Post.save, so the post is not fanned out yet.
+            post = Post.objects.bulk_create([Post(blog=blog, title='Bench post', content='')])[0]
+            # Any audience is fanned out on write here, however large.
+            with override_settings(FEED_FANOUT_THRESHOLD=size), measure() as measurement:
+                fan_out(post)
+            rows = Feed.objects.filter(post=post).count()
+            if rows != size:
+                raise CommandError(f'{label} fan-out wrote {rows} feed rows for {size} subscribers')
+            self.stdout.write(f'{label:>10}: {size:>7} subscribers, {rows:>7} feed rows, {measurement}')
+
+    @staticmethod
+    def legacy_fan_out(post):
+        for subscription in Subscription.objects.filter(blog=post.blog):
+            Feed(user=subscription.user, post=post, subscription=subscription, blog=post.blog,
+                 posted=post.posted).save()
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from blog.fanout import fan_out_post
+from blog.forms import FeedForm
+from blog.management.benchmark import create_blog, measure, rolled_back
+from blog.models import Feed, Post, Subscription
+
+
+class Command(BaseCommand):
+    help = 'Compare fan-out on write with fan-out on read for a blog with many subscribers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=50,
+                            help='Posts published by the popular blog.')
+        parser.add_argument('--other-blogs', type=int, default=20,
+                            help='Regular blogs the measured reader also subscribes to.')
+
+    def handle(self, *args, **options):
+        for strategy in ('write', 'read'):
+            self.bench(strategy, **options)
+
+    def bench(self, strategy, subscribers, posts, other_blogs, **options):
+        with rolled_back():
+            blog = create_blog('bench-popular', subscribers=subscribers)
+            blog.fan_out_on_read = strategy == 'read'
+            blog.save()
+            reader = Subscription.objects.filter(blog=blog).first().user
+
+            for i in range(other_blogs):
+                other = create_blog(f'bench-author-{i}')
+                Subscription.objects.create(user=reader, blog=other)
+                for post in Post.objects.bulk_create(
+                        [Post(blog=other, title=f'Post {n}', content='') for n in range(5)]):
+                    fan_out_post(post)
+
+            published = Post.objects.bulk_create(
+                [Post(blog=blog, title=f'Popular post {n}', content='') for n in range(posts)])
+            # The blog keeps the strategy it was given, however many subscribers it has.
+            with override_settings(FEED_FANOUT_THRESHOLD=subscribers), measure() as write:
+                for post in published:
+                    fan_out_post(post)
+            rows = Feed.objects.filter(blog=blog).count()
+            expected = subscribers * posts if strategy == 'write' else 0
+            if rows != expected:
+                raise CommandError(f'Fan-out on {strategy} wrote {rows} feed rows instead of {expected}')
+
+            with measure() as read:
+                entries = FeedForm(reader).entries()
+
+            self.stdout.write(f'fan-out on {strategy}:')
+            self.stdout.write(f'  publish {posts} posts: {rows:>9} feed rows, {write}')
+            self.stdout.write(f'  read feed:      {len(entries):>9} entries,   {read}')
@@ -0,0 +1,51 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blog.management.benchmark import create_blog, measure, rolled_back
+from blog.models import Post
+from blog.search import SearchPage
+
+WORDS = [f'word{i}' for i in range(20000)]
+
+
+class Command(BaseCommand):
+    help = 'Measure full-text search latency against a scan with icontains.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--words', type=int, default=200, help='Words in the content of every post.')
+        parser.add_argument('--scan-max', type=int, default=100000,
+                            help='Largest number of posts to also search with icontains.')
+
+    def handle(self, *args, **options):
+        posts, words = options['posts'], options['words']
+        rng = random.Random(0)
+        with rolled_back():
+            blog = create_blog('bench-search')
+            with measure() as write:
+                for start in range(0, posts, 5000):
+                    # Zipf-like: low-numbered words are much more common than the others.
+                    Post.objects.bulk_create([
+                        Post(blog=blog, title=' '.join(self.pick(rng, 5)), content=' '.join(self.pick(rng, words)))
+                        for _ in range(min(5000, posts - start))])
+            self.stdout.write(f'insert and index {posts} posts: {write}')
+
+            for term in ('word1', 'word100', 'word5000', 'word1 word100', 'word19'):
+                with measure() as first:
+                    page = SearchPage(term, 20)
+                with measure() as second:
+                    SearchPage(term, 20, (page.items[-1].rank, page.items[-1].pk) if page.items else None)
+                self.stdout.write(f'{term!r:>16}: first page {first}, second page {second}')
+                if posts <= options['scan_max']:
+                    with measure() as scan:
+                        query = Q()
+                        for word in term.split():
+                            query &= Q(title__icontains=word) | Q(content__icontains=word)
+                        list(Post.objects.filter(query).only('title', 'posted')[:20])
+                    self.stdout.write(f'{"icontains":>16}: {scan}')
+
+    @staticmethod
+    def pick(rng, count):
+        return [WORDS[min(int(rng.paretovariate(1.0)) - 1, len(WORDS) - 1)] for _ in range(count)]
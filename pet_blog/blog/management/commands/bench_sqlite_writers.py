@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import override_settings
+
+from blog.fanout import fan_out_post
+from blog.messaging import get_broker
+from blog.models import Blog, Post, Subscription, UnreadCounter
+
+PROFILES = ('default', 'production')
+
+
+@contextmanager
+def scratch_database(settings_dict):
+    """Make ``settings_dict`` the default database, in every thread, for the duration of the block."""
+    original = connections.settings[DEFAULT_DB_ALIAS]
+    connections[DEFAULT_DB_ALIAS].close()
+    connections.settings[DEFAULT_DB_ALIAS] = settings_dict
+    del connections[DEFAULT_DB_ALIAS]
+    try:
+        yield
+    finally:
+        connections[DEFAULT_DB_ALIAS].close()
+        connections.settings[DEFAULT_DB_ALIAS] = original
+        del connections[DEFAULT_DB_ALIAS]
+
+
+class Command(BaseCommand):
+    help = ('Measure the write throughput of concurrent writers publishing posts on a scratch SQLite database, '
+            'with the default settings and with the SQLITE_PRODUCTION profile.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--posts', type=int, default=100, help='Posts published by each writer.')
+        parser.add_argument('--subscribers', type=int, default=50, help='Subscribers of each blog.')
+
+    def handle(self, *args, **options):
+        for profile in PROFILES:
+            with tempfile.TemporaryDirectory() as directory:
+                settings_dict = self.settings_dict(profile, os.path.join(directory, 'bench.sqlite3'))
+                # The app's own write path runs on the default database, with the feeds and the message
+                # queue in it.
+                with scratch_database(settings_dict), override_settings(
+                        FEED_SHARDS=[DEFAULT_DB_ALIAS], MESSAGE_BROKER='blog.messaging.db.DatabaseBroker'):
+                    get_broker.cache_clear()
+                    try:
+                        self.bench(profile, **options)
+                    finally:
+                        get_broker.cache_clear()
+
+    @staticmethod
+    def settings_dict(profile, name):
+        settings_dict = {**connections[DEFAULT_DB_ALIAS].settings_dict, 'NAME': name, 'TEST': {}}
+        if profile == 'production':
+            return {**settings_dict, **settings.SQLITE_PRODUCTION_PROFILE}
+        return {**settings_dict, 'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0, 'OPTIONS': {}}
+
+    def bench(self, profile, writers, posts, subscribers, **options):
+        call_command('migrate', verbosity=0)
+        blogs = self.populate(writers, subscribers)
+        results = []
+
+        def write(blog):
+            published = locked = 0
+            for n in range(posts):
+                try:
+                    # What publishing a post costs: the request's Post.save(), then the worker's fan-out.
+                    post = Post(blog=blog, title=f'Bench post {n}', content='')
+                    post.save()
+                    fan_out_post(post)
+                    published += 1
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    locked += 1
+                # The end of a request: closes the connection unless CONN_MAX_AGE keeps it.
+                connections[DEFAULT_DB_ALIAS].close_if_unusable_or_obsolete()
+            connections[DEFAULT_DB_ALIAS].close()
+            results.append((published, locked))
+
+        threads = [threading.Thread(target=write, args=(blog,)) for blog in blogs]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+        published = sum(result[0] for result in results)
+        locked = sum(result[1] for result in results)
+        self.stdout.write(f'{profile:>10}: {writers} writers, {published:>6} posts published, '
+                          f'{locked:>6} "database is locked" errors, {published / seconds:8.1f} posts/s')
+
+    @staticmethod
+    def populate(writers, subscribers):
+        """Create one blog per writer, each with ``subscribers`` readers."""
+        User = get_user_model()
+        blogs = []
+        for i in range(writers):
+            author = User.objects.create(username=f'bench-{i}')
+            blog = Blog.objects.create(author=author)
+            User.objects.bulk_create([User(username=f'bench-{i}-{n}') for n in range(subscribers)])
+            readers = User.objects.filter(username__startswith=f'bench-{i}-')
+            Subscription.objects.bulk_create([Subscription(user=user, blog=blog) for user in readers])
+            UnreadCounter.objects.bulk_create([UnreadCounter(user=user) for user in readers])
+            blogs.append(blog)
+        connections[DEFAULT_DB_ALIAS].close()
+        return blogs
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from blog.cache import stats
+
+
+class Command(BaseCommand):
+    help = 'Show the hits and misses of the public page cache.'
+
+    def handle(self, *args, **options):
+        counts = stats()
+        lookups = counts['hits'] + counts['misses']
+        ratio = counts['hits'] / lookups if lookups else 0
+        self.stdout.write(f"{counts['hits']} hits, {counts['misses']} misses ({ratio:.0%} hit rate)")
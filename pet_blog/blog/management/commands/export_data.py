@@ -0,0 +1,47 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.export import FORMATS, SECTIONS, export, gzipped
+
+
+class Command(BaseCommand):
+    help = "Export a user's posts, feed and subscriptions as NDJSON or CSV, streamed as they are read."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=list(FORMATS), default='ndjson')
+        parser.add_argument('--section', action='append', choices=list(SECTIONS), dest='sections',
+                            help='Part of the data to export; can be repeated. Everything by default.')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output.')
+        parser.add_argument('--output', '-o', help='File to write to instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get_by_natural_key(options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user {options['username']!r}")
+        sections = options['sections'] or list(SECTIONS)
+        if options['format'] == 'csv' and len(sections) != 1:
+            raise CommandError('A CSV export holds a single --section.')
+
+        chunks = export(user, options['format'], sections)
+        if options['gzip']:
+            chunks = gzipped(chunks)
+        else:
+            chunks = (chunk.encode() for chunk in chunks)
+
+        start = time.perf_counter()
+        size = 0
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                size += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+        seconds = time.perf_counter() - start
+        self.stderr.write(f'Exported {size} bytes in {seconds:.1f}s')
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.importer import FORMATS, import_posts, read_rows
+from blog.models import Blog
+
+
+class Command(BaseCommand):
+    help = ("Import posts into a user's blog from a JSON array, NDJSON or CSV file of title, content and posted, "
+            "keeping their posted times. Subscribers' feeds are filled once at the end and no one is notified.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Author of the blog to import into.')
+        parser.add_argument('file', help="File to read, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Format of the file; guessed from its extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            blog = Blog.objects.get(author__username=options['username'])
+        except Blog.DoesNotExist:
+            raise CommandError(f"{options['username']!r} has no blog")
+
+        path = options['file']
+        kind = options['format'] or os.path.splitext(path)[1].lstrip('.').replace('jsonl', 'ndjson')
+        if kind not in FORMATS:
+            raise CommandError('Pass --format for this file.')
+
+        progress = None
+        if options['verbosity'] > 1:
+            progress = lambda done: self.stdout.write(f'{done} posts')  # noqa: E731
+        start = time.perf_counter()
+        file = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            imported, created = import_posts(
+                blog, read_rows(file, kind), options['batch_size'], progress)
+        except (ValueError, KeyError) as e:
+            raise CommandError(e)
+        finally:
+            if file is not sys.stdin:
+                file.close()
+        seconds = time.perf_counter() - start
+        self.stdout.write(f'Imported {imported} posts and {created} feed rows in {seconds:.1f}s '
+                          f'({imported / seconds if seconds else 0:.0f} posts/s)')
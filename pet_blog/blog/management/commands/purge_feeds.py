@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.purge import purge_blog, purge_unsubscribed, purge_user
+
+
+class Command(BaseCommand):
+    help = ('Delete the feeds of cancelled subscriptions in batches. '
+            'With --user or --blog, delete those users or blogs with everything depending on them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--user', type=int, action='append', default=[], dest='users',
+                            help='Id of a user to delete; can be repeated.')
+        parser.add_argument('--blog', type=int, action='append', default=[], dest='blogs',
+                            help='Id of a blog to delete; can be repeated.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        start = time.perf_counter()
+        deleted = purge_unsubscribed(batch_size)
+        for blog_id in options['blogs']:
+            deleted += purge_blog(blog_id, batch_size)
+        for user_id in options['users']:
+            deleted += purge_user(user_id, batch_size)
+        seconds = time.perf_counter() - start
+        self.stdout.write(f'Purged {deleted} rows in {seconds:.1f}s ({deleted / seconds if seconds else 0:.0f} rows/s)')
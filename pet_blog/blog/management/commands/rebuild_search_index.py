@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the full-text search index of the posts in batches. '
+            'Run it while no posts are being edited; new posts are indexed as they are created.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        indexed = rebuild_index(options['batch_size'], progress=lambda done: self.stdout.write(f'{done} posts'))
+        seconds = time.perf_counter() - start
+        self.stdout.write(f'Indexed {indexed} posts in {seconds:.1f}s ({indexed / seconds if seconds else 0:.0f} posts/s)')
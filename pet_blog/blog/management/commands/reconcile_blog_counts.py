@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the subscribers and posts of all blogs and repair the counts that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        repaired = counters.reconcile_blogs(options['batch_size'])
+        self.stdout.write(f'Repaired {repaired} blogs in {time.perf_counter() - start:.1f}s')
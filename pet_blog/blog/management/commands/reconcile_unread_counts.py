@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the unread counters of all users and repair the ones that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        repaired = counters.reconcile(options['batch_size'])
+        self.stdout.write(f'Repaired {repaired} counters in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from blog.messaging import get_broker
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued messages to their consumers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling.')
+
+    def handle(self, *args, **options):
+        broker = get_broker()
+        try:
+            while True:
+                close_old_connections()
+                delivered = broker.consume(options['batch_size'])
+                if delivered:
+                    self.stdout.write(f'Delivered {delivered} messages')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import NotificationPreference
+from blog.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Email every digest subscriber one summary of their new posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('delivery', choices=NotificationPreference.DIGESTS)
+
+    def handle(self, *args, **options):
+        sent = send_digests(options['delivery'])
+        self.stdout.write(f'Sent {sent} {options["delivery"]} digests')
@@ -0,0 +1,32 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_consumers = {}
+
+
+def consumer(topic):
+    """Register the decorated function as the consumer of ``topic`` messages."""
+    def decorator(func):
+        _consumers.setdefault(topic, []).append(func)
+        return func
+    return decorator
+
+
+def dispatch(topic, payload):
+    for func in _consumers.get(topic, []):
+        func(payload)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.MESSAGE_BROKER)()
+
+
+def publish(topic, payload):
+    """
+    Queue a message for the consumers of ``topic``. Delivery is at-least-once,
+    so consumers must be idempotent.
+    """
+    get_broker().publish(topic, payload)
@@ -0,0 +1,18 @@
+from django.conf import settings
+
+
+class BaseBroker:
+    def __init__(self, max_attempts=None, retry_delay=None):
+        self.max_attempts = max_attempts or getattr(settings, 'MESSAGE_MAX_ATTEMPTS', 5)
+        self.retry_delay = retry_delay if retry_delay is not None else getattr(
+            settings, 'MESSAGE_RETRY_DELAY', 5)
+
+    def backoff(self, attempts):
+        return self.retry_delay * 2 ** (attempts - 1)
+
+    def publish(self, topic, payload):
+        raise NotImplementedError('subclasses of BaseBroker must provide a publish() method')
+
+    def consume(self, batch_size=100):
+        """Deliver up to ``batch_size`` pending messages and return how many were handled."""
+        return 0
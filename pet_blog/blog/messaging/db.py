@@ -0,0 +1,61 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import dispatch
+from .base import BaseBroker
+from ..models import Message
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseBroker(BaseBroker):
+    """
+    Durable broker keeping messages in an outbox table. Messages are written in
+    the publisher's transaction and delivered by ``manage.py run_worker``.
+    """
+
+    def __init__(self, lease=None, **kwargs):
+        super(DatabaseBroker, self).__init__(**kwargs)
+        self.lease = lease or getattr(settings, 'MESSAGE_LEASE_SECONDS', 60)
+
+    def publish(self, topic, payload):
+        Message.objects.create(topic=topic, payload=payload)
+
+    def consume(self, batch_size=100):
+        messages = self.lease_messages(batch_size)
+        for message in messages:
+            self.deliver(message)
+        return len(messages)
+
+    def lease_messages(self, batch_size):
+        now = timezone.now()
+        lease_id = uuid.uuid4()
+        pending = Message.objects.filter(available_at__lte=now)
+        ids = list(pending.values_list('pk', flat=True)[:batch_size])
+        # Another worker may lease the same ids in the meantime; the filter on
+        # `available_at` makes sure every message is only leased by one of them.
+        pending.filter(pk__in=ids).update(
+            lease_id=lease_id, available_at=now + timedelta(seconds=self.lease))
+        return list(Message.objects.filter(lease_id=lease_id))
+
+    def deliver(self, message):
+        # Consumers run outside of a transaction so that slow side effects such
+        # as sending email don't hold the database write lock.
+        try:
+            dispatch(message.topic, message.payload)
+        except Exception as e:
+            attempts = message.attempts + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Giving up on message {message.pk} ({message.topic}): {e}")
+                available_at = None
+            else:
+                logger.warning(f"Unable to deliver message {message.pk} ({message.topic}): {e}")
+                available_at = timezone.now() + timedelta(seconds=self.backoff(attempts))
+            Message.objects.filter(pk=message.pk, lease_id=message.lease_id).update(
+                lease_id=None, available_at=available_at, attempts=attempts, last_error=str(e))
+        else:
+            Message.objects.filter(pk=message.pk, lease_id=message.lease_id).delete()
@@ -0,0 +1,43 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import dispatch
+from .base import BaseBroker
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPoolBroker(BaseBroker):
+    """
+    In-process broker for development. Messages are handed to a thread pool
+    once the publishing transaction commits and are lost if the process exits.
+    """
+
+    def __init__(self, workers=None, **kwargs):
+        super(ThreadPoolBroker, self).__init__(**kwargs)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or getattr(settings, 'MESSAGE_BROKER_WORKERS', 4),
+            thread_name_prefix='blog-messaging')
+
+    def publish(self, topic, payload):
+        transaction.on_commit(lambda: self.executor.submit(self.deliver, topic, payload))
+
+    def deliver(self, topic, payload):
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    dispatch(topic, payload)
+                    return
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        logger.error(f"Giving up on {topic} message: {e}")
+                    else:
+                        logger.warning(f"Unable to deliver {topic} message: {e}")
+                        time.sleep(self.backoff(attempt))
+        finally:
+            # Worker threads open their own connections; don't leak them.
+            connections.close_all()
@@ -0,0 +1,18 @@
+# Generated by Django 4.0 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_notification_preferences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='fan_out_on_read',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blog_fan_out_on_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='read_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import Exists, F, OuterRef, Subquery
+
+
+def set_read_watermarks(apps, schema_editor):
+    """
+    Move every subscription's watermark up to the newest post before its
+    oldest unread one. The is_read flags above it stay as exceptions.
+    """
+    Feed = apps.get_model('blog', 'Feed')
+    Subscription = apps.get_model('blog', 'Subscription')
+
+    feeds = Feed.objects.filter(subscription=OuterRef('pk'))
+    unread = feeds.filter(is_read=False)
+    # Nested in the feeds subquery below, so it refers to the feed row's subscription.
+    oldest_unread = Feed.objects.filter(subscription=OuterRef('subscription'), is_read=False).order_by(
+        'post__posted').values('post__posted')[:1]
+
+    Subscription.objects.filter(~Exists(unread)).update(
+        read_until=Subquery(feeds.order_by('-post__posted').values('post__posted')[:1]))
+    Subscription.objects.filter(Exists(unread)).update(
+        read_until=Subquery(feeds.filter(post__posted__lt=Subquery(oldest_unread)).order_by(
+            '-post__posted').values('post__posted')[:1]))
+
+
+def unset_read_watermarks(apps, schema_editor):
+    Feed = apps.get_model('blog', 'Feed')
+    Feed.objects.filter(post__posted__lte=F('subscription__read_until')).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_subscription_read_until'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_read_watermarks, unset_read_watermarks),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations, models, transaction
+from django.db.models import Max, OuterRef, Subquery
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def copy_post_columns(apps, schema_editor, batch_size=BATCH_SIZE):
+    """
+    Copy posted and blog_id from each Feed row's post, ``batch_size`` ids at
+    a time. Every batch commits on its own, so the table is never locked for
+    long and an interrupted run can just be started again.
+    """
+    Feed = apps.get_model('blog', 'Feed')
+    Post = apps.get_model('blog', 'Post')
+
+    post = Post.objects.filter(pk=OuterRef('post'))
+    last = Feed.objects.aggregate(last=Max('pk'))['last'] or 0
+    for start in range(0, last, batch_size):
+        with transaction.atomic():
+            Feed.objects.filter(pk__gt=start, pk__lte=start + batch_size).update(
+                posted=Subquery(post.values('posted')[:1]),
+                blog=Subquery(post.values('blog')[:1]),
+            )
+
+
+class Migration(migrations.Migration):
+    # The backfill commits batch by batch.
+    atomic = False
+
+    dependencies = [
+        ('blog', '0007_unreadcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='blog',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='blog.blog'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='posted',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(copy_post_columns, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='feed',
+            name='blog',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='blog.blog'),
+        ),
+        migrations.AlterField(
+            model_name='feed',
+            name='posted',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterModelOptions(
+            name='feed',
+            options={'ordering': ['-posted']},
+        ),
+        migrations.AddIndex(
+            model_name='feed',
+            index=models.Index(condition=models.Q(is_read=False), fields=['user', '-posted', '-post'], name='blog_feed_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['blog', '-posted', '-id'], name='blog_post_blog_posted_idx'),
+        ),
+    ]
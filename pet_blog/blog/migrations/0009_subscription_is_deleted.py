@@ -0,0 +1,18 @@
+# Generated by Django 4.0 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_feed_posted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
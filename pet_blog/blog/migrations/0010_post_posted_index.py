@@ -0,0 +1,17 @@
+# Generated by Django 4.0 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_subscription_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-posted', '-id'], name='blog_post_posted_idx'),
+        ),
+    ]
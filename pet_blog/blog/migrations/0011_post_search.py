@@ -0,0 +1,49 @@
+from django.db import migrations
+
+TABLE = 'blog_post_search'
+
+CREATE = [
+    # Title matches weigh ten times as much as content matches in the rank.
+    f"""CREATE VIRTUAL TABLE {TABLE} USING fts5(
+        title, content, content='blog_post', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2')""",
+    f"INSERT INTO {TABLE}({TABLE}, rank) VALUES('rank', 'bm25(10.0, 1.0)')",
+    f"""CREATE TRIGGER blog_post_search_insert AFTER INSERT ON blog_post BEGIN
+        INSERT INTO {TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    f"""CREATE TRIGGER blog_post_search_delete AFTER DELETE ON blog_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    f"""CREATE TRIGGER blog_post_search_update AFTER UPDATE OF title, content ON blog_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    f"INSERT INTO {TABLE}({TABLE}) VALUES('rebuild')",
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS blog_post_search_insert',
+    'DROP TRIGGER IF EXISTS blog_post_search_delete',
+    'DROP TRIGGER IF EXISTS blog_post_search_update',
+    f'DROP TABLE IF EXISTS {TABLE}',
+]
+
+
+def execute(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite's; other databases would need their own full-text index.
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_post_posted_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(execute(CREATE), execute(DROP)),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count(queryset):
+    return Coalesce(Subquery(queryset.filter(blog=OuterRef('pk')).values('blog').annotate(
+        count=Count('pk')).values('count')), Value(0))
+
+
+def set_blog_counts(apps, schema_editor):
+    Blog = apps.get_model('blog', 'Blog')
+    Post = apps.get_model('blog', 'Post')
+    Subscription = apps.get_model('blog', 'Subscription')
+    Blog.objects.update(subscriber_count=count(Subscription.objects.filter(is_deleted=False)),
+                        post_count=count(Post.objects.all()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='post_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='subscriber_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_blog_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['-subscriber_count', '-id'], name='blog_blog_subscribers_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['-post_count', '-id'], name='blog_blog_posts_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0 on 2026-10-18 12:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0012_blog_counts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feed',
+            name='blog',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='blog.blog'),
+        ),
+        migrations.AlterField(
+            model_name='feed',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='blog.post'),
+        ),
+        migrations.AlterField(
+            model_name='feed',
+            name='subscription',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='blog.subscription'),
+        ),
+        migrations.AlterField(
+            model_name='feed',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='auth.user'),
+        ),
+    ]
@@ -1,15 +1,27 @@
-import logging
-from smtplib import SMTPException
-
-from django.db import models
-from django.core.mail import send_mail
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 
-logger = logging.getLogger(__name__)
+from .cache import invalidate_post
+from .messaging import publish
+from .shards import remote_shards
 
 
 class Blog(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Posts of blogs with more than FEED_FANOUT_THRESHOLD subscribers are not
+    # copied into every subscriber's feed, they are merged in when it is read.
+    fan_out_on_read = models.BooleanField(default=False)
+    # Live subscriptions and posts of the blog, kept up to date as they change
+    # so the blog directory can sort by them. `reconcile_blog_counts` repairs them.
+    subscriber_count = models.IntegerField(default=0)
+    post_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-subscriber_count', '-id'], name='blog_blog_subscribers_idx'),
+            models.Index(fields=['-post_count', '-id'], name='blog_blog_posts_idx'),
+        ]
 
     def __str__(self):
         return self.author.get_username()
@@ -23,25 +35,28 @@ class Post(models.Model):
 
     class Meta:
         ordering = ['-posted']
+        indexes = [
+            models.Index(fields=['-posted', '-id'], name='blog_post_posted_idx'),
+            models.Index(fields=['blog', '-posted', '-id'], name='blog_post_blog_posted_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        super(Post, self).save(*args, **kwargs)
-        subscriptions = Subscription.objects.filter(blog=self.blog)
-        for subscription in subscriptions:
-            subscriber = subscription.user
-            feed = Feed(user=subscriber, post=self, subscription=subscription)
-            feed.save()
-
-            try:
-                send_mail(
-                    'New post',
-                    'You have a new post in your feed.',
-                    'from@pet-blog.com',
-                    [subscriber.email],
-                    fail_silently=False,
-                )
-            except SMTPException as e:
-                logger.error(f"Unable to send email to {subscriber}: {e}")
+        adding = self._state.adding
+        with transaction.atomic():
+            super(Post, self).save(*args, **kwargs)
+            if adding:
+                Blog.objects.filter(pk=self.blog_id).update(post_count=models.F('post_count') + 1)
+                publish('post_published', {'post_id': self.pk})
+            invalidate_post(self)
+
+    def delete(self, *args, **kwargs):
+        invalidate_post(self)
+        # The cascade only reaches the Feed rows in the primary database.
+        for alias in remote_shards():
+            Feed.objects.using(alias).filter(post_id=self.pk).delete()
+        with transaction.atomic():
+            Blog.objects.filter(pk=self.blog_id).update(post_count=models.F('post_count') - 1)
+            return super(Post, self).delete(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -50,6 +65,11 @@ class Post(models.Model):
 class Subscription(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     blog = models.ForeignKey(Blog, on_delete=models.CASCADE)
+    # Posts up to this time are read. Feed.is_read marks the posts read after it.
+    read_until = models.DateTimeField(null=True, blank=True)
+    # Unsubscribing only sets this tombstone; `purge_feeds` deletes the
+    # subscription and its Feed rows later, in batches.
+    is_deleted = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ['user', 'blog']
@@ -59,14 +79,83 @@ class Subscription(models.Model):
 
 
 class Feed(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
-    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE)
+    # Feeds are spread over several databases (see blog.shards), so the
+    # foreign keys are not enforced by the database.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_constraint=False)
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, db_constraint=False)
     is_read = models.BooleanField(default=False)
+    # Copied from the post when it is fanned out, so the feed is filtered and
+    # sorted without joining blog_post.
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, db_constraint=False)
+    posted = models.DateTimeField()
 
     class Meta:
-        ordering = ['-post__posted']
+        ordering = ['-posted']
         unique_together = ['user', 'post', 'subscription']
+        indexes = [
+            models.Index(fields=['user', '-posted', '-post'], name='blog_feed_unread_idx',
+                         condition=models.Q(is_read=False)),
+        ]
+
+    def __str__(self):
+        return self.post.title
+
+
+class UnreadCounter(models.Model):
+    # Number of unread Feed rows of the user, kept up to date by blog.counters.
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='unread_counter')
+    unread = models.IntegerField(default=0)
+
+    def __str__(self):
+        return str(self.unread)
+
+
+class NotificationPreference(models.Model):
+    IMMEDIATE = 'immediate'
+    HOURLY = 'hourly'
+    DAILY = 'daily'
+    DELIVERY_CHOICES = [
+        (IMMEDIATE, 'Immediately'),
+        (HOURLY, 'Hourly digest'),
+        (DAILY, 'Daily digest'),
+    ]
+    DIGESTS = [HOURLY, DAILY]
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='notification_preference')
+    delivery = models.CharField(max_length=10, choices=DELIVERY_CHOICES, default=IMMEDIATE)
+
+    def __str__(self):
+        return self.get_delivery_display()
+
+
+class PendingNotification(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ['user', 'post']
 
     def __str__(self):
         return self.post.title
+
+
+class Message(models.Model):
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created = models.DateTimeField(auto_now_add=True)
+    # A message is delivered once `available_at` has passed. Leasing a message
+    # pushes it forward, so a crashed worker's messages are redelivered when
+    # the lease expires. Dead messages have no `available_at`.
+    available_at = models.DateTimeField(default=timezone.now, null=True, db_index=True)
+    lease_id = models.UUIDField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return self.topic
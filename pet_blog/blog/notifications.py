@@ -0,0 +1,145 @@
+import logging
+import time
+from collections import namedtuple
+from itertools import groupby, islice
+from operator import itemgetter
+from smtplib import SMTPException
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q, Value
+from django.template.defaultfilters import pluralize
+
+from .fanout import insert_select
+from .models import NotificationPreference, PendingNotification, Subscription
+
+logger = logging.getLogger(__name__)
+
+BatchStats = namedtuple('BatchStats', ['size', 'sent', 'attempts', 'seconds'])
+
+
+class NotificationDispatcher:
+    """
+    Sends email over a single backend connection in batches of ``batch_size``
+    messages, retrying the unsent messages of a batch when sending fails with
+    an ``SMTPException`` or a connection error.
+    """
+
+    def __init__(self, batch_size=None, max_retries=None, retry_delay=None):
+        self.batch_size = batch_size or getattr(settings, 'NOTIFICATION_BATCH_SIZE', 100)
+        self.max_retries = max_retries if max_retries is not None else getattr(
+            settings, 'NOTIFICATION_MAX_RETRIES', 3)
+        self.retry_delay = retry_delay if retry_delay is not None else getattr(
+            settings, 'NOTIFICATION_RETRY_DELAY', 1)
+        self.stats = []
+        # The messages given up on after max_retries.
+        self.failed = []
+
+    def send(self, messages):
+        """Send ``messages`` and return the number of messages sent."""
+        messages = iter(messages)
+        connection = get_connection(fail_silently=False)
+        with connection:
+            while True:
+                batch = list(islice(messages, self.batch_size))
+                if not batch:
+                    break
+                self.stats.append(self.send_batch(connection, batch))
+        return sum(stats.sent for stats in self.stats)
+
+    def send_batch(self, connection, batch):
+        start = time.perf_counter()
+        attempt = 1
+        sent = 0
+        pending = list(batch)
+        while pending:
+            try:
+                if attempt > 1:
+                    # The server may have dropped the connection; start a new one.
+                    connection.close()
+                    connection.open()
+                # One message at a time, so a failure leaves only the unsent ones to retry.
+                while pending:
+                    sent += connection.send_messages(pending[:1]) or 0
+                    del pending[0]
+            except (SMTPException, OSError) as e:
+                if attempt > self.max_retries:
+                    logger.error(f"Unable to send {len(pending)}/{len(batch)} emails: {e}")
+                    self.failed.extend(pending)
+                    break
+                logger.warning(f"Unable to send {len(pending)}/{len(batch)} emails, retrying: {e}")
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                attempt += 1
+
+        stats = BatchStats(len(batch), sent, attempt, time.perf_counter() - start)
+        logger.info(f"Sent {stats.sent}/{stats.size} emails in {stats.seconds:.3f}s "
+                    f"({stats.sent / stats.seconds if stats.seconds else 0:.0f}/s)")
+        return stats
+
+
+def immediate_subscriptions(post):
+    return Subscription.objects.filter(blog_id=post.blog_id, is_deleted=False).filter(
+        Q(user__notification_preference__isnull=True)
+        | Q(user__notification_preference__delivery=NotificationPreference.IMMEDIATE))
+
+
+def new_post_messages(post):
+    emails = immediate_subscriptions(post).values_list('user__email', flat=True)
+    for email in emails.iterator():
+        if email:
+            yield EmailMessage(
+                'New post',
+                'You have a new post in your feed.',
+                'from@pet-blog.com',
+                [email],
+            )
+
+
+def queue_digest_notifications(post):
+    """Hold back the notifications of subscribers who receive digests."""
+    subscriptions = Subscription.objects.filter(
+        blog_id=post.blog_id, is_deleted=False,
+        user__notification_preference__delivery__in=NotificationPreference.DIGESTS)
+    return insert_select(PendingNotification, subscriptions, user=F('user_id'), post=Value(post.pk))
+
+
+def digest_messages(pending):
+    """Build one email per user from ``pending`` notifications in a single query."""
+    rows = pending.order_by('user_id', '-post__posted').values_list(
+        'user_id', 'user__email', 'post__title', 'post__blog__author__username')
+    for (user_id, email), posts in groupby(rows.iterator(), key=itemgetter(0, 1)):
+        posts = [f'- {title} by {author}' for _, _, title, author in posts]
+        if email:
+            yield EmailMessage(
+                'New posts',
+                f'You have {len(posts)} new post{pluralize(len(posts))} in your feed:\n\n' + '\n'.join(posts),
+                'from@pet-blog.com',
+                [email],
+            )
+
+
+def send_digests(delivery):
+    """
+    Send the pending notifications of users receiving ``delivery`` digests.
+    Hourly digests also pick up notifications left over from users who have
+    switched back to immediate delivery.
+    """
+    pending = PendingNotification.objects.all()
+    if delivery == NotificationPreference.DAILY:
+        pending = pending.filter(user__notification_preference__delivery=NotificationPreference.DAILY)
+    else:
+        pending = pending.exclude(user__notification_preference__delivery=NotificationPreference.DAILY)
+    last = pending.order_by('-pk').values_list('pk', flat=True).first()
+    if last is None:
+        return 0
+    # Notifications queued while the digests are being sent wait for the next run.
+    pending = pending.filter(pk__lte=last)
+
+    dispatcher = NotificationDispatcher()
+    sent = dispatcher.send(digest_messages(pending))
+    failed = {email for message in dispatcher.failed for email in message.to}
+    if failed:
+        logger.error(f"Unable to send {len(failed)} {delivery} digests, they will be sent on the next run")
+        pending = pending.exclude(user__email__in=failed)
+    pending.delete()
+    return sent
@@ -0,0 +1,78 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(position, pk):
+    if isinstance(position, datetime):
+        position = position.isoformat()
+    return urlsafe_b64encode(f'{position}|{pk}'.encode()).decode()
+
+
+def decode_cursor(cursor, parse=datetime.fromisoformat):
+    """
+    Return the (position, pk) encoded in ``cursor``, or None if it isn't a
+    valid cursor. ``parse`` reads the position, a posted time by default.
+    """
+    if not cursor:
+        return None
+    try:
+        position, pk = urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return parse(position), int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def request_cursor(request, parse=datetime.fromisoformat):
+    """The (cursor, newer) pair of a page requested with ``?before=<cursor>`` or ``?after=<cursor>``."""
+    newer = 'after' in request.GET
+    return decode_cursor(request.GET.get('after' if newer else 'before'), parse), newer
+
+
+def keyset(queryset, fields, cursor=None, newer=False):
+    """
+    Order ``queryset`` newest first along the (posted, pk) ``fields`` and keep
+    the rows older than ``cursor``, or the rows newer than it, oldest first,
+    when ``newer`` is set. Any other (position, pk) pair of fields is walked
+    the same way, largest first.
+    """
+    posted, pk = fields
+    if cursor is not None:
+        lookup = 'gt' if newer else 'lt'
+        value, key = cursor
+        queryset = queryset.filter(
+            Q(**{f'{posted}__{lookup}': value}) | Q(**{posted: value, f'{pk}__{lookup}': key}))
+    if newer:
+        return queryset.order_by(posted, pk)
+    return queryset.order_by(f'-{posted}', f'-{pk}')
+
+
+class KeysetPage:
+    """
+    A page of ``page_size`` items taken from ``rows``, which hold up to one
+    extra row telling whether there is more past the page. ``key`` returns an
+    item's (posted, pk) position.
+    """
+
+    def __init__(self, rows, page_size, key, cursor=None, newer=False):
+        has_more = len(rows) > page_size
+        items = list(rows[:page_size])
+        if newer:
+            items.reverse()
+        self.items = items
+        # Moving away from the cursor, we know there is something to go back to.
+        self.has_older = cursor is not None if newer else has_more
+        self.has_newer = has_more if newer else cursor is not None
+
+        self.older_cursor = self.newer_cursor = encode_cursor(*cursor) if cursor else None
+        if items:
+            self.older_cursor = encode_cursor(*key(items[-1]))
+            self.newer_cursor = encode_cursor(*key(items[0]))
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,101 @@
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef
+
+from .cache import bump, list_versions, post_versions
+from .counters import adjust_subscribers
+from .models import Blog, Feed, PendingNotification, Post, Subscription
+from .shards import feed_db, remote_shards
+
+
+def delete_batch(queryset, batch_size):
+    """
+    Delete up to ``batch_size`` rows of ``queryset`` with a single raw
+    ``DELETE ... WHERE id IN (SELECT ... LIMIT)`` statement. Unlike
+    QuerySet.delete() it neither loads the rows nor cascades, so the rows
+    referencing them must be deleted first. Returns the number of deleted rows.
+    """
+    model = queryset.model
+    using = queryset._db or router.db_for_write(model)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+
+    select_sql, params = queryset.order_by().values('pk')[:batch_size].query.get_compiler(
+        using=using).as_sql()
+    sql = 'DELETE FROM %s WHERE %s IN (%s)' % (
+        quote_name(model._meta.db_table), quote_name(model._meta.pk.column), select_sql)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def delete_in_batches(queryset, batch_size):
+    """Delete the rows of ``queryset`` ``batch_size`` at a time, committing every batch."""
+    deleted = 0
+    while True:
+        batch = delete_batch(queryset, batch_size)
+        deleted += batch
+        if batch < batch_size:
+            return deleted
+
+
+def purge_unsubscribed(batch_size):
+    """Delete the Feed rows of unsubscribed subscriptions, then the subscriptions left without any."""
+    tombstones = Subscription.objects.filter(is_deleted=True)
+    deleted = delete_in_batches(Feed.objects.filter(subscription__in=tombstones), batch_size)
+    for alias in remote_shards():
+        ids = tombstones.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+        while batch := list(islice(ids, batch_size)):
+            deleted += delete_in_batches(Feed.objects.using(alias).filter(subscription__in=batch), batch_size)
+    # A subscription cancelled meanwhile still has its Feed rows; it waits for the next run.
+    empty = tombstones.filter(~Exists(Feed.objects.filter(subscription=OuterRef('pk'))))
+    if not remote_shards():
+        return deleted + delete_in_batches(empty, batch_size)
+    last = 0
+    while ids := list(empty.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size]):
+        last = ids[-1]
+        kept = set()
+        for alias in remote_shards():
+            kept.update(Feed.objects.using(alias).filter(subscription__in=ids).values_list(
+                'subscription_id', flat=True))
+        deleted += delete_batch(empty.filter(pk__in=set(ids) - kept), batch_size)
+    return deleted
+
+
+def purge_blog(blog_id, batch_size):
+    """Delete a blog with its posts, subscriptions and everything referencing them, in batches."""
+    deleted = 0
+    for queryset in (
+            *[Feed.objects.using(alias).filter(blog_id=blog_id) for alias in settings.FEED_SHARDS],
+            PendingNotification.objects.filter(post__blog_id=blog_id)):
+        deleted += delete_in_batches(queryset, batch_size)
+
+    posts = Post.objects.filter(blog_id=blog_id)
+    while True:
+        ids = list(posts.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += delete_batch(Post.objects.filter(pk__in=ids), batch_size)
+        bump(*[name for pk in ids for name in post_versions(pk)])
+    bump(*list_versions(blog_id), *list_versions())
+
+    deleted += delete_in_batches(Subscription.objects.filter(blog_id=blog_id), batch_size)
+    return deleted + Blog.objects.filter(pk=blog_id).delete()[0]
+
+
+def purge_user(user_id, batch_size):
+    """Delete a user with their blogs, feed and subscriptions, in batches."""
+    deleted = 0
+    for blog_id in Blog.objects.filter(author_id=user_id).values_list('pk', flat=True):
+        deleted += purge_blog(blog_id, batch_size)
+    adjust_subscribers(Subscription.objects.filter(user_id=user_id, is_deleted=False).values('blog_id'), -1)
+    for queryset in (
+            Feed.objects.using(feed_db(user_id)).filter(user_id=user_id),
+            PendingNotification.objects.filter(user_id=user_id),
+            Subscription.objects.filter(user_id=user_id)):
+        deleted += delete_in_batches(queryset, batch_size)
+    # What is left is a handful of rows, which the regular cascade takes care of.
+    return deleted + get_user_model().objects.filter(pk=user_id).delete()[0]
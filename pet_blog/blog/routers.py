@@ -0,0 +1,121 @@
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .shards import feed_db, remote_shards
+
+# Cookie set after a user's own write, keeping their reads on the primary
+# for REPLICA_PIN_SECONDS so they see what they wrote.
+PIN_COOKIE = 'pin_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replicas_allowed = ContextVar('replicas_allowed', default=False)
+
+
+@contextmanager
+def use_replicas(allowed=True):
+    """Let the reads in the block go to REPLICA_DATABASES."""
+    token = _replicas_allowed.set(allowed)
+    try:
+        yield
+    finally:
+        _replicas_allowed.reset(token)
+
+
+class FeedShardRouter:
+    """
+    Send the Feed rows of a user to the shard holding their feed when the
+    query says whose they are: ``user.feed_set`` and saving or deleting a
+    Feed. Other Feed queries choose their shard with using(). Feeds kept in
+    the primary database are left to the next router.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if model._meta.label != 'blog.Feed' or instance is None:
+            return None
+        if isinstance(instance, model):
+            alias = instance._state.db or feed_db(instance.user_id)
+        elif isinstance(instance, get_user_model()):
+            alias = feed_db(instance.pk)
+        else:
+            return None
+        return alias if alias != DEFAULT_DB_ALIAS else None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in remote_shards():
+            return app_label == 'blog' and model_name == 'feed'
+        return None
+
+
+class ReplicaRouter:
+    """
+    Send every write to the primary and, inside use_replicas(), reads to one
+    of REPLICA_DATABASES. Everything else reads the primary: management
+    commands, the worker, and reads in a transaction on the primary, so
+    read-modify-write code sees its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or not _replicas_allowed.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas copy the primary's schema along with its data.
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Serve safe requests from the replicas, unless the user wrote something in
+    the last REPLICA_PIN_SECONDS: every other request pins the user's reads to
+    the primary for that long with the PIN_COOKIE cookie.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Lets the ASGI handler await it, as MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with use_replicas(self.replicas_allowed(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        with use_replicas(self.replicas_allowed(request)):
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+    @staticmethod
+    def replicas_allowed(request):
+        return request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+    @staticmethod
+    def pin(request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
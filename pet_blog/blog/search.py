@@ -0,0 +1,128 @@
+import binascii
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db import connections, router, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+# External-content FTS5 table over blog_post(title, content), kept in sync by
+# the triggers created in migration 0011.
+TABLE = 'blog_post_search'
+
+# Snippet markers, swapped for <mark> once the snippet is escaped.
+START, END = '\x02', '\x03'
+
+
+def match_query(text):
+    """
+    The FTS5 query finding the posts containing every word of ``text``. Each
+    word is quoted, so the user can't write FTS5 syntax; the last one also
+    matches as a prefix. '' if there are no words.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def encode_cursor(rank, pk):
+    return urlsafe_b64encode(f'{rank!r}|{pk}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the (rank, pk) position encoded in ``cursor``, or None if it isn't a valid cursor."""
+    if not cursor:
+        return None
+    try:
+        rank, pk = urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(START, '<mark>').replace(END, '</mark>'))
+
+
+class SearchPage:
+    """
+    A page of ``page_size`` posts matching ``text``, best first, after the
+    (rank, pk) ``cursor``. Every post has ``rank`` and a highlighted ``snippet``.
+    """
+
+    def __init__(self, text, page_size, cursor=None):
+        self.items = []
+        self.has_more = False
+        self.next_cursor = None
+        query = match_query(text)
+        if not query:
+            return
+
+        params = [START, END, query]
+        after = ''
+        if cursor is not None:
+            rank, pk = cursor
+            after = f'AND ({TABLE}.rank > %s OR ({TABLE}.rank = %s AND blog_post.id > %s))'
+            params += [rank, rank, pk]
+        sql = f'''
+            SELECT blog_post.id, blog_post.blog_id, blog_post.title, blog_post.posted, {TABLE}.rank AS rank,
+                   snippet({TABLE}, -1, %s, %s, '…', 24) AS snippet
+            FROM {TABLE} JOIN blog_post ON blog_post.id = {TABLE}.rowid
+            WHERE {TABLE} MATCH %s {after}
+            ORDER BY {TABLE}.rank, blog_post.id
+            LIMIT %s'''
+        posts = list(Post.objects.raw(sql, params + [page_size + 1]))
+
+        self.has_more = len(posts) > page_size
+        self.items = posts[:page_size]
+        for post in self.items:
+            post.snippet = highlight(post.snippet)
+        if self.has_more:
+            last = self.items[-1]
+            self.next_cursor = encode_cursor(last.rank, last.pk)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def rebuild_index(batch_size, progress=None):
+    """
+    Empty the index and fill it again from blog_post ``batch_size`` posts at a
+    time, committing every batch. Posts created meanwhile are indexed by the
+    triggers; searches only see part of the posts until it is done.
+    Returns the number of indexed posts.
+    """
+    using = router.db_for_write(Post)
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MAX(id) FROM blog_post')
+        last_id = cursor.fetchone()[0] or 0
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES('delete-all')")
+
+    indexed, cursor_id = 0, 0
+    while cursor_id < last_id:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT MAX(id), COUNT(*) FROM (SELECT id FROM blog_post WHERE id > %s AND id <= %s '
+                'ORDER BY id LIMIT %s)', [cursor_id, last_id, batch_size])
+            batch_end, count = cursor.fetchone()
+            if not count:
+                break
+            cursor.execute(
+                f'INSERT INTO {TABLE}(rowid, title, content) '
+                f'SELECT id, title, content FROM blog_post WHERE id > %s AND id <= %s',
+                [cursor_id, batch_end])
+        indexed += count
+        cursor_id = batch_end
+        if progress:
+            progress(indexed)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES('optimize')")
+    return indexed
@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.functions import Mod
+
+# Feed rows are spread over the FEED_SHARDS database aliases by user id. The
+# first shard is the primary database, where Feed rows can still be joined
+# with the tables they refer to; the other shards only hold blog_feed, so
+# their rows are matched with the primary's in two steps.
+
+
+def feed_db(user_id):
+    """The alias of the database holding the feed of user ``user_id``."""
+    shards = settings.FEED_SHARDS
+    return shards[user_id % len(shards)]
+
+
+def is_local(user_id):
+    """Whether the feed of user ``user_id`` is in the primary database."""
+    return feed_db(user_id) == DEFAULT_DB_ALIAS
+
+
+def remote_shards():
+    return [alias for alias in settings.FEED_SHARDS if alias != DEFAULT_DB_ALIAS]
+
+
+def by_shard(user_ids):
+    """Map the shards to the ``user_ids`` whose feeds they hold."""
+    shards = defaultdict(list)
+    for user_id in user_ids:
+        shards[feed_db(user_id)].append(user_id)
+    return shards
+
+
+def split_by_shard(queryset, user_field='user_id'):
+    """
+    Split ``queryset`` into one queryset per shard, holding the rows whose
+    ``user_field`` belongs to it, filtered in SQL.
+    """
+    shards = settings.FEED_SHARDS
+    if len(shards) == 1:
+        return [(shards[0], queryset)]
+    queryset = queryset.annotate(_shard=Mod(F(user_field), len(shards)))
+    return [(alias, queryset.filter(_shard=index)) for index, alias in enumerate(shards)]
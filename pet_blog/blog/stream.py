@@ -0,0 +1,155 @@
+import asyncio
+import json
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db.models import Max, Prefetch
+from django.http.cookie import parse_cookie
+from django.urls import reverse
+
+from .asyncviews import in_pool
+from .hub import get_hub
+from .models import Post
+from .shards import is_local
+from .timeline import unread_feeds
+
+# Entries read at most per query; a stream catching up reads them in several.
+BATCH_SIZE = 100
+
+# A comment line, ignored by the browser, keeping an idle connection open through proxies.
+HEARTBEAT = ': ping\n\n'
+
+STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    # Tells nginx not to buffer the events.
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def last_event_id(value):
+    """The Feed id of a Last-Event-ID header, or None."""
+    return int(value) if value and value.isdigit() else None
+
+
+def last_entry_id(user):
+    return user.feed_set.aggregate(latest=Max('pk'))['latest'] or 0
+
+
+def entries_after(user, last_id, limit=BATCH_SIZE):
+    """The unread Feed rows of ``user`` after the one with id ``last_id``, oldest first."""
+    feeds = unread_feeds(user).filter(pk__gt=last_id).order_by('pk')
+    if is_local(user.pk):
+        feeds = feeds.select_related('post').only('user', 'posted', 'post__title')
+    else:
+        feeds = feeds.only('user', 'posted', 'post').prefetch_related(Prefetch('post', Post.objects.only('title')))
+    return list(feeds[:limit])
+
+
+def entry_event(feed):
+    data = json.dumps({
+        'post': feed.post_id,
+        'title': feed.post.title,
+        'url': reverse('blog:post-detail', args=[feed.post_id]),
+        'posted': feed.posted.isoformat(),
+    })
+    return f'id: {feed.pk}\nevent: entry\ndata: {data}\n\n'
+
+
+def cursor_event(last_id):
+    # An id without data moves the browser's Last-Event-ID without firing an event.
+    return f'id: {last_id}\n\n'
+
+
+def retry_field():
+    return f'retry: {settings.FEED_STREAM_RETRY * 1000}\n\n'
+
+
+def catch_up(user, last_id):
+    """
+    A stream answered at once: the entries after ``last_id``, or where the
+    feed stands for a new stream. The browser asks again after
+    FEED_STREAM_RETRY seconds.
+    """
+    if last_id is None:
+        return retry_field() + cursor_event(last_entry_id(user))
+    return retry_field() + ''.join(entry_event(feed) for feed in entries_after(user, last_id))
+
+
+def authenticate(cookie):
+    """The user of the session in the ``cookie`` header."""
+    session_key = parse_cookie(cookie).get(settings.SESSION_COOKIE_NAME)
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    return get_user(SimpleNamespace(session=session))
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class FeedStreamApp:
+    """
+    ASGI application serving the feed stream, and passing every other
+    request on to ``app``. A stream stays open and sends the user's new Feed
+    entries as the hub reports them, resuming after the browser's
+    Last-Event-ID when it reconnects. While idle it is a coroutine waiting
+    on a queue, not a thread, so a worker can hold thousands of them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == reverse('blog:feed-stream'):
+            return await self.stream(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+    async def stream(self, scope, receive, send):
+        headers = dict(scope['headers'])
+        user = await in_pool(authenticate)(headers.get(b'cookie', b'').decode('latin-1'))
+        if not user.is_authenticated:
+            await send({'type': 'http.response.start', 'status': 403, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        last_id = last_event_id(headers.get(b'last-event-id', b'').decode('latin-1'))
+        hub = get_hub()
+        # Listen before reading where the feed stands, so no entry falls in between.
+        queue = hub.subscribe(user.pk)
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': STREAM_HEADERS})
+            pending = last_id is not None
+            if last_id is None:
+                last_id = await in_pool(last_entry_id)(user)
+                await self.send(send, retry_field() + cursor_event(last_id))
+            else:
+                await self.send(send, retry_field())
+            while not disconnected.done():
+                if pending:
+                    entries = await in_pool(entries_after)(user, last_id)
+                    if entries:
+                        last_id = entries[-1].pk
+                        await self.send(send, ''.join(entry_event(feed) for feed in entries))
+                    pending = len(entries) == BATCH_SIZE
+                    if pending:
+                        continue
+                woken = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({woken, disconnected}, timeout=settings.FEED_STREAM_HEARTBEAT,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if woken in done:
+                    pending = True
+                    continue
+                woken.cancel()
+                if not disconnected.done():
+                    await self.send(send, HEARTBEAT)
+        finally:
+            hub.unsubscribe(user.pk, queue)
+            disconnected.cancel()
+
+    @staticmethod
+    async def send(send, text):
+        await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
@@ -0,0 +1,125 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.xmlutils import SimplerXMLGenerator
+
+
+def feed_token(user):
+    """Token authenticating ``user``'s /feed.xml. Changing the password revokes it."""
+    digest = salted_hmac('blog.syndication', f'{user.pk}:{user.password}').hexdigest()
+    return f'{user.pk}-{digest}'
+
+
+def user_for_token(token):
+    pk, _, digest = (token or '').partition('-')
+    if not pk.isdigit():
+        return None
+    user = get_user_model().objects.filter(pk=pk, is_active=True).first()
+    if user is None or not constant_time_compare(feed_token(user), token):
+        return None
+    return user
+
+
+class Chunks(StringIO):
+    def drain(self):
+        chunk = self.getvalue()
+        self.seek(0)
+        self.truncate()
+        return chunk
+
+
+class StreamingFeedMixin:
+    """
+    Write the feed one item at a time with ``stream(items)``, where ``items``
+    holds the keyword arguments of add_item(), instead of building the whole
+    document in memory first.
+    """
+
+    def __init__(self, *args, latest=None, **kwargs):
+        super(StreamingFeedMixin, self).__init__(*args, **kwargs)
+        self.latest = latest
+
+    def latest_post_date(self):
+        # The items aren't known when the header is written.
+        return self.latest or super(StreamingFeedMixin, self).latest_post_date()
+
+    def stream(self, items):
+        out = Chunks()
+        handler = SimplerXMLGenerator(out, 'utf-8', short_empty_elements=True)
+        for _ in self.write_document(handler, items):
+            yield out.drain()
+
+    def write_each_item(self, handler, items):
+        for item in items:
+            self.add_item(**item)
+            self.write_items(handler)
+            self.items.clear()
+            yield
+
+
+class RssFeed(StreamingFeedMixin, feedgenerator.Rss201rev2Feed):
+    def write_document(self, handler, items):
+        handler.startDocument()
+        handler.startElement('rss', self.rss_attributes())
+        handler.startElement('channel', self.root_attributes())
+        self.add_root_elements(handler)
+        yield
+        yield from self.write_each_item(handler, items)
+        self.endChannelElement(handler)
+        handler.endElement('rss')
+        yield
+
+
+class AtomFeed(StreamingFeedMixin, feedgenerator.Atom1Feed):
+    def write_document(self, handler, items):
+        handler.startDocument()
+        handler.startElement('feed', self.root_attributes())
+        self.add_root_elements(handler)
+        yield
+        yield from self.write_each_item(handler, items)
+        handler.endElement('feed')
+        yield
+
+
+class JsonFeed(StreamingFeedMixin, feedgenerator.SyndicationFeed):
+    # Spec: https://www.jsonfeed.org/version/1.1/
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def stream(self, items):
+        head = {
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.feed['title'],
+            'home_page_url': self.feed['link'],
+            'feed_url': self.feed['feed_url'],
+            'description': self.feed['description'],
+        }
+        yield json.dumps(head)[:-1] + ', "items": ['
+        for i, item in enumerate(items):
+            self.add_item(**item)
+            item = self.items.pop()
+            entry = {
+                'id': item['unique_id'],
+                'url': item['link'],
+                'title': item['title'],
+                'content_text': item['description'],
+                'date_published': item['pubdate'].isoformat(),
+                'authors': [{'name': item['author_name']}],
+            }
+            yield (', ' if i else '') + json.dumps(entry)
+        yield ']}'
+
+
+def post_item(request, post, author):
+    link = request.build_absolute_uri(reverse('blog:post-detail', args=[post.pk]))
+    return {
+        'title': post.title,
+        'link': link,
+        'description': post.content,
+        'author_name': str(author),
+        'pubdate': post.posted,
+        'unique_id': link,
+    }
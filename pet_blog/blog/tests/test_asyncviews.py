@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+
+from ..asyncviews import AsyncViewsHandler, render_view
+
+
+@override_settings(ROOT_URLCONF=settings.ASGI_URLCONF)
+class AsyncViewsTest(TransactionTestCase):
+    # The views run in other threads, with connections of their own, so the fixtures are committed.
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        self.threads = []
+
+        def record(*args, **kwargs):
+            self.threads.append(threading.current_thread().name)
+            return render_view(*args, **kwargs)
+        patcher = mock.patch('blog.asyncviews.render_view', record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_views_are_coroutines_under_asgi_only(self):
+        for url in (reverse('blog:posts'), reverse('blog:post-detail', args=[1]), reverse('blog:feed')):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func))
+            self.assertFalse(asyncio.iscoroutinefunction(resolve(url, urlconf='pet_blog.urls').func))
+
+    async def test_asgi_runs_views_in_the_pool(self):
+        response = await self.async_client.get(reverse('blog:posts'))
+        self.assertContains(response, 'Test post 10')
+        response = await self.async_client.get(reverse('blog:post-detail', args=[1]))
+        self.assertContains(response, 'Test content 1')
+        self.assertEqual(len(self.threads), 2)
+        self.assertTrue(all(name.startswith('async-view') for name in self.threads))
+
+    def test_asgi_feed(self):
+        self.async_client.force_login(get_user_model().objects.get(pk=1))
+
+        async def get():
+            return await self.async_client.get(reverse('blog:feed'))
+        response = async_to_sync(get)()
+        self.assertContains(response, 'Test post 4')
+        self.assertTrue(response.has_header('ETag'))
+
+    async def test_handler_serves_async_views(self):
+        messages = []
+        scope = {'type': 'http', 'method': 'GET', 'path': reverse('blog:posts'), 'query_string': b'',
+                 'headers': [(b'host', b'testserver')]}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        with override_settings(ROOT_URLCONF='pet_blog.urls'):
+            await AsyncViewsHandler()(scope, receive, send)
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(len(self.threads), 1)
+        self.assertTrue(self.threads[0].startswith('async-view'))
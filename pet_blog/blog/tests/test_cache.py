@@ -0,0 +1,127 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import get_or_set, get_or_stream, stats
+from ..models import Post
+from ..purge import purge_blog
+
+
+class ResponseCacheTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(url, params)
+
+    def save(self, post, **fields):
+        for name, value in fields.items():
+            setattr(post, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+
+    def test_cached_page_costs_no_queries(self):
+        url = reverse('blog:post-detail', args=[1])
+        self.get(url)
+        with self.assertNumQueries(0):
+            resp = self.get(url)
+        self.assertContains(resp, 'Test content 1')
+        self.assertEqual(stats(), {'hits': 1, 'misses': 1})
+
+    def test_saving_post_retires_its_pages(self):
+        post = Post.objects.get(pk=1)
+        self.get(reverse('blog:post-detail', args=[1]))
+        self.get(reverse('blog:posts'))
+        self.get(reverse('blog:posts'), blog=1)
+
+        self.save(post, title='Edited title')
+
+        self.assertContains(self.get(reverse('blog:post-detail', args=[1])), 'Edited title')
+        self.assertContains(self.get(reverse('blog:posts')), 'Edited title')
+        self.assertContains(self.get(reverse('blog:posts'), blog=1), 'Edited title')
+
+    def test_saving_post_keeps_other_pages(self):
+        self.get(reverse('blog:post-detail', args=[1]))
+        self.get(reverse('blog:posts'), blog=1)
+
+        self.save(Post.objects.get(pk=4), title='Edited title')
+
+        with self.assertNumQueries(0):
+            self.get(reverse('blog:post-detail', args=[1]))
+            self.get(reverse('blog:posts'), blog=1)
+
+    def test_deleting_post_retires_its_pages(self):
+        self.get(reverse('blog:post-detail', args=[1]))
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.get(pk=1).delete()
+        self.assertEqual(self.get(reverse('blog:post-detail', args=[1])).status_code, 404)
+
+    def test_purged_blog_pages_are_retired(self):
+        self.get(reverse('blog:post-detail', args=[4]))
+        self.get(reverse('blog:posts'))
+
+        purge_blog(2, batch_size=2)
+
+        self.assertEqual(self.get(reverse('blog:post-detail', args=[4])).status_code, 404)
+        self.assertNotContains(self.get(reverse('blog:posts')), 'Test post 4')
+
+    def test_errors_are_not_cached(self):
+        self.get(reverse('blog:post-detail', args=[99]))
+        self.assertEqual(stats(), {'hits': 0, 'misses': 1})
+        self.get(reverse('blog:post-detail', args=[99]))
+        self.assertEqual(stats(), {'hits': 0, 'misses': 2})
+
+    def test_logged_in_users_get_cached_fragments(self):
+        self.client.login(username='User1', password='pass')
+        self.get(reverse('blog:post-detail', args=[1]))
+        # update() goes around Post.save, so nothing is retired.
+        Post.objects.filter(pk=1).update(content='Changed behind the cache')
+
+        resp = self.get(reverse('blog:post-detail', args=[1]))
+        self.assertContains(resp, 'Test content 1')
+        self.assertContains(resp, 'User1')
+
+
+class SingleFlightTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_renders_missing_value_once(self):
+        render = mock.Mock(return_value='page')
+        self.assertEqual(get_or_set('key', render, 60), 'page')
+        self.assertEqual(get_or_set('key', render, 60), 'page')
+        render.assert_called_once()
+
+    def test_waits_for_the_process_holding_the_lock(self):
+        cache.add('key:lock', 1)
+        render = mock.Mock(return_value='page')
+
+        with mock.patch('blog.cache.time.sleep', side_effect=lambda seconds: cache.set('key', 'rendered elsewhere')):
+            value = get_or_set('key', render, 60)
+
+        self.assertEqual(value, 'rendered elsewhere')
+        render.assert_not_called()
+
+    @override_settings(PAGE_CACHE_LOCK_TIMEOUT=0)
+    def test_renders_itself_when_the_lock_times_out(self):
+        cache.add('key:lock', 1)
+        self.assertEqual(get_or_set('key', lambda: 'page', 60), 'page')
+
+    def test_uncacheable_values_are_returned_but_not_cached(self):
+        get_or_set('key', lambda: 'error', 60, cacheable=lambda value: False)
+        self.assertIsNone(cache.get('key'))
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_unread_stream_takes_no_lock(self):
+        stream = mock.Mock(return_value=iter(['pa', 'ge']))
+        chunks = get_or_stream('key', stream, 60)
+        self.assertIsNone(cache.get('key:lock'))
+        del chunks
+        self.assertEqual(''.join(get_or_stream('key', stream, 60)), 'page')
+        self.assertEqual(cache.get('key'), 'page')
+        self.assertIsNone(cache.get('key:lock'))
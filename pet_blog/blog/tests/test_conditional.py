@@ -0,0 +1,128 @@
+import gzip
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..fanout import fan_out_post
+from ..models import Blog, Feed, Post
+
+
+class ConditionalGetTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(url, **headers)
+
+    def get_feed(self):
+        self.client.login(username='User1', password='pass')
+        # The first response sets the CSRF cookie, which is part of the ETag.
+        self.get(reverse('blog:feed'))
+        return self.get(reverse('blog:feed'))
+
+    def assertNotModified(self, url, resp, **headers):
+        headers.setdefault('HTTP_IF_NONE_MATCH', resp['ETag'])
+        self.assertEqual(self.get(url, **headers).status_code, 304)
+
+    def test_post_list(self):
+        url = reverse('blog:posts')
+        resp = self.get(url)
+
+        self.assertIn('no-cache', resp['Cache-Control'])
+        self.assertIn('Cookie', resp['Vary'])
+        self.assertNotModified(url, resp)
+
+    def test_post_list_changes_with_new_post(self):
+        url = reverse('blog:posts')
+        resp = self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(blog_id=1, title='New post', content='')
+
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+
+    def test_post_detail(self):
+        url = reverse('blog:post-detail', args=[1])
+        resp = self.get(url)
+        self.assertNotModified(url, resp)
+
+        post = Post.objects.get(pk=1)
+        post.content = 'Edited'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+
+    def test_edited_post_is_not_answered_by_date(self):
+        # Editing a post keeps its posted time, so only the ETag tells the versions apart.
+        url = reverse('blog:post-detail', args=[1])
+        resp = self.get(url)
+        self.assertNotIn('Last-Modified', resp)
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE='Sun, 19 Dec 2021 13:53:10 GMT').status_code, 200)
+
+    def test_not_modified_costs_no_queries(self):
+        url = reverse('blog:post-detail', args=[1])
+        resp = self.get(url)
+        with self.assertNumQueries(0):
+            self.assertNotModified(url, resp)
+
+    def test_pages_differ_per_user(self):
+        url = reverse('blog:posts')
+        anonymous = self.get(url)
+        self.client.login(username='User1', password='pass')
+        resp = self.get(url)
+
+        self.assertNotEqual(resp['ETag'], anonymous['ETag'])
+        self.assertIn('private', resp['Cache-Control'])
+
+    def test_feed(self):
+        url = reverse('blog:feed')
+        resp = self.get_feed()
+        self.assertIn('private', resp['Cache-Control'])
+        self.assertNotModified(url, resp)
+
+        post = Post.objects.bulk_create([Post(blog_id=2, title='New post', content='')])[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            fan_out_post(post)
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+
+    def test_feed_changes_with_edited_post(self):
+        url = reverse('blog:feed')
+        resp = self.get_feed()
+        self.assertNotModified(url, resp)
+
+        post = Post.objects.get(pk=6)
+        post.title = 'Edited'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+
+    def test_feed_changes_with_pulled_posts(self):
+        Blog.objects.filter(pk=3).update(fan_out_on_read=True)
+        Feed.objects.filter(blog_id=3).delete()
+        url = reverse('blog:feed')
+        resp = self.get_feed()
+        self.assertNotModified(url, resp)
+
+        Post.objects.bulk_create([Post(blog_id=3, title='Pulled post', content='')])
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+
+    def test_feed_changes_when_read(self):
+        url = reverse('blog:feed')
+        resp = self.get_feed()
+        self.assertNotModified(url, resp)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'feeds': [1]})
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+
+    def test_gzip(self):
+        url = reverse('blog:posts')
+        resp = self.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resp['Vary'])
+        self.assertIn(b'Test post 10', gzip.decompress(resp.content))
+        self.assertTrue(resp['ETag'].startswith('W/'))
+        self.assertNotModified(url, resp, HTTP_ACCEPT_ENCODING='gzip')
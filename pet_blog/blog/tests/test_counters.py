@@ -0,0 +1,120 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..fanout import fan_out_post
+from ..models import Blog, Feed, Post, UnreadCounter
+
+
+class UnreadCounterTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        cache.clear()
+        # User1 has 5 unread Feed rows: posts 4-6 and 8-9.
+        self.user = get_user_model().objects.get(pk=1)
+
+    def test_first_read_creates_counter(self):
+        self.assertEqual(counters.unread_count(self.user), 5)
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).unread, 5)
+
+    def test_cached_count_costs_no_queries(self):
+        counters.unread_count(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.unread_count(self.user), 5)
+
+    def test_adjust_invalidates_cache(self):
+        counters.unread_count(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.adjust([self.user.pk], -2)
+        self.assertEqual(counters.unread_count(self.user), 3)
+
+    def test_fan_out_increments_subscribers(self):
+        counters.unread_count(self.user)
+        post = Post.objects.bulk_create([Post(blog_id=2, title='New post', content='')])[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            fan_out_post(post)
+        self.assertEqual(counters.unread_count(self.user), 6)
+
+    def test_counts_pulled_posts(self):
+        Blog.objects.filter(pk=3).update(fan_out_on_read=True)
+        Feed.objects.filter(post__blog_id=3, is_read=False).delete()
+        # Posts 8 and 9 are now pulled instead of pushed.
+        self.assertEqual(counters.unread_count(self.user), 5)
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).unread, 3)
+
+    def test_reconcile_repairs_drift(self):
+        counters.refresh(self.user)
+        UnreadCounter.objects.filter(user=self.user).update(unread=42)
+        UnreadCounter.objects.create(user_id=2, unread=0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            repaired = counters.reconcile(batch_size=1)
+
+        self.assertEqual(repaired, 1)
+        self.assertEqual(counters.unread_count(self.user), 5)
+
+    def test_reconcile_command(self):
+        UnreadCounter.objects.create(user=self.user, unread=42)
+        out = StringIO()
+        call_command('reconcile_unread_counts', stdout=out)
+        self.assertIn('Repaired 1 counters', out.getvalue())
+
+
+class BlogCountsTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_adjust_subscribers(self):
+        counters.adjust_subscribers([2, 3], 2)
+        self.assertEqual(list(Blog.objects.order_by('pk').values_list('subscriber_count', flat=True)), [0, 3, 3, 0])
+
+    def test_reconcile_repairs_drift(self):
+        Blog.objects.filter(pk=2).update(subscriber_count=7)
+        Blog.objects.filter(pk=4).update(post_count=0)
+        self.assertEqual(counters.reconcile_blogs(batch_size=1), 2)
+        self.assertEqual(list(Blog.objects.order_by('pk').values_list('subscriber_count', 'post_count')),
+                         [(0, 3), (1, 3), (1, 3), (0, 1)])
+
+    def test_reconcile_command(self):
+        Blog.objects.filter(pk=1).update(post_count=42)
+        out = StringIO()
+        call_command('reconcile_blog_counts', stdout=out)
+        self.assertIn('Repaired 1 blogs', out.getvalue())
+
+
+class UnreadBadgeTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='User1', password='pass')
+
+    def test_badge_shows_unread_count(self):
+        resp = self.client.get(reverse('blog:posts'))
+        self.assertEqual(resp.context['unread_count'](), 5)
+        self.assertContains(resp, '<span class="badge bg-secondary">5</span>', html=True)
+
+    def test_mark_read_decrements_count(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog:feed'), {'feeds': [1, 2]})
+        self.assertEqual(counters.unread_count(get_user_model().objects.get(pk=1)), 3)
+
+    def test_mark_all_read_resets_count(self):
+        self.client.post(reverse('blog:feed'), {'mark_all': ''})
+        self.assertEqual(counters.unread_count(get_user_model().objects.get(pk=1)), 0)
+
+    def test_unsubscribe_drops_blog_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog:subscriptions'), {'subscriptions': [1]})
+        # Posts 4-6 of User2's blog go away, posts 8-9 stay.
+        self.assertEqual(counters.unread_count(get_user_model().objects.get(pk=1)), 2)
+
+    def test_anonymous_has_no_badge(self):
+        self.client.logout()
+        resp = self.client.get(reverse('blog:posts'))
+        self.assertNotIn('unread_count', resp.context)
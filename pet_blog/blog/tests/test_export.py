@@ -0,0 +1,94 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..export import export, gzipped
+
+
+class ExportTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        self.user = get_user_model().objects.get(pk=1)
+
+    def test_ndjson(self):
+        lines = [json.loads(line) for line in export(self.user, 'ndjson', ['posts', 'feed', 'subscriptions'])]
+        self.assertEqual([line['type'] for line in lines], ['posts'] * 3 + ['feed'] * 6 + ['subscriptions'] * 2)
+        self.assertEqual(lines[0], {'type': 'posts', 'id': 1, 'title': 'Test post 1', 'content': 'Test content 1',
+                                    'posted': '2021-12-19T13:53:10.795Z'})
+        self.assertEqual(lines[3]['author'], 'User2')
+        self.assertEqual(lines[-1]['blog_id'], 3)
+
+    def test_csv(self):
+        rows = list(csv.reader(''.join(export(self.user, 'csv', ['feed'])).splitlines()))
+        self.assertEqual(rows[0], ['post_id', 'posted', 'is_read', 'title', 'author'])
+        self.assertEqual(len(rows), 7)
+
+    def test_csv_header_without_rows(self):
+        user = get_user_model().objects.get(pk=2)
+        self.assertEqual(''.join(export(user, 'csv', ['subscriptions'])), 'id,blog_id,read_until,author\r\n')
+
+    def test_gzipped(self):
+        chunks = export(self.user, 'ndjson', ['posts'])
+        self.assertEqual(gzip.decompress(b''.join(gzipped(chunks))).decode().count('\n'), 3)
+
+    def test_reads_in_chunks(self):
+        with self.assertNumQueries(1):
+            # Nothing is read before the first chunk is asked for.
+            chunks = export(self.user, 'ndjson', ['posts', 'feed'])
+            next(chunks)
+
+
+class ExportViewTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        self.client.login(username='User1', password='pass')
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('blog:export', args=['posts', 'csv'])).status_code, 302)
+
+    def test_streams_export(self):
+        resp = self.client.get(reverse('blog:export', args=['all', 'ndjson']))
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(resp['Content-Disposition'], 'attachment; filename="pet-blog-all.ndjson"')
+        self.assertEqual(b''.join(resp.streaming_content).count(b'\n'), 11)
+
+    def test_gzip(self):
+        resp = self.client.get(reverse('blog:export', args=['posts', 'csv']), {'gzip': 1})
+        self.assertEqual(resp['Content-Type'], 'application/gzip')
+        self.assertEqual(resp['Content-Disposition'], 'attachment; filename="pet-blog-posts.csv.gz"')
+        self.assertEqual(gzip.decompress(b''.join(resp.streaming_content)).count(b'\r\n'), 4)
+
+    def test_unknown_export(self):
+        for section, kind in (('all', 'csv'), ('users', 'ndjson'), ('posts', 'xml')):
+            self.assertEqual(self.client.get(reverse('blog:export', args=[section, kind])).status_code, 404)
+
+
+class ExportDataCommandTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.ndjson.gz')
+            call_command('export_data', 'User1', '--section', 'subscriptions', '--gzip', '-o', path, stderr=StringIO())
+            with gzip.open(path, 'rt') as export_file:
+                self.assertEqual([json.loads(line)['blog_id'] for line in export_file], [2, 3])
+
+    def test_csv_needs_one_section(self):
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'User1', '--format', 'csv')
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'Nobody')
@@ -0,0 +1,144 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from ..fanout import backfill_subscription, fan_out_post
+from ..messaging import get_broker
+from ..models import Blog, Post, Subscription, Feed, UnreadCounter
+from ..timeline import pulled_posts
+
+
+class FanOutPostTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        blog = Blog.objects.get(pk=3)
+        Subscription.objects.create(user=get_user_model().objects.get(pk=4), blog=blog)
+        # bulk_create bypasses Post.save, so nothing is fanned out yet.
+        self.post = Post.objects.bulk_create([Post(blog=blog, title='Fan-out', content='')])[0]
+
+    def test_creates_feed_row_per_subscriber(self):
+        created = fan_out_post(self.post)
+
+        self.assertEqual(created, 2)
+        feeds = Feed.objects.filter(post=self.post)
+        self.assertEqual(set(feeds.values_list('user_id', flat=True)), {1, 4})
+        self.assertFalse(feeds.filter(is_read=True).exists())
+        for feed in feeds:
+            self.assertEqual(feed.subscription.user_id, feed.user_id)
+
+    def test_is_idempotent(self):
+        fan_out_post(self.post)
+        created = fan_out_post(self.post)
+
+        self.assertEqual(created, 0)
+        self.assertEqual(Feed.objects.filter(post=self.post).count(), 2)
+
+    def test_uses_set_based_queries(self):
+        # Counting the subscribers, reading the rows already copied, a single INSERT ... SELECT and
+        # a single counter UPDATE, inside a savepoint.
+        with self.assertNumQueries(6):
+            fan_out_post(self.post)
+
+    def test_counts_only_inserted_rows(self):
+        subscription = Subscription.objects.get(user_id=4, blog_id=3)
+        Feed.objects.create(user_id=4, post=self.post, subscription=subscription, blog_id=3,
+                            posted=self.post.posted)
+        UnreadCounter.objects.create(user_id=1, unread=0)
+        UnreadCounter.objects.create(user_id=4, unread=1)
+
+        created = fan_out_post(self.post)
+
+        self.assertEqual(created, 1)
+        self.assertEqual(UnreadCounter.objects.get(user_id=1).unread, 1)
+        self.assertEqual(UnreadCounter.objects.get(user_id=4).unread, 1)
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_high_fanout_blog_is_not_fanned_out(self):
+        created = fan_out_post(self.post)
+
+        self.assertEqual(created, 0)
+        self.assertFalse(Feed.objects.filter(post=self.post).exists())
+        self.assertTrue(Blog.objects.get(pk=3).fan_out_on_read)
+
+    def test_fan_out_on_read_blog_skips_subscriber_count(self):
+        self.post.blog.fan_out_on_read = True
+        with self.assertNumQueries(0):
+            fan_out_post(self.post)
+
+    def test_post_update_does_not_fan_out_again(self):
+        post = Post.objects.create(title='Test title', blog=Blog.objects.get(pk=2))
+        get_broker().consume()
+        post.title = 'Updated title'
+        post.save()
+        get_broker().consume()
+
+        self.assertEqual(Feed.objects.filter(post=post).count(), 1)
+
+
+class BackfillTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        # User4 subscribes to User1's blog, with posts 1-3.
+        self.subscription = Subscription.objects.create(user_id=4, blog_id=1)
+
+    def feed_posts(self):
+        return list(Feed.objects.filter(user_id=4).values_list('post_id', flat=True))
+
+    def test_copies_newest_posts(self):
+        created, last = backfill_subscription(self.subscription, 2)
+
+        self.assertEqual(created, 2)
+        self.assertEqual(self.feed_posts(), [3, 2])
+        self.assertEqual(last, (Post.objects.get(pk=2).posted, 2))
+        feed = Feed.objects.get(user_id=4, post_id=3)
+        self.assertEqual((feed.subscription, feed.blog_id, feed.posted),
+                         (self.subscription, 1, Post.objects.get(pk=3).posted))
+
+    def test_continues_after_cursor(self):
+        _, last = backfill_subscription(self.subscription, 2)
+        created, last = backfill_subscription(self.subscription, 2, last)
+
+        self.assertEqual(created, 1)
+        self.assertIsNone(last)
+        self.assertEqual(self.feed_posts(), [3, 2, 1])
+
+    def test_since_limits_history(self):
+        created, last = backfill_subscription(self.subscription, 10, since=Post.objects.get(pk=2).posted)
+
+        self.assertEqual(created, 2)
+        self.assertIsNone(last)
+
+    @override_settings(FEED_BACKFILL_POSTS=1)
+    def test_subscribe_copies_latest_posts(self):
+        self.subscription.delete()
+        self.client.login(username='User4', password='pass')
+        self.client.post(reverse('blog:blogs'), {'blogs': [1]})
+
+        self.assertEqual(self.feed_posts(), [3])
+
+    @override_settings(FEED_BACKFILL_POSTS=1)
+    def test_subscribe_to_pulled_blog_marks_older_posts_read(self):
+        self.subscription.delete()
+        Blog.objects.filter(pk=1).update(fan_out_on_read=True)
+        self.client.login(username='User4', password='pass')
+        self.client.post(reverse('blog:blogs'), {'blogs': [1]})
+
+        subscription = Subscription.objects.get(user_id=4, blog_id=1)
+        self.assertEqual(subscription.read_until, Post.objects.get(pk=2).posted)
+        self.assertEqual(list(pulled_posts(subscription.user).values_list('pk', flat=True)), [3])
+        self.assertEqual(self.feed_posts(), [])
+
+    @override_settings(FEED_BACKFILL_POSTS=1, FEED_BACKFILL_ASYNC=1, FEED_BACKFILL_BATCH_SIZE=1)
+    def test_worker_copies_rest_in_batches(self):
+        self.subscription.delete()
+        self.client.login(username='User4', password='pass')
+        self.client.post(reverse('blog:blogs'), {'blogs': [1]})
+
+        batches = 0
+        while get_broker().consume():
+            batches += 1
+        self.assertEqual(self.feed_posts(), [3, 2, 1])
+        # Posts 3, 2 and 1, then an empty batch past the end.
+        self.assertEqual(batches, 4)
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import counters
+from ..export import export
+from ..importer import import_posts, json_items, read_rows
+from ..models import Blog, Feed, Post, UnreadCounter
+
+
+class JsonItemsTest(TestCase):
+    def test_items_across_chunks(self):
+        items = [{'title': f'Post {i}', 'content': 'x' * i} for i in range(20)]
+        self.assertEqual(list(json_items(StringIO(json.dumps(items)), chunk_size=7)), items)
+
+    def test_empty_array(self):
+        self.assertEqual(list(json_items(StringIO(' [ ] '))), [])
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(json_items(StringIO('{"title": "Post"}')))
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            list(json_items(StringIO('[{"title": "Post"}, {"title"'), chunk_size=4))
+
+
+class ImportPostsTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        # User1 subscribes to User2's blog.
+        self.blog = Blog.objects.get(pk=2)
+        self.user = get_user_model().objects.get(pk=1)
+
+    def test_keeps_posted(self):
+        rows = [{'title': 'Old post', 'content': 'Old', 'posted': '2015-06-01T10:00:00Z'},
+                {'title': 'Naive post', 'posted': '2015-06-02 10:00:00'}]
+        self.assertEqual(import_posts(self.blog, rows), (2, 2))
+
+        self.assertEqual(Post.objects.get(title='Old post').posted, datetime(2015, 6, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(Post.objects.get(title='Naive post').posted.year, 2015)
+        # The field is back to normal afterwards.
+        self.assertTrue(Post._meta.get_field('posted').auto_now_add)
+
+    def test_batches_and_fan_out(self):
+        counters.refresh(self.user)
+        rows = [{'title': f'Imported {i}', 'posted': f'2022-01-01T00:{i:02d}:00Z'} for i in range(25)]
+        with mock.patch('blog.models.publish') as publish:
+            self.assertEqual(import_posts(self.blog, rows, batch_size=10), (25, 25))
+
+        publish.assert_not_called()
+        self.assertEqual(Feed.objects.filter(user=self.user, post__title__startswith='Imported').count(), 25)
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).unread, 5 + 25)
+
+    def test_fan_out_on_read_blog(self):
+        Blog.objects.filter(pk=2).update(fan_out_on_read=True)
+        self.blog.refresh_from_db()
+        self.assertEqual(import_posts(self.blog, [{'title': 'Imported'}]), (1, 0))
+
+    def test_invalid_row(self):
+        rows = [{'title': 'Good'}, {'title': 'Bad', 'posted': 'yesterday'}]
+        with self.assertRaisesMessage(ValueError, 'Row 2: invalid posted time'):
+            import_posts(self.blog, rows, batch_size=1)
+        # The batches before the error are kept and fanned out.
+        self.assertTrue(Feed.objects.filter(user=self.user, post__title='Good').exists())
+        self.assertTrue(Post._meta.get_field('posted').auto_now_add)
+
+    def test_imports_an_export(self):
+        dump = ''.join(export(get_user_model().objects.get(pk=3), 'ndjson', ['posts', 'subscriptions']))
+        self.assertEqual(import_posts(self.blog, read_rows(StringIO(dump), 'ndjson')), (3, 3))
+
+    def test_csv(self):
+        rows = read_rows(StringIO('title,content,posted\r\nFrom CSV,"Hello, world",2020-01-01T00:00:00Z\r\n'), 'csv')
+        import_posts(self.blog, rows)
+        self.assertEqual(Post.objects.get(title='From CSV').content, 'Hello, world')
+
+
+class ImportPostsCommandTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_import(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.json')
+            with open(path, 'w') as file:
+                json.dump([{'title': f'Imported {i}'} for i in range(3)], file)
+            out = StringIO()
+            call_command('import_posts', 'User2', path, stdout=out)
+        self.assertIn('Imported 3 posts and 3 feed rows', out.getvalue())
+        self.assertEqual(Post.objects.filter(blog_id=2, title__startswith='Imported').count(), 3)
+
+    def test_unknown_format(self):
+        with self.assertRaises(CommandError):
+            call_command('import_posts', 'User2', 'posts.txt')
+
+    def test_unknown_blog(self):
+        with self.assertRaises(CommandError):
+            call_command('import_posts', 'Nobody', 'posts.json')
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from ..messaging import consumer, dispatch, _consumers
+from ..messaging.db import DatabaseBroker
+from ..messaging.local import ThreadPoolBroker
+from ..models import Blog, Post, Feed, Message
+
+
+class ConsumerTestMixin:
+    def setUp(self):
+        self.received = []
+        consumer('test')(self.receive)
+        self.addCleanup(_consumers.pop, 'test')
+
+    def receive(self, payload):
+        if payload.get('fail'):
+            raise ValueError('Consumer failed')
+        self.received.append(payload)
+
+
+class DispatchTest(ConsumerTestMixin, TestCase):
+    def test_dispatch_calls_topic_consumers(self):
+        dispatch('test', {'n': 1})
+        dispatch('other', {'n': 2})
+        self.assertEqual(self.received, [{'n': 1}])
+
+
+class DatabaseBrokerTest(ConsumerTestMixin, TestCase):
+    def setUp(self):
+        super(DatabaseBrokerTest, self).setUp()
+        self.broker = DatabaseBroker(max_attempts=2, retry_delay=0)
+
+    def test_publish_stores_message(self):
+        self.broker.publish('test', {'n': 1})
+        message = Message.objects.get()
+        self.assertEqual(message.topic, 'test')
+        self.assertEqual(message.payload, {'n': 1})
+        self.assertEqual(self.received, [])
+
+    def test_consume_delivers_and_deletes_messages(self):
+        self.broker.publish('test', {'n': 1})
+        self.broker.publish('test', {'n': 2})
+
+        self.assertEqual(self.broker.consume(), 2)
+        self.assertEqual(self.received, [{'n': 1}, {'n': 2}])
+        self.assertFalse(Message.objects.exists())
+
+    def test_consume_respects_batch_size(self):
+        for n in range(3):
+            self.broker.publish('test', {'n': n})
+
+        self.assertEqual(self.broker.consume(batch_size=2), 2)
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_leased_message_is_not_delivered_twice(self):
+        self.broker.publish('test', {'n': 1})
+        self.broker.lease_messages(10)
+
+        self.assertEqual(self.broker.consume(), 0)
+        Message.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.broker.consume(), 1)
+
+    def test_failed_message_is_retried_then_dead(self):
+        self.broker.publish('test', {'fail': True})
+
+        with self.assertLogs('blog.messaging.db', 'WARNING'):
+            self.broker.consume()
+        message = Message.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertIsNone(message.lease_id)
+        self.assertEqual(message.last_error, 'Consumer failed')
+
+        with self.assertLogs('blog.messaging.db', 'ERROR'):
+            self.broker.consume()
+        message = Message.objects.get()
+        self.assertEqual(message.attempts, 2)
+        self.assertIsNone(message.available_at)
+        self.assertEqual(self.broker.consume(), 0)
+
+
+class ThreadPoolBrokerTest(ConsumerTestMixin, TestCase):
+    def test_publish_delivers_after_commit(self):
+        broker = ThreadPoolBroker(workers=1, retry_delay=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            broker.publish('test', {'n': 1})
+            self.assertEqual(self.received, [])
+        broker.executor.shutdown(wait=True)
+
+        self.assertEqual(self.received, [{'n': 1}])
+
+
+class RunWorkerCommandTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_run_worker_once_delivers_post_published(self):
+        post = Post.objects.create(title='Test title', blog=Blog.objects.get(pk=2))
+
+        call_command('run_worker', once=True, stdout=StringIO())
+
+        self.assertTrue(Feed.objects.filter(post=post, user_id=1).exists())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(Message.objects.exists())
@@ -3,7 +3,8 @@ from django.db import models
 from django.core import mail
 from django.contrib.auth import get_user_model
 
-from ..models import Blog, Post, Subscription, Feed
+from ..messaging import get_broker
+from ..models import Blog, Post, Subscription, Feed, Message
 
 
 class BlogModelTest(TestCase):
@@ -90,6 +91,7 @@ class PostModelTest(TestCase):
         subscriber = get_user_model().objects.get(pk=1)
         subscription = Subscription.objects.get(pk=1)
         post = Post.objects.create(title='Test title', blog=blog)
+        get_broker().consume()
         feed = Feed.objects.get(pk=7)
 
         self.assertEqual(feed.user, subscriber)
@@ -99,6 +101,26 @@ class PostModelTest(TestCase):
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].subject, 'New post')
 
+    def test_save_method_only_enqueues_side_effects(self):
+        blog = Blog.objects.get(id=2)
+        with self.assertNumQueries(5):
+            post = Post.objects.create(title='Test title', blog=blog)
+
+        self.assertFalse(Feed.objects.filter(post=post).exists())
+        self.assertEqual(len(mail.outbox), 0)
+        message = Message.objects.get()
+        self.assertEqual(message.topic, 'post_published')
+        self.assertEqual(message.payload, {'post_id': post.pk})
+
+    def test_post_count(self):
+        post = Post.objects.create(title='Test title', blog_id=2)
+        self.assertEqual(Blog.objects.get(pk=2).post_count, 4)
+        post.title = 'Updated title'
+        post.save()
+        self.assertEqual(Blog.objects.get(pk=2).post_count, 4)
+        post.delete()
+        self.assertEqual(Blog.objects.get(pk=2).post_count, 3)
+
     def test_object_name_is_title(self):
         post = Post.objects.get(id=1)
         expected_object_name = post.title
@@ -215,7 +237,7 @@ class FeedModelTest(TestCase):
     def test_ordering(self):
         feed = Feed.objects.get(id=1)
         ordering = feed._meta.ordering
-        self.assertEqual(ordering, ['-post__posted'])
+        self.assertEqual(ordering, ['-posted'])
 
     def test_unique_together(self):
         feed = Feed.objects.get(id=1)
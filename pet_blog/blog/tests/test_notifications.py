@@ -0,0 +1,157 @@
+from smtplib import SMTPException
+
+from django.test import TestCase, override_settings
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+
+from ..messaging import get_broker
+from ..models import Blog, Post, NotificationPreference, PendingNotification, Subscription
+from ..notifications import NotificationDispatcher, new_post_messages, digest_messages, send_digests
+
+
+class FlakyEmailBackend(EmailBackend):
+    opened = 0
+    reopen_failures = 0
+    successes = 0
+    failures = 0
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        if FlakyEmailBackend.opened > 1 and FlakyEmailBackend.reopen_failures:
+            FlakyEmailBackend.reopen_failures -= 1
+            raise ConnectionRefusedError('Connection refused')
+        return True
+
+    def send_messages(self, messages):
+        if FlakyEmailBackend.successes:
+            FlakyEmailBackend.successes -= 1
+        elif FlakyEmailBackend.failures:
+            FlakyEmailBackend.failures -= 1
+            raise SMTPException('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
+def messages(count):
+    return (EmailMessage('New post', 'Body', 'from@pet-blog.com', [f'user{i}@example.com'])
+            for i in range(count))
+
+
+@override_settings(EMAIL_BACKEND='blog.tests.test_notifications.FlakyEmailBackend')
+class NotificationDispatcherTest(TestCase):
+    def setUp(self):
+        FlakyEmailBackend.opened = 0
+        FlakyEmailBackend.reopen_failures = 0
+        FlakyEmailBackend.successes = 0
+        FlakyEmailBackend.failures = 0
+
+    def test_sends_in_batches_over_one_connection(self):
+        dispatcher = NotificationDispatcher(batch_size=4, retry_delay=0)
+        sent = dispatcher.send(messages(10))
+
+        self.assertEqual(sent, 10)
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+        self.assertEqual([stats.size for stats in dispatcher.stats], [4, 4, 2])
+
+    def test_retries_failed_batch(self):
+        FlakyEmailBackend.failures = 2
+        dispatcher = NotificationDispatcher(batch_size=10, max_retries=3, retry_delay=0)
+        with self.assertLogs('blog.notifications', 'WARNING'):
+            sent = dispatcher.send(messages(3))
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(dispatcher.stats[0].attempts, 3)
+        self.assertEqual(FlakyEmailBackend.opened, 3)
+
+    def test_gives_up_after_max_retries(self):
+        FlakyEmailBackend.failures = 2
+        dispatcher = NotificationDispatcher(batch_size=2, max_retries=1, retry_delay=0)
+        with self.assertLogs('blog.notifications', 'ERROR'):
+            sent = dispatcher.send(messages(4))
+
+        self.assertEqual(sent, 2)
+        self.assertEqual([stats.sent for stats in dispatcher.stats], [0, 2])
+
+    def test_retries_only_unsent_messages(self):
+        FlakyEmailBackend.successes = 2
+        FlakyEmailBackend.failures = 1
+        dispatcher = NotificationDispatcher(batch_size=10, retry_delay=0)
+        with self.assertLogs('blog.notifications', 'WARNING'):
+            sent = dispatcher.send(messages(4))
+
+        self.assertEqual(sent, 4)
+        self.assertEqual([message.to[0] for message in mail.outbox],
+                         [f'user{i}@example.com' for i in range(4)])
+
+    def test_failed_reconnect_is_an_attempt(self):
+        FlakyEmailBackend.failures = 1
+        FlakyEmailBackend.reopen_failures = 1
+        dispatcher = NotificationDispatcher(batch_size=10, max_retries=2, retry_delay=0)
+        with self.assertLogs('blog.notifications', 'WARNING'):
+            sent = dispatcher.send(messages(2))
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(dispatcher.stats[0].attempts, 3)
+
+
+class NewPostMessagesTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_one_message_per_subscriber(self):
+        post = Post.objects.get(pk=4)
+        with self.assertNumQueries(1):
+            emails = list(new_post_messages(post))
+
+        self.assertEqual([email.to for email in emails], [['user1@example.com']])
+        self.assertEqual(emails[0].subject, 'New post')
+
+
+class DigestTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        NotificationPreference.objects.create(user_id=1, delivery=NotificationPreference.HOURLY)
+        Post.objects.create(title='Digest post 1', blog=Blog.objects.get(pk=2))
+        Post.objects.create(title='Digest post 2', blog=Blog.objects.get(pk=3))
+        get_broker().consume()
+
+    def test_digest_subscribers_get_no_immediate_email(self):
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(PendingNotification.objects.filter(user_id=1).count(), 2)
+
+    def test_digest_messages_use_single_query(self):
+        with self.assertNumQueries(1):
+            emails = list(digest_messages(PendingNotification.objects.all()))
+
+        self.assertEqual(len(emails), 1)
+        self.assertEqual(emails[0].to, ['user1@example.com'])
+        self.assertIn('You have 2 new posts', emails[0].body)
+        self.assertIn('- Digest post 2 by User3', emails[0].body)
+
+    def test_send_digests_sends_one_email_per_user(self):
+        self.assertEqual(send_digests(NotificationPreference.HOURLY), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'New posts')
+        self.assertFalse(PendingNotification.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='blog.tests.test_notifications.FlakyEmailBackend',
+                       NOTIFICATION_BATCH_SIZE=1, NOTIFICATION_MAX_RETRIES=0)
+    def test_failed_digests_are_kept_for_the_next_run(self):
+        FlakyEmailBackend.opened = FlakyEmailBackend.reopen_failures = FlakyEmailBackend.failures = 0
+        NotificationPreference.objects.create(user_id=2, delivery=NotificationPreference.HOURLY)
+        Subscription.objects.create(user_id=2, blog_id=3)
+        Post.objects.create(title='Digest post 3', blog=Blog.objects.get(pk=3))
+        get_broker().consume()
+        # The first batch, User1's digest, goes out; the second, User2's, fails.
+        FlakyEmailBackend.successes = 1
+        FlakyEmailBackend.failures = 1
+        with self.assertLogs('blog.notifications', 'ERROR'):
+            self.assertEqual(send_digests(NotificationPreference.HOURLY), 1)
+
+        self.assertEqual([message.to for message in mail.outbox], [['user1@example.com']])
+        self.assertEqual(list(PendingNotification.objects.values_list('user_id', flat=True).distinct()), [2])
+
+    def test_send_digests_only_sends_requested_delivery(self):
+        self.assertEqual(send_digests(NotificationPreference.DAILY), 0)
+        self.assertEqual(PendingNotification.objects.count(), 2)
@@ -0,0 +1,76 @@
+from django.test import TestCase
+
+from ..models import Post
+from ..pagination import encode_cursor, decode_cursor, keyset, KeysetPage
+
+
+def post_key(post):
+    return post.posted, post.pk
+
+
+class CursorTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_cursor_round_trip(self):
+        post = Post.objects.get(pk=5)
+        self.assertEqual(decode_cursor(encode_cursor(post.posted, post.pk)), (post.posted, 5))
+
+    def test_invalid_cursor_is_ignored(self):
+        self.assertIsNone(decode_cursor(None))
+        self.assertIsNone(decode_cursor('not a cursor'))
+        self.assertIsNone(decode_cursor('bm90fGE='))
+
+
+class KeysetTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_keyset_without_cursor_orders_newest_first(self):
+        posts = keyset(Post.objects.all(), ('posted', 'id'))
+        self.assertEqual([post.pk for post in posts[:3]], [10, 9, 8])
+
+    def test_keyset_older_than_cursor(self):
+        cursor = post_key(Post.objects.get(pk=8))
+        posts = keyset(Post.objects.all(), ('posted', 'id'), cursor)
+        self.assertEqual([post.pk for post in posts[:3]], [7, 6, 5])
+
+    def test_keyset_newer_than_cursor(self):
+        cursor = post_key(Post.objects.get(pk=8))
+        posts = keyset(Post.objects.all(), ('posted', 'id'), cursor, newer=True)
+        self.assertEqual([post.pk for post in posts], [9, 10])
+
+    def test_keyset_breaks_ties_on_pk(self):
+        post = Post.objects.get(pk=8)
+        Post.objects.filter(pk=7).update(posted=post.posted)
+        posts = keyset(Post.objects.all(), ('posted', 'id'), post_key(post))
+        self.assertEqual([post.pk for post in posts[:2]], [7, 6])
+
+
+class KeysetPageTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_first_page(self):
+        rows = list(keyset(Post.objects.all(), ('posted', 'id'))[:4])
+        page = KeysetPage(rows, 3, post_key)
+
+        self.assertEqual([post.pk for post in page], [10, 9, 8])
+        self.assertTrue(page.has_older)
+        self.assertFalse(page.has_newer)
+        self.assertEqual(decode_cursor(page.older_cursor)[1], 8)
+
+    def test_newer_page_is_returned_newest_first(self):
+        cursor = post_key(Post.objects.get(pk=5))
+        rows = list(keyset(Post.objects.all(), ('posted', 'id'), cursor, newer=True)[:4])
+        page = KeysetPage(rows, 3, post_key, cursor, newer=True)
+
+        self.assertEqual([post.pk for post in page], [8, 7, 6])
+        self.assertTrue(page.has_newer)
+        self.assertTrue(page.has_older)
+        self.assertEqual(decode_cursor(page.newer_cursor)[1], 8)
+
+    def test_empty_page_links_back_to_cursor(self):
+        cursor = post_key(Post.objects.get(pk=1))
+        page = KeysetPage([], 3, post_key, cursor)
+
+        self.assertFalse(page.has_older)
+        self.assertTrue(page.has_newer)
+        self.assertEqual(decode_cursor(page.newer_cursor), cursor)
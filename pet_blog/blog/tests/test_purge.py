@@ -0,0 +1,114 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters
+from ..models import Blog, Feed, PendingNotification, Post, Subscription
+from ..purge import delete_batch, delete_in_batches, purge_blog, purge_unsubscribed, purge_user
+from ..timeline import unread_feeds
+
+
+class TombstoneTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.get(pk=1)
+        self.client.login(username='User1', password='pass')
+
+    def unsubscribe(self):
+        # Subscription 1 is User1's subscription to User2's blog, with posts 4-6.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog:subscriptions'), {'subscriptions': [1]})
+
+    def test_unsubscribe_hides_feed_without_deleting(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.unsubscribe()
+
+        self.assertFalse([query for query in queries if query['sql'].startswith('DELETE')])
+        self.assertEqual(Feed.objects.filter(subscription_id=1).count(), 3)
+        self.assertEqual(sorted(unread_feeds(self.user).values_list('post_id', flat=True)), [8, 9])
+
+    def test_unsubscribed_blog_is_offered_again(self):
+        self.unsubscribe()
+        resp = self.client.get(reverse('blog:blogs'))
+        self.assertIn(2, [blog.pk for blog in resp.context['form'].fields['blogs'].queryset])
+
+    def test_subscribing_again_revives_tombstone(self):
+        self.unsubscribe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog:blogs'), {'blogs': [2]})
+
+        self.assertFalse(Subscription.objects.get(pk=1).is_deleted)
+        self.assertEqual(counters.unread_count(self.user), 5)
+
+    def test_new_posts_skip_tombstones(self):
+        self.unsubscribe()
+        Post.objects.create(blog_id=2, title='After unsubscribing', content='')
+        self.assertFalse(Feed.objects.filter(post__title='After unsubscribing').exists())
+
+
+class PurgeTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_delete_batch_is_single_statement(self):
+        # One DELETE, in a savepoint.
+        with self.assertNumQueries(3):
+            deleted = delete_batch(Feed.objects.filter(user_id=1), 4)
+        self.assertEqual(deleted, 4)
+        self.assertEqual(Feed.objects.count(), 2)
+
+    def test_purge_unsubscribed(self):
+        Subscription.objects.filter(pk=1).update(is_deleted=True)
+
+        self.assertEqual(purge_unsubscribed(batch_size=2), 3 + 1)
+        self.assertFalse(Subscription.objects.filter(pk=1).exists())
+        self.assertEqual(sorted(Feed.objects.values_list('post_id', flat=True)), [7, 8, 9])
+
+    def test_purge_keeps_tombstones_with_feed_rows(self):
+        Subscription.objects.filter(pk=1).update(is_deleted=True)
+
+        def unsubscribe_meanwhile(queryset, batch_size):
+            deleted = delete_in_batches(queryset, batch_size)
+            Subscription.objects.filter(pk=2).update(is_deleted=True)
+            return deleted
+
+        with mock.patch('blog.purge.delete_in_batches', side_effect=unsubscribe_meanwhile):
+            purge_unsubscribed(batch_size=10)
+
+        self.assertEqual(list(Subscription.objects.values_list('pk', flat=True)), [2])
+        self.assertEqual(purge_unsubscribed(batch_size=10), 3 + 1)
+
+    def test_purge_blog(self):
+        PendingNotification.objects.create(user_id=1, post_id=4)
+
+        purge_blog(2, batch_size=2)
+
+        self.assertFalse(Blog.objects.filter(pk=2).exists())
+        self.assertFalse(Post.objects.filter(blog_id=2).exists())
+        self.assertFalse(Subscription.objects.filter(blog_id=2).exists())
+        self.assertFalse(PendingNotification.objects.exists())
+        self.assertEqual(Feed.objects.count(), 3)
+
+    def test_purge_user(self):
+        purge_user(1, batch_size=2)
+
+        self.assertFalse(get_user_model().objects.filter(pk=1).exists())
+        self.assertFalse(Blog.objects.filter(pk=1).exists())
+        self.assertFalse(Feed.objects.exists())
+        self.assertFalse(Subscription.objects.exists())
+        self.assertEqual(Post.objects.count(), 7)
+
+    def test_command_reports_rate(self):
+        Subscription.objects.filter(pk=1).update(is_deleted=True)
+        out = StringIO()
+        call_command('purge_feeds', '--blog', '4', stdout=out)
+
+        self.assertRegex(out.getvalue(), r'^Purged 6 rows in \d+\.\ds \(\d+ rows/s\)')
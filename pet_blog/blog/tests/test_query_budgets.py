@@ -0,0 +1,57 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from ..fanout import fan_out_post
+from ..models import Blog, Post, Subscription
+from .utils import QueryBudgetMixin
+
+
+def create_blogs(size):
+    User = get_user_model()
+    User.objects.bulk_create([User(username=f'Author{i}') for i in range(size)])
+    authors = User.objects.filter(username__startswith='Author')
+    return Blog.objects.bulk_create([Blog(author=author) for author in authors])
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        self.user = get_user_model().objects.get(pk=1)
+        self.client.login(username='User1', password='pass')
+
+    def test_feed_view(self):
+        def populate(size):
+            posts = Post.objects.bulk_create(
+                [Post(blog_id=2, title=f'Post {i}', content='') for i in range(size)])
+            for post in posts:
+                fan_out_post(post)
+
+        self.assertQueryBudget(5, reverse('blog:feed'), populate)
+
+    def test_feed_view_with_pulled_blog(self):
+        Blog.objects.filter(pk=3).update(fan_out_on_read=True)
+
+        def populate(size):
+            Post.objects.bulk_create([Post(blog_id=3, title=f'Post {i}', content='') for i in range(size)])
+
+        self.assertQueryBudget(6, reverse('blog:feed'), populate)
+
+    def test_post_list_view(self):
+        def populate(size):
+            Post.objects.bulk_create([Post(blog_id=2, title=f'Post {i}', content='') for i in range(size)])
+
+        self.assertQueryBudget(3, reverse('blog:posts'), populate)
+        self.assertQueryBudget(4, reverse('blog:posts') + '?blog=2', populate)
+
+    def test_blogs_view(self):
+        self.assertQueryBudget(3, reverse('blog:blogs'), create_blogs)
+        self.assertQueryBudget(3, reverse('blog:blogs') + '?author=Author1&order=posts', create_blogs)
+
+    def test_subscriptions_view(self):
+        def populate(size):
+            Subscription.objects.bulk_create(
+                [Subscription(user=self.user, blog=blog) for blog in create_blogs(size)])
+
+        self.assertQueryBudget(3, reverse('blog:subscriptions'), populate)
@@ -0,0 +1,106 @@
+import asyncio
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+from ..routers import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter, use_replicas
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class ReplicaRouterTest(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_reads_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_reads_replicas_when_allowed(self):
+        with use_replicas():
+            self.assertIn(self.router.db_for_read(Post), ['replica1', 'replica2'])
+            with use_replicas(False):
+                self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas(self):
+        with use_replicas():
+            self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_writes_primary(self):
+        with use_replicas():
+            self.assertEqual(self.router.db_for_write(Post), DEFAULT_DB_ALIAS)
+
+    def test_migrates_primary_only(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'blog'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'blog'))
+
+
+@override_settings(REPLICA_DATABASES=['replica1'], REPLICA_PIN_SECONDS=5)
+class ReplicaMiddlewareTest(SimpleTestCase):
+    def respond(self, request):
+        def view(request):
+            return HttpResponse(ReplicaRouter().db_for_read(Post))
+        return ReplicaMiddleware(view)(request)
+
+    def test_get_reads_replica(self):
+        response = self.respond(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'replica1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_post_reads_primary_and_pins(self):
+        response = self.respond(RequestFactory().post('/'))
+        self.assertEqual(response.content, DEFAULT_DB_ALIAS.encode())
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+
+    def test_async(self):
+        async def view(request):
+            return HttpResponse(ReplicaRouter().db_for_read(Post))
+        middleware = ReplicaMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        async def respond(request):
+            return await middleware(request)
+        response = async_to_sync(respond)(RequestFactory().post('/'))
+        self.assertEqual(response.content, DEFAULT_DB_ALIAS.encode())
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(async_to_sync(respond)(RequestFactory().get('/')).content, b'replica1')
+
+    def test_pinned_get_reads_primary(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.respond(request).content, DEFAULT_DB_ALIAS.encode())
+
+
+@skipUnless(settings.REPLICA_DATABASES, 'Set DATABASE_REPLICAS to a second SQLite file to run against a replica.')
+class ReplicaRoutingTest(TransactionTestCase):
+    """Runs against a stand-in replica mirroring the test database, e.g. DATABASE_REPLICAS=replica.sqlite3."""
+    fixtures = ['initial_data.json']
+    databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES, *settings.FEED_SHARDS}
+
+    def setUp(self):
+        # A page cached by an earlier test would be served without any query.
+        cache.clear()
+
+    def queries(self, alias, method, *args, **kwargs):
+        with CaptureQueriesContext(connections[alias]) as queries:
+            getattr(self.client, method)(*args, **kwargs)
+        return len(queries)
+
+    def test_anonymous_pages_read_replica(self):
+        replica = settings.REPLICA_DATABASES[0]
+        with override_settings(REPLICA_DATABASES=[replica]):
+            self.assertGreater(self.queries(replica, 'get', reverse('blog:post-detail', args=[1])), 0)
+
+    def test_own_writes_are_read_from_primary(self):
+        replica = settings.REPLICA_DATABASES[0]
+        self.client.login(username='User1', password='pass')
+        with override_settings(REPLICA_DATABASES=[replica]):
+            self.client.post(reverse('blog:my-posts'), {'title': 'New post', 'content': 'Text'})
+            self.assertEqual(self.queries(replica, 'get', reverse('blog:my-posts')), 0)
@@ -0,0 +1,83 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SearchPage, decode_cursor, encode_cursor, match_query, rebuild_index
+
+
+class SearchTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def titles(self, text, page_size=20, cursor=None):
+        return [post.title for post in SearchPage(text, page_size, cursor)]
+
+    def test_match_query(self):
+        self.assertEqual(match_query('cats and "dogs'), '"cats" "and" "dogs"*')
+        self.assertEqual(match_query(' -- '), '')
+
+    def test_cursor(self):
+        self.assertEqual(decode_cursor(encode_cursor(-1.5e-06, 7)), (-1.5e-06, 7))
+        self.assertIsNone(decode_cursor('garbage'))
+
+    def test_fixture_posts_are_indexed(self):
+        self.assertEqual(self.titles('content 7'), ['Test post 7'])
+
+    def test_title_ranks_first(self):
+        Post.objects.create(blog_id=1, title='Parrots', content='Something else')
+        Post.objects.create(blog_id=1, title='Something else', content='Parrots, parrots')
+        self.assertEqual(self.titles('parrot'), ['Parrots', 'Something else'])
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.get(pk=1)
+        post.content = 'Hamsters'
+        post.save()
+        self.assertEqual(self.titles('hamsters'), ['Test post 1'])
+        self.assertEqual(self.titles('content 1'), ['Test post 10'])
+
+        post.delete()
+        self.assertEqual(self.titles('hamsters'), [])
+
+    def test_snippet_is_escaped(self):
+        Post.objects.create(blog_id=1, title='Markup', content='<b>bold</b> parrots')
+        post = SearchPage('parrots', 20).items[0]
+        self.assertEqual(post.snippet, '&lt;b&gt;bold&lt;/b&gt; <mark>parrots</mark>')
+
+    def test_pages(self):
+        page = SearchPage('test', 4)
+        self.assertTrue(page.has_more)
+        seen = [post.pk for post in page]
+        while page.has_more:
+            page = SearchPage('test', 4, decode_cursor(page.next_cursor))
+            seen += [post.pk for post in page]
+        self.assertEqual(sorted(seen), list(range(1, 11)))
+
+    def test_syntax_is_not_interpreted(self):
+        self.assertEqual(self.titles('post AND NOT "('), [])
+        self.assertEqual(self.titles(''), [])
+
+    def test_rebuild(self):
+        self.assertEqual(rebuild_index(3), 10)
+        self.assertEqual(len(self.titles('test')), 10)
+
+
+class SearchViewTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_results(self):
+        resp = self.client.get(reverse('blog:search'), {'q': 'content 4'})
+        self.assertTemplateUsed(resp, 'blog/search.html')
+        self.assertContains(resp, 'Test <mark>content</mark> <mark>4</mark>', html=False)
+        self.assertContains(resp, reverse('blog:post-detail', args=[4]))
+
+    @override_settings(SEARCH_PAGE_SIZE=3)
+    def test_more_results(self):
+        resp = self.client.get(reverse('blog:search'), {'q': 'test'})
+        page = resp.context['page']
+        self.assertContains(resp, f'?q=test&after={page.next_cursor}')
+
+        resp = self.client.get(reverse('blog:search'), {'q': 'test', 'after': page.next_cursor})
+        self.assertEqual(len(resp.context['page']), 3)
+        self.assertFalse({post.pk for post in page} & {post.pk for post in resp.context['page']})
+
+    def test_no_results(self):
+        self.assertContains(self.client.get(reverse('blog:search'), {'q': 'zebra'}), 'No posts found')
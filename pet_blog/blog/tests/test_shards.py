@@ -0,0 +1,133 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import counters
+from ..export import export
+from ..fanout import fan_out_post
+from ..models import Blog, Feed, Post, Subscription, UnreadCounter
+from ..pagination import decode_cursor
+from ..purge import purge_user
+from ..routers import FeedShardRouter
+from ..shards import by_shard, feed_db, remote_shards
+from ..timeline import feed_page, mark_pulled_read, unread_count, unread_feeds
+
+
+@override_settings(FEED_SHARDS=['default', 'feed1', 'feed2'])
+class FeedShardRouterTest(SimpleTestCase):
+    router = FeedShardRouter()
+
+    def test_feed_db(self):
+        self.assertEqual([feed_db(user_id) for user_id in range(1, 5)], ['feed1', 'feed2', 'default', 'feed1'])
+        self.assertEqual(remote_shards(), ['feed1', 'feed2'])
+
+    def test_by_shard(self):
+        self.assertEqual(by_shard([1, 2, 3, 4]), {'feed1': [1, 4], 'feed2': [2], 'default': [3]})
+
+    def test_routes_feeds_by_user(self):
+        user = get_user_model()(pk=2)
+        self.assertEqual(self.router.db_for_read(Feed, instance=user), 'feed2')
+        self.assertEqual(self.router.db_for_write(Feed, instance=Feed(user_id=1)), 'feed1')
+        # Feeds in the primary database and other models are left to the next router.
+        self.assertIsNone(self.router.db_for_read(Feed, instance=get_user_model()(pk=3)))
+        self.assertIsNone(self.router.db_for_read(Feed))
+        self.assertIsNone(self.router.db_for_read(Post, instance=user))
+
+    def test_migrates_only_feeds_to_remote_shards(self):
+        self.assertTrue(self.router.allow_migrate('feed1', 'blog', 'feed'))
+        self.assertFalse(self.router.allow_migrate('feed1', 'blog', 'post'))
+        self.assertIsNone(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'blog', 'post'))
+
+
+@skipUnless(remote_shards(), 'Set FEED_SHARDS to one or more SQLite files to run against feed shards.')
+class FeedShardsTest(TransactionTestCase):
+    """Runs against remote feed shards, e.g. FEED_SHARDS=feed1.sqlite3."""
+    databases = {DEFAULT_DB_ALIAS, *remote_shards(), *settings.REPLICA_DATABASES}
+
+    def setUp(self):
+        User = get_user_model()
+        self.blog = Blog.objects.create(author=User.objects.create_user('Author', password='pass'))
+        # One reader per shard.
+        self.readers = [User.objects.create_user(f'Reader{i}', password='pass')
+                        for i in range(len(settings.FEED_SHARDS))]
+        for reader in self.readers:
+            Subscription.objects.create(user=reader, blog=self.blog)
+            counters.refresh(reader, cached=False)
+        self.remote = next(reader for reader in self.readers if feed_db(reader.pk) != DEFAULT_DB_ALIAS)
+        self.post = Post.objects.bulk_create([Post(blog=self.blog, title='Sharded', content='')])[0]
+
+    def test_fans_out_to_each_readers_shard(self):
+        self.assertEqual(fan_out_post(self.post), len(self.readers))
+        for reader in self.readers:
+            for alias in settings.FEED_SHARDS:
+                self.assertEqual(Feed.objects.using(alias).filter(user=reader).exists(), alias == feed_db(reader.pk))
+            self.assertEqual(UnreadCounter.objects.get(user=reader).unread, 1)
+
+    def test_reads_and_marks_feeds(self):
+        fan_out_post(self.post)
+        for reader in self.readers:
+            page = feed_page(reader, 10)
+            self.assertEqual([feed.post.title for feed in page], ['Sharded'])
+            self.assertEqual(unread_count(reader), 1)
+            self.assertEqual(unread_feeds(reader).update(is_read=True), 1)
+            self.assertEqual(unread_count(reader), 0)
+
+    def test_feed_view(self):
+        fan_out_post(self.post)
+        self.client.login(username=self.remote.username, password='pass')
+        self.assertContains(self.client.get(reverse('blog:feed')), 'Sharded')
+        feed = self.remote.feed_set.get()
+        self.client.post(reverse('blog:feed'), {'feeds': [feed.pk]})
+        self.assertEqual(self.remote.feed_set.filter(is_read=True).count(), 1)
+        self.assertEqual(UnreadCounter.objects.get(user=self.remote).unread, 0)
+
+    def test_watermark(self):
+        fan_out_post(self.post)
+        Subscription.objects.filter(user=self.remote).update(read_until=self.post.posted)
+        self.assertEqual(unread_count(self.remote), 0)
+        self.assertEqual(counters.recount([self.remote.pk]), 1)
+
+    def test_pulled_posts_marked_read(self):
+        Blog.objects.filter(pk=self.blog.pk).update(fan_out_on_read=True)
+        for reader in self.readers:
+            self.assertEqual(unread_count(reader), 1)
+            mark_pulled_read(reader, [self.post])
+            self.assertEqual(unread_count(reader), 0)
+
+    def test_pulled_pages_skip_read_posts(self):
+        Blog.objects.filter(pk=self.blog.pk).update(fan_out_on_read=True)
+        posts = [self.post] + Post.objects.bulk_create(
+            [Post(blog=self.blog, title=f'Pulled {n}', content='') for n in range(1, 6)])
+        mark_pulled_read(self.remote, [posts[1], posts[4], posts[5]])
+        self.assertEqual(unread_count(self.remote), 3)
+        page = feed_page(self.remote, 2)
+        self.assertEqual([post.title for post in page], ['Pulled 3', 'Pulled 2'])
+        page = feed_page(self.remote, 2, decode_cursor(page.older_cursor))
+        self.assertEqual([post.title for post in page], ['Sharded'])
+
+    def test_many_subscriptions(self):
+        User = get_user_model()
+        authors = User.objects.bulk_create([User(username=f'Author{n}') for n in range(1200)])
+        blogs = Blog.objects.bulk_create([Blog(author=author) for author in authors])
+        Subscription.objects.bulk_create(
+            [Subscription(user=self.remote, blog=blog, read_until=self.post.posted) for blog in blogs])
+        fan_out_post(self.post)
+        self.assertEqual(unread_count(self.remote), 1)
+        self.assertEqual(len(feed_page(self.remote, 10)), 1)
+
+    def test_export(self):
+        fan_out_post(self.post)
+        for reader in self.readers:
+            self.assertIn('"author": "Author"', ''.join(export(reader, 'ndjson', ['feed'])))
+
+    def test_deletes(self):
+        fan_out_post(self.post)
+        purge_user(self.remote.pk, 10)
+        self.assertFalse(Feed.objects.using(feed_db(self.remote.pk)).filter(user_id=self.remote.pk).exists())
+        self.post.delete()
+        for alias in settings.FEED_SHARDS:
+            self.assertFalse(Feed.objects.using(alias).exists())
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import tempfile
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from pet_blog.sqlite.base import DatabaseWrapper
+
+
+class ProductionSQLiteTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.name = os.path.join(directory.name, 'db.sqlite3')
+
+    def wrapper(self, **options):
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': self.name, 'OPTIONS': options}, 'production')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        wrapper = self.wrapper(pragmas={'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 1234},
+                               timeout=1)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+        # Django's own setup still runs.
+        self.assertEqual(self.pragma(wrapper, 'foreign_keys'), 1)
+
+    def test_immediate_transactions_take_the_write_lock(self):
+        wrapper = self.wrapper(transaction_mode='IMMEDIATE')
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        other = sqlite3.connect(self.name, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+            other.execute('BEGIN IMMEDIATE')
+        wrapper.rollback()
+        wrapper.set_autocommit(True)
+        other.execute('BEGIN IMMEDIATE')
+
+    def test_deferred_by_default(self):
+        wrapper = self.wrapper()
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        other = sqlite3.connect(self.name, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+        wrapper.rollback()
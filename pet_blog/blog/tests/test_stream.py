@@ -0,0 +1,173 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..fanout import fan_out_post
+from ..hub import get_hub
+from ..hub.db import DatabaseHub
+from ..hub.local import LocalHub
+from ..models import Blog, Post, Subscription
+from ..stream import FeedStreamApp, entries_after
+from ..timeline import mark_pulled_read
+
+
+def events(text):
+    return [json.loads(line[len('data: '):]) for line in text.splitlines() if line.startswith('data: ')]
+
+
+class FeedStreamViewTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        self.client.login(username='User1', password='pass')
+
+    def test_new_stream_gets_the_cursor(self):
+        resp = self.client.get(reverse('blog:feed-stream'))
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        self.assertEqual(resp.content.decode(), 'retry: 5000\n\nid: 6\n\n')
+
+    def test_resumes_after_last_event_id(self):
+        resp = self.client.get(reverse('blog:feed-stream'), HTTP_LAST_EVENT_ID='4')
+        text = resp.content.decode()
+        self.assertIn('id: 5\nevent: entry\n', text)
+        # Feed 6 is read.
+        self.assertEqual([event['post'] for event in events(text)], [8])
+
+    def test_skips_unsubscribed_blogs(self):
+        Subscription.objects.filter(pk=2).update(is_deleted=True)
+        resp = self.client.get(reverse('blog:feed-stream'), HTTP_LAST_EVENT_ID='0')
+        self.assertEqual([event['post'] for event in events(resp.content.decode())], [6, 5, 4])
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('blog:feed-stream')).status_code, 302)
+
+    def test_entries_in_batches(self):
+        user = get_user_model().objects.get(pk=1)
+        self.assertEqual([feed.pk for feed in entries_after(user, 0, limit=4)], [1, 2, 3, 4])
+
+
+class HubTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_local_hub(self):
+        hub = LocalHub()
+
+        async def listen():
+            queue = hub.subscribe(1)
+            thread = threading.Thread(target=hub.publish, args=([1, 1, 2],))
+            thread.start()
+            await asyncio.wait_for(queue.get(), 1)
+            thread.join()
+            # Both signals were merged into one.
+            self.assertTrue(queue.empty())
+            hub.unsubscribe(1, queue)
+        asyncio.run(listen())
+        self.assertEqual(dict(hub.listeners), {})
+
+    def test_local_hub_without_listeners_reads_nothing(self):
+        LocalHub().publish(Post.objects.none().iterator())
+
+    def test_database_hub_finds_new_rows(self):
+        hub = DatabaseHub()
+        cursors = hub.latest()
+        self.assertEqual(cursors, {'default': 6})
+        post = Post.objects.bulk_create([Post(blog=Blog.objects.get(pk=3), title='New', content='')])[0]
+        fan_out_post(post)
+        self.assertEqual(hub.new_entries(cursors), {1})
+        self.assertEqual(cursors, {'default': 7})
+        self.assertEqual(hub.new_entries(cursors), set())
+        # A pulled post marked as read adds a read row, which wakes nobody.
+        post = Post.objects.bulk_create([Post(blog=Blog.objects.get(pk=2), title='Pulled', content='')])[0]
+        mark_pulled_read(get_user_model().objects.get(pk=1), [post])
+        self.assertEqual(hub.new_entries(cursors), set())
+        self.assertEqual(cursors, {'default': 8})
+
+
+class StreamClient:
+    def __init__(self, **headers):
+        self.headers = [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]
+        self.messages = []
+        self.disconnected = asyncio.Event()
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    @property
+    def text(self):
+        return ''.join(message.get('body', b'').decode() for message in self.messages
+                       if message['type'] == 'http.response.body')
+
+    async def until(self, text):
+        for _ in range(500):
+            if text in self.text:
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError(f'{text!r} not in {self.text!r}')
+
+    async def open(self, app):
+        scope = {'type': 'http', 'method': 'GET', 'path': reverse('blog:feed-stream'), 'headers': self.headers}
+        return asyncio.ensure_future(app(scope, self.receive, self.send))
+
+    async def close(self, stream):
+        self.disconnected.set()
+        await asyncio.wait_for(stream, 1)
+
+
+@override_settings(FEED_HUB='blog.hub.local.LocalHub', FEED_STREAM_HEARTBEAT=0.05)
+class FeedStreamAppTest(TransactionTestCase):
+    # The stream reads in other threads, with connections of their own, so the fixtures are committed.
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        get_hub.cache_clear()
+        self.addCleanup(get_hub.cache_clear)
+        self.client.login(username='User1', password='pass')
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        async def django_app(scope, receive, send):
+            raise AssertionError('The stream was passed on')
+        self.app = FeedStreamApp(django_app)
+
+    @staticmethod
+    def publish():
+        post = Post.objects.bulk_create([Post(blog=Blog.objects.get(pk=2), title='Live post', content='')])[0]
+        fan_out_post(post)
+        return post
+
+    async def test_pushes_new_entries(self):
+        client = StreamClient(cookie=self.cookie)
+        stream = await client.open(self.app)
+        await client.until('id: 6\n\n')
+        self.assertEqual(client.messages[0]['status'], 200)
+
+        post = await sync_to_async(self.publish)()
+        await client.until('event: entry')
+        self.assertEqual(events(client.text), [{
+            'post': post.pk, 'title': 'Live post', 'url': reverse('blog:post-detail', args=[post.pk]),
+            'posted': post.posted.isoformat()}])
+        await client.until(': ping')
+        await client.close(stream)
+        self.assertEqual(dict(get_hub().listeners), {})
+
+    async def test_resumes_after_last_event_id(self):
+        client = StreamClient(cookie=self.cookie, last_event_id='3')
+        stream = await client.open(self.app)
+        await client.until('id: 5\n')
+        self.assertEqual([event['post'] for event in events(client.text)], [9, 8])
+        await client.close(stream)
+
+    async def test_anonymous(self):
+        client = StreamClient()
+        await asyncio.wait_for(await client.open(self.app), 1)
+        self.assertEqual(client.messages[0]['status'], 403)
@@ -0,0 +1,150 @@
+import json
+from xml.etree import ElementTree
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..syndication import feed_token, user_for_token
+
+
+class SyndicationTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(url, **kwargs)
+
+    def content(self, resp):
+        self.assertTrue(resp.streaming)
+        return b''.join(resp.streaming_content).decode()
+
+    def test_rss(self):
+        resp = self.get(reverse('blog:blog-rss', args=[1]))
+        self.assertEqual(resp['Content-Type'], 'application/rss+xml; charset=utf-8')
+        channel = ElementTree.fromstring(self.content(resp)).find('channel')
+        self.assertEqual([item.findtext('title') for item in channel.iter('item')],
+                         ['Test post 3', 'Test post 2', 'Test post 1'])
+        self.assertEqual(channel.findtext('lastBuildDate'), 'Sun, 19 Dec 2021 15:53:10 +0000')
+
+    def test_atom(self):
+        resp = self.get(reverse('blog:blog-atom', args=[1]))
+        self.assertEqual(resp['Content-Type'], 'application/atom+xml; charset=utf-8')
+        feed = ElementTree.fromstring(self.content(resp))
+        entries = feed.findall('{http://www.w3.org/2005/Atom}entry')
+        self.assertEqual(len(entries), 3)
+
+    def test_json_feed(self):
+        resp = self.get(reverse('blog:blog-json', args=[2]))
+        self.assertEqual(resp['Content-Type'], 'application/feed+json; charset=utf-8')
+        feed = json.loads(self.content(resp))
+        self.assertEqual(feed['version'], 'https://jsonfeed.org/version/1.1')
+        self.assertEqual([item['title'] for item in feed['items']], ['Test post 6', 'Test post 5', 'Test post 4'])
+        self.assertEqual(feed['items'][0]['url'], 'http://testserver' + reverse('blog:post-detail', args=[6]))
+        self.assertEqual(feed['items'][0]['authors'], [{'name': 'User2'}])
+
+    def test_unknown_blog(self):
+        self.assertEqual(self.get(reverse('blog:blog-rss', args=[99])).status_code, 404)
+
+    @override_settings(SYNDICATION_POSTS=2)
+    def test_latest_posts_only(self):
+        feed = json.loads(self.content(self.get(reverse('blog:blog-json', args=[1]))))
+        self.assertEqual([item['title'] for item in feed['items']], ['Test post 3', 'Test post 2'])
+
+    def test_cached(self):
+        url = reverse('blog:blog-rss', args=[1])
+        first = self.content(self.get(url))
+        with self.assertNumQueries(1):
+            # Only the blog lookup; the document comes from the cache.
+            self.assertEqual(self.content(self.get(url)), first)
+
+    def test_saving_post_refreshes_feed(self):
+        url = reverse('blog:blog-json', args=[1])
+        self.content(self.get(url))
+        post = Post.objects.get(pk=3)
+        post.title = 'Edited'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        feed = json.loads(self.content(self.get(url)))
+        self.assertEqual(feed['items'][0]['title'], 'Edited')
+
+    def test_not_modified(self):
+        url = reverse('blog:blog-atom', args=[1])
+        resp = self.get(url)
+        self.content(resp)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(blog_id=1, title='New post', content='')
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+
+
+class UserSyndicationTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(username='User1')
+        self.url = f"{reverse('blog:feed-xml')}?token={feed_token(self.user)}"
+
+    def get(self, url, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(url, **kwargs)
+
+    def titles(self, resp):
+        self.assertEqual(resp.status_code, 200)
+        channel = ElementTree.fromstring(b''.join(resp.streaming_content)).find('channel')
+        return [item.findtext('title') for item in channel.iter('item')]
+
+    def test_token(self):
+        self.assertEqual(user_for_token(feed_token(self.user)), self.user)
+        self.assertIsNone(user_for_token(f'{self.user.pk}-forged'))
+        self.assertIsNone(user_for_token('forged'))
+        self.assertIsNone(user_for_token(None))
+
+    def test_password_change_revokes_token(self):
+        token = feed_token(self.user)
+        self.user.set_password('other')
+        self.user.save()
+        self.assertIsNone(user_for_token(token))
+
+    def test_forbidden_without_token(self):
+        self.assertEqual(self.get(reverse('blog:feed-xml')).status_code, 403)
+        self.assertEqual(self.get(reverse('blog:feed-xml') + '?token=1-forged').status_code, 403)
+
+    def test_merges_subscribed_blogs(self):
+        resp = self.get(self.url)
+        self.assertIn('private', resp['Cache-Control'])
+        self.assertEqual(self.titles(resp), ['Test post 9', 'Test post 8', 'Test post 7',
+                                             'Test post 6', 'Test post 5', 'Test post 4'])
+
+    def test_reads_subscribed_blogs_in_one_query(self):
+        resp = self.get(self.url)
+        # The body is read as it is sent.
+        with self.assertNumQueries(1):
+            self.titles(resp)
+
+    def test_unsubscribing_refreshes_feed(self):
+        resp = self.get(self.url)
+        self.titles(resp)
+        self.client.login(username='User1', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog:subscriptions'), {'subscriptions': [2]})
+        self.client.logout()
+
+        self.assertEqual(self.get(self.url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+        self.assertEqual(self.titles(self.get(self.url)), ['Test post 6', 'Test post 5', 'Test post 4'])
+
+    def test_not_modified(self):
+        resp = self.get(self.url)
+        self.titles(resp)
+        self.assertEqual(self.get(self.url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 304)
+
+    def test_feed_page_links_to_feed(self):
+        self.client.login(username='User1', password='pass')
+        self.assertContains(self.client.get(reverse('blog:feed')), self.url)
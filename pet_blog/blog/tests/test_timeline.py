@@ -0,0 +1,207 @@
+from importlib import import_module
+from unittest import skipUnless
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from ..forms import FeedForm
+from ..models import Blog, Post, Feed, Subscription
+from ..pagination import decode_cursor, keyset
+from ..timeline import (merge_by_posted, pulled_posts, pulled_post_streams, mark_pulled_read, feed_page,
+                        unread_feeds, unread_count, mark_all_read, after_watermarks)
+
+
+class TimelineTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        # User1 subscribes to the blogs of User2 (posts 4-6) and User3 (posts 7-9).
+        Blog.objects.filter(pk=3).update(fan_out_on_read=True)
+        Feed.objects.filter(post__blog_id=3).exclude(is_read=True).delete()
+        self.user = get_user_model().objects.get(pk=1)
+
+    def test_pulled_posts_exclude_posts_with_feed_rows(self):
+        # Post 7 is already marked as read in User1's feed.
+        titles = [post.title for post in pulled_posts(self.user)]
+        self.assertEqual(titles, ['Test post 9', 'Test post 8'])
+
+    def test_one_stream_per_pulled_blog(self):
+        streams = pulled_post_streams(self.user)
+        self.assertEqual(len(streams), 1)
+
+    def test_merge_by_posted(self):
+        posts = Post.objects.all()
+        merged = merge_by_posted(posts.filter(blog_id=1), posts.filter(blog_id=2), posts.filter(blog_id=3))
+        self.assertEqual([post.pk for post in merged], [9, 8, 7, 6, 5, 4, 3, 2, 1])
+
+    def test_feed_page_pages_through_pushed_and_pulled(self):
+        first = feed_page(self.user, 3)
+        self.assertEqual([str(entry) for entry in first], ['Test post 9', 'Test post 8', 'Test post 6'])
+        self.assertTrue(first.has_older)
+
+        second = feed_page(self.user, 3, decode_cursor(first.older_cursor))
+        self.assertEqual([str(entry) for entry in second], ['Test post 5', 'Test post 4'])
+        self.assertFalse(second.has_older)
+        self.assertTrue(second.has_newer)
+
+        back = feed_page(self.user, 3, decode_cursor(second.newer_cursor), newer=True)
+        self.assertEqual([str(entry) for entry in back], ['Test post 9', 'Test post 8', 'Test post 6'])
+        self.assertFalse(back.has_newer)
+
+    def test_feed_page_queries_do_not_depend_on_backlog(self):
+        with self.assertNumQueries(3):
+            feed_page(self.user, 2)
+
+    def test_mark_pulled_read(self):
+        mark_pulled_read(self.user, Post.objects.filter(pk=9))
+
+        feed = Feed.objects.get(user=self.user, post_id=9)
+        self.assertTrue(feed.is_read)
+        self.assertEqual(feed.subscription.blog_id, 3)
+        self.assertEqual([post.pk for post in pulled_posts(self.user)], [8])
+
+    def test_feed_form_entries_merge_pushed_and_pulled(self):
+        form = FeedForm(self.user)
+        titles = [checkbox.data['value'].instance for checkbox in form.entries()]
+        self.assertEqual([str(entry) for entry in titles],
+                         ['Test post 9', 'Test post 8', 'Test post 6', 'Test post 5', 'Test post 4'])
+
+    def test_feed_view_marks_pulled_post_as_read(self):
+        self.client.login(username='User1', password='pass')
+        resp = self.client.post(reverse('blog:feed'), {'posts': [8]})
+
+        self.assertRedirects(resp, reverse('blog:feed'))
+        self.assertTrue(Feed.objects.get(user=self.user, post_id=8).is_read)
+
+    def test_feed_form_requires_a_selection(self):
+        form = FeedForm(self.user, data={})
+        self.assertFalse(form.is_valid())
+        self.assertIn('feeds', form.errors)
+
+    def test_subscribing_to_pulled_blog_skips_backfill(self):
+        Blog.objects.filter(pk=4).update(fan_out_on_read=True)
+        self.client.login(username='User1', password='pass')
+        self.client.post(reverse('blog:blogs'), {'blogs': [4]})
+
+        self.assertTrue(Subscription.objects.filter(user=self.user, blog_id=4).exists())
+        self.assertFalse(Feed.objects.filter(user=self.user, post__blog_id=4).exists())
+        self.assertEqual([post.pk for post in pulled_posts(self.user)], [10, 9, 8])
+
+
+class ReadWatermarkTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        self.user = get_user_model().objects.get(pk=1)
+
+    def test_watermark_hides_older_feed_rows(self):
+        Subscription.objects.filter(pk=2).update(read_until=Post.objects.get(pk=8).posted)
+        self.assertEqual(sorted(unread_feeds(self.user).values_list('post_id', flat=True)), [4, 5, 6, 9])
+
+    def test_watermarks_sent_with_the_query(self):
+        # Far more watermarks than SQLite allows terms in an expression.
+        watermarks = [(pk, None) for pk in range(100, 3000)] + [(1, None), (2, Post.objects.get(pk=8).posted)]
+        feeds = self.user.feed_set.filter(after_watermarks(self.user, 'subscription_id', watermarks), is_read=False)
+        self.assertEqual(sorted(feeds.values_list('post_id', flat=True)), [4, 5, 6, 9])
+
+    def test_watermark_hides_older_pulled_posts(self):
+        Blog.objects.filter(pk=3).update(fan_out_on_read=True)
+        Feed.objects.filter(post__blog_id=3).delete()
+        Subscription.objects.filter(pk=2).update(read_until=Post.objects.get(pk=8).posted)
+        self.assertEqual([post.pk for post in pulled_posts(self.user)], [9])
+
+    def test_mark_all_read_is_single_update(self):
+        with self.assertNumQueries(1):
+            mark_all_read(self.user)
+
+        self.assertEqual(Subscription.objects.get(pk=1).read_until, Post.objects.get(pk=6).posted)
+        self.assertEqual(unread_count(self.user), 0)
+
+    def test_unread_count(self):
+        self.assertEqual(unread_count(self.user), 5)
+
+    def test_feed_view_mark_all_as_read(self):
+        self.client.login(username='User1', password='pass')
+        resp = self.client.post(reverse('blog:feed'), {'mark_all': ''})
+
+        self.assertRedirects(resp, reverse('blog:feed'))
+        self.assertEqual(unread_count(self.user), 0)
+
+
+class ReadWatermarkMigrationTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        self.migration = import_module('blog.migrations.0006_read_watermarks')
+
+    def test_watermark_stops_before_oldest_unread_post(self):
+        self.migration.set_read_watermarks(apps, None)
+
+        self.assertIsNone(Subscription.objects.get(pk=1).read_until)
+        self.assertEqual(Subscription.objects.get(pk=2).read_until, Post.objects.get(pk=7).posted)
+        self.assertEqual(unread_count(get_user_model().objects.get(pk=1)), 5)
+
+    def test_fully_read_subscription_gets_latest_post(self):
+        Feed.objects.filter(subscription_id=1).update(is_read=True)
+        self.migration.set_read_watermarks(apps, None)
+
+        self.assertEqual(Subscription.objects.get(pk=1).read_until, Post.objects.get(pk=6).posted)
+
+    def test_reverse_marks_rows_under_watermark_as_read(self):
+        Subscription.objects.filter(pk=1).update(read_until=Post.objects.get(pk=5).posted)
+        self.migration.unset_read_watermarks(apps, None)
+
+        self.assertEqual(sorted(Feed.objects.filter(is_read=True).values_list('post_id', flat=True)), [4, 5, 7])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans.')
+class IndexUsageTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def setUp(self):
+        self.user = get_user_model().objects.get(pk=1)
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feed_page_uses_unread_index(self):
+        feeds = unread_feeds(self.user).select_related('post').only('user', 'posted', 'post__title')
+        cursor = Post.objects.get(pk=6).posted, 6
+        for queryset in (keyset(feeds, ('posted', 'post_id')), keyset(feeds, ('posted', 'post_id'), cursor)):
+            with self.subTest(query=str(queryset.query)):
+                self.assertUsesIndex(queryset[:51], 'blog_feed_unread_idx')
+
+    def test_blog_posts_use_blog_index(self):
+        posts = keyset(Post.objects.filter(blog_id=1), ('posted', 'id'))
+        self.assertUsesIndex(posts[:51], 'blog_post_blog_posted_idx')
+
+    def test_blog_directory_uses_popularity_indexes(self):
+        blogs = Blog.objects.exclude(author=self.user)
+        for fields, index in ((('subscriber_count', 'id'), 'blog_blog_subscribers_idx'),
+                              (('post_count', 'id'), 'blog_blog_posts_idx')):
+            with self.subTest(index=index):
+                self.assertUsesIndex(keyset(blogs, fields, (1, 3))[:51], index)
+
+    def test_posts_use_posted_index(self):
+        posts = keyset(Post.objects.only('title', 'posted'), ('posted', 'id'), (Post.objects.get(pk=6).posted, 6))
+        self.assertUsesIndex(posts[:51], 'blog_post_posted_idx')
+
+
+class FeedPostedMigrationTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_copies_post_columns_in_batches(self):
+        Feed.objects.update(posted=Post.objects.get(pk=1).posted, blog_id=1)
+        migration = import_module('blog.migrations.0008_feed_posted')
+
+        # The last id, then one UPDATE per batch, each in its own savepoint.
+        with self.assertNumQueries(1 + 3 * 3):
+            migration.copy_post_columns(apps, None, batch_size=2)
+
+        for feed in Feed.objects.select_related('post'):
+            self.assertEqual((feed.posted, feed.blog_id), (feed.post.posted, feed.post.blog_id))
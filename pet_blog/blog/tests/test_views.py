@@ -1,14 +1,21 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
-from ..forms import PostForm, FeedForm, UnSubscriptionForm, SubscriptionForm
-from ..models import Post, Feed, Subscription
-from ..views import PostListView, PostDetailView, MyPostsView, FeedView, BlogsView, SubscriptionsView
+from ..forms import PostForm, FeedForm, UnSubscriptionForm, SubscriptionForm, NotificationPreferenceForm
+from ..models import Blog, Post, Feed, Subscription, NotificationPreference
+from ..views import (PostListView, PostDetailView, MyPostsView, FeedView, BlogsView, SubscriptionsView,
+                     NotificationsView)
 
 
 class PostsViewTest(TestCase):
     fixtures = ['initial_data.json']
 
+    def setUp(self):
+        # Rendered pages outlive the test database.
+        cache.clear()
+
     def test_view_url_accessible_by_name(self):
         resp = self.client.get(reverse('blog:posts'))
         self.assertEqual(resp.status_code, 200)
@@ -26,10 +33,41 @@ class PostsViewTest(TestCase):
         post_list_view = PostListView()
         self.assertEqual(post_list_view.model, Post)
 
+    def test_content_is_deferred(self):
+        resp = self.client.get(reverse('blog:posts'))
+        self.assertIn('content', resp.context['posts'][0].get_deferred_fields())
+
+    @override_settings(POSTS_PAGE_SIZE=3)
+    def test_posts_are_paginated(self):
+        resp = self.client.get(reverse('blog:posts'))
+        page = resp.context['page_obj']
+        self.assertEqual([post.pk for post in resp.context['posts']], [10, 9, 8])
+        self.assertContains(resp, f'?before={page.older_cursor}')
+
+        resp = self.client.get(reverse('blog:posts'), {'before': page.older_cursor})
+        self.assertEqual([post.pk for post in resp.context['posts']], [7, 6, 5])
+        self.assertTrue(resp.context['page_obj'].has_newer)
+
+    @override_settings(POSTS_PAGE_SIZE=2)
+    def test_filter_by_blog(self):
+        resp = self.client.get(reverse('blog:posts'), {'blog': 2})
+        page = resp.context['page_obj']
+        self.assertEqual([post.pk for post in resp.context['posts']], [6, 5])
+        self.assertContains(resp, 'Posts by User2')
+        self.assertContains(resp, f'?blog=2&before={page.older_cursor}')
+
+    def test_filter_by_unknown_blog(self):
+        self.assertEqual(self.client.get(reverse('blog:posts'), {'blog': 99}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('blog:posts'), {'blog': 'x'}).status_code, 404)
+
 
 class PostDetailViewTest(TestCase):
     fixtures = ['initial_data.json']
 
+    def setUp(self):
+        # Rendered pages outlive the test database.
+        cache.clear()
+
     def test_view_url_exists_at_desired_location(self):
         resp = self.client.get('/post/1/')
         self.assertEqual(resp.status_code, 200)
@@ -125,6 +163,28 @@ class FeedViewTest(TestCase):
         self.assertTrue(feed.is_read)
         self.assertRedirects(resp, reverse('blog:feed'))
 
+    @override_settings(FEED_PAGE_SIZE=2)
+    def test_feed_is_paginated(self):
+        self.client.login(username='User1', password='pass')
+        resp = self.client.get(reverse('blog:feed'))
+
+        page = resp.context['form'].page
+        self.assertEqual([feed.pk for feed in page], [4, 5])
+        self.assertContains(resp, f'?before={page.older_cursor}')
+        self.assertNotContains(resp, '?after=')
+
+        resp = self.client.get(reverse('blog:feed'), {'before': page.older_cursor})
+        self.assertEqual([feed.pk for feed in resp.context['form'].page], [1, 2])
+
+    @override_settings(FEED_PAGE_SIZE=2)
+    def test_mark_post_is_read_outside_current_page(self):
+        self.client.login(username='User1', password='pass')
+        url = reverse('blog:feed') + '?before=bad-cursor'
+        resp = self.client.post(url, {'feeds': [3]})
+
+        self.assertTrue(Feed.objects.get(pk=3).is_read)
+        self.assertRedirects(resp, url)
+
 
 class BlogsViewTest(TestCase):
     fixtures = ['initial_data.json']
@@ -164,11 +224,56 @@ class BlogsViewTest(TestCase):
         self.assertEqual(len(feed), 7)
         self.assertEqual(feed.first().post.title, 'Test post 10')
         self.assertRedirects(resp, reverse('blog:blogs'))
+        self.assertEqual(Blog.objects.get(pk=4).subscriber_count, 1)
+
+    def test_directory_is_sorted_by_popularity(self):
+        Blog.objects.filter(pk=4).update(subscriber_count=5)
+        self.client.login(username='User1', password='pass')
+        resp = self.client.get(reverse('blog:blogs'))
+        self.assertEqual([blog.pk for blog in resp.context['form'].page], [4])
+        self.assertContains(resp, '5 subscribers · 1 post')
+
+        self.client.login(username='User3', password='pass')
+        resp = self.client.get(reverse('blog:blogs'), {'order': 'posts'})
+        self.assertEqual([blog.pk for blog in resp.context['form'].page], [2, 1, 4])
+
+    def test_directory_is_paginated(self):
+        self.client.login(username='User4', password='pass')
+        with self.settings(BLOGS_PAGE_SIZE=2):
+            resp = self.client.get(reverse('blog:blogs'), {'order': 'posts'})
+            page = resp.context['form'].page
+            self.assertEqual([blog.pk for blog in page], [3, 2])
+            self.assertContains(resp, f'order=posts&before={page.older_cursor}')
+
+            resp = self.client.get(reverse('blog:blogs'), {'order': 'posts', 'before': page.older_cursor})
+            self.assertEqual([blog.pk for blog in resp.context['form'].page], [1])
+
+    def test_directory_searches_author_prefix(self):
+        get_user_model().objects.filter(pk=3).update(username='Other')
+        self.client.login(username='User4', password='pass')
+        resp = self.client.get(reverse('blog:blogs'), {'author': 'User'})
+        self.assertEqual(sorted(blog.pk for blog in resp.context['form'].page), [1, 2])
+
+    def test_subscribes_to_blog_outside_current_page(self):
+        self.client.login(username='User4', password='pass')
+        with self.settings(BLOGS_PAGE_SIZE=1):
+            self.client.post(reverse('blog:blogs'), {'blogs': [1, 3]})
+        self.assertEqual(sorted(Subscription.objects.filter(user_id=4).values_list('blog_id', flat=True)), [1, 3])
+
+    def test_cannot_subscribe_to_own_blog(self):
+        self.client.login(username='User1', password='pass')
+        resp = self.client.post(reverse('blog:blogs'), {'blogs': [1]})
+        self.assertFormError(resp, 'form', 'blogs', 'Select a valid choice. 1 is not one of the available choices.')
 
 
 class SubscriptionsViewTest(TestCase):
     fixtures = ['initial_data.json']
 
+    def test_unsubscribe_decrements_subscriber_count(self):
+        self.client.login(username='User1', password='pass')
+        self.client.post(reverse('blog:subscriptions'), {'subscriptions': [1]})
+        self.assertEqual(Blog.objects.get(pk=2).subscriber_count, 0)
+
     def test_redirect_if_not_logged_in(self):
         resp = self.client.get(reverse('blog:subscriptions'))
         self.assertRedirects(resp, '/admin/?next=/subscriptions/', target_status_code=302)
@@ -197,7 +302,36 @@ class SubscriptionsViewTest(TestCase):
         resp = self.client.post(reverse('blog:subscriptions'),
                                 {'subscriptions': [1]})
 
-        subscriptions = Subscription.objects.all()
+        subscriptions = Subscription.objects.filter(is_deleted=False)
         self.assertEqual(len(subscriptions), 1)
         self.assertEqual(subscriptions.first().blog.author.username, 'User3')
+        # The subscription and its feed are only deleted by the purge.
+        self.assertTrue(Subscription.objects.get(pk=1).is_deleted)
         self.assertRedirects(resp, reverse('blog:subscriptions'))
+
+
+class NotificationsViewTest(TestCase):
+    fixtures = ['initial_data.json']
+
+    def test_redirect_if_not_logged_in(self):
+        resp = self.client.get(reverse('blog:notifications'))
+        self.assertRedirects(resp, '/admin/?next=/notifications/', target_status_code=302)
+
+    def test_logged_in_uses_correct_template(self):
+        self.client.login(username='User1', password='pass')
+        resp = self.client.get(reverse('blog:notifications'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTemplateUsed(resp, 'blog/notifications.html')
+        self.assertEqual(resp.context['form'].initial['delivery'], NotificationPreference.IMMEDIATE)
+
+    def test_notifications_view_form_class_is_notification_preference_form(self):
+        notifications_view = NotificationsView()
+        self.assertEqual(notifications_view.form_class, NotificationPreferenceForm)
+
+    def test_successful_preference_change(self):
+        self.client.login(username='User1', password='pass')
+        resp = self.client.post(reverse('blog:notifications'), {'delivery': NotificationPreference.DAILY})
+
+        preference = NotificationPreference.objects.get(user__username='User1')
+        self.assertEqual(preference.delivery, NotificationPreference.DAILY)
+        self.assertRedirects(resp, reverse('blog:notifications'))
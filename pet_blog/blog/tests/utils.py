@@ -0,0 +1,18 @@
+from django.core.cache import cache
+from django.db import transaction
+
+
+class QueryBudgetMixin:
+    """Assert that a page costs a fixed number of queries however many rows it lists."""
+
+    def assertQueryBudget(self, budget, url, populate, sizes=(10, 1000)):
+        for size in sizes:
+            with self.subTest(rows=size), transaction.atomic():
+                populate(size)
+                # Budgets cover the page with warm caches, as most requests see it.
+                cache.clear()
+                self.client.get(url)
+                with self.assertNumQueries(budget):
+                    resp = self.client.get(url)
+                self.assertEqual(resp.status_code, 200)
+                transaction.set_rollback(True)
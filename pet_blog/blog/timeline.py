@@ -0,0 +1,156 @@
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from django.db import connections
+from django.db.models import BooleanField, F, OuterRef, Prefetch, Q, Subquery
+from django.db.models.expressions import RawSQL
+
+from .models import Feed, Post
+from .pagination import KeysetPage, keyset
+from .shards import feed_db, is_local
+
+
+def merge_by_posted(*streams, key=attrgetter('posted'), reverse=True):
+    """k-way merge of streams that are each sorted by ``key``, newest first unless ``reverse`` is off."""
+    return heapq.merge(*streams, key=key, reverse=reverse)
+
+
+def entry_key(entry):
+    """Position of a Feed row or a pulled Post in the feed: (posted, post id)."""
+    if isinstance(entry, Feed):
+        return entry.posted, entry.post_id
+    return entry.posted, entry.pk
+
+
+# Feed rows of live subscriptions after their read watermark that aren't marked as read.
+UNREAD = Q(is_read=False, subscription__is_deleted=False) & (
+    Q(subscription__read_until__isnull=True) | Q(posted__gt=F('subscription__read_until')))
+
+
+def after_watermarks(user, column, watermarks):
+    """
+    A condition keeping the Feed rows of ``user`` whose ``column`` is the
+    first item of one of the (id, read_until) ``watermarks`` and that were
+    posted after its read_until, if any. The watermarks are sent to the
+    user's shard as a CTE, so the condition stays the same size however many
+    there are.
+    """
+    connection = connections[feed_db(user.pk)]
+    qn = connection.ops.quote_name
+    table = qn(Feed._meta.db_table)
+    rows = ', '.join(['(%s, %s)'] * len(watermarks))
+    params = [value for pk, read_until in watermarks
+              for value in (pk, connection.ops.adapt_datetimefield_value(read_until))]
+    return RawSQL(
+        f'EXISTS (WITH watermark (id, read_until) AS (VALUES {rows}) SELECT 1 FROM watermark '
+        f'WHERE watermark.id = {table}.{qn(column)} '
+        f'AND (watermark.read_until IS NULL OR {table}.{qn("posted")} > watermark.read_until))',
+        params, output_field=BooleanField())
+
+
+def unread_feeds(user):
+    if is_local(user.pk):
+        return user.feed_set.filter(UNREAD)
+    # A remote shard can't join the subscriptions, so their watermarks are read first.
+    subscriptions = list(user.subscription_set.filter(is_deleted=False).values_list('pk', 'read_until'))
+    if not subscriptions:
+        return user.feed_set.none()
+    return user.feed_set.filter(after_watermarks(user, 'subscription_id', subscriptions), is_read=False)
+
+
+def pulled_posts(user):
+    """
+    Unread posts of the fan-out-on-read blogs ``user`` subscribes to. A post
+    drops out once it has a Feed row for the user, which is how pulled posts
+    are marked as read. The Feed rows of a remote shard can't be joined, so
+    there the read posts are left in, for unread_pulled() and pulled_count()
+    to take out.
+    """
+    # One filter() call, so the watermark is read from the user's own subscription.
+    posts = Post.objects.filter(
+        Q(blog__subscription__read_until__isnull=True) | Q(posted__gt=F('blog__subscription__read_until')),
+        blog__subscription__user=user, blog__subscription__is_deleted=False,
+        blog__fan_out_on_read=True)
+    if is_local(user.pk):
+        return posts.exclude(feed__user=user)
+    return posts
+
+
+def pulled_count(user):
+    """The number of unread pulled posts of ``user``."""
+    count = pulled_posts(user).count()
+    if is_local(user.pk) or not count:
+        return count
+    # Every Feed row of those blogs after the watermark stands for one of the posts counted.
+    watermarks = list(user.subscription_set.filter(is_deleted=False, blog__fan_out_on_read=True).values_list(
+        'blog_id', 'read_until'))
+    read = user.feed_set.filter(after_watermarks(user, 'blog_id', watermarks))
+    return count - read.values('post_id').distinct().count()
+
+
+def unread_pulled(user, posts, chunk_size, newer=False):
+    """
+    The posts of ``posts``, in keyset order, that ``user`` hasn't read, for a
+    feed on a remote shard. The shard is asked about ``chunk_size`` posts at a
+    time, so only the posts around the page are looked up.
+    """
+    chunk = list(posts[:chunk_size])
+    while chunk:
+        read = set(user.feed_set.filter(post_id__in=[post.pk for post in chunk]).values_list('post_id', flat=True))
+        yield from (post for post in chunk if post.pk not in read)
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1]
+        chunk = list(keyset(posts, ('posted', 'id'), (last.posted, last.pk), newer)[:chunk_size])
+
+
+def pulled_post_streams(user):
+    """One stream of pulled posts per blog, each served by the blog's own index."""
+    posts = pulled_posts(user)
+    blogs = user.subscription_set.filter(is_deleted=False, blog__fan_out_on_read=True).values_list(
+        'blog_id', flat=True)
+    return [posts.filter(blog_id=blog) for blog in blogs]
+
+
+def feed_page(user, page_size, cursor=None, newer=False):
+    """
+    A page of ``user``'s unread feed starting after ``cursor``. Every stream is
+    cut to one page, so a page costs the same however large the backlog is.
+    """
+    limit = page_size + 1
+    # The reverse relation sets `user` on every row, so user_id must not be deferred.
+    if is_local(user.pk):
+        feeds = unread_feeds(user).select_related('post').only('user', 'posted', 'post__title')
+    else:
+        feeds = unread_feeds(user).only('user', 'posted', 'post').prefetch_related(
+            Prefetch('post', Post.objects.only('title')))
+    pushed = keyset(feeds, ('posted', 'post_id'), cursor, newer)
+    pulled = [keyset(posts.only('title', 'posted'), ('posted', 'id'), cursor, newer)
+              for posts in pulled_post_streams(user)]
+    if is_local(user.pk):
+        pulled = [posts[:limit] for posts in pulled]
+    else:
+        pulled = [unread_pulled(user, posts, limit, newer) for posts in pulled]
+    streams = [pushed[:limit]] + pulled
+    rows = list(islice(merge_by_posted(*streams, key=entry_key, reverse=not newer), limit))
+    return KeysetPage(rows, page_size, entry_key, cursor, newer)
+
+
+def unread_count(user):
+    return unread_feeds(user).count() + pulled_count(user)
+
+
+def mark_all_read(user):
+    """Move the watermark of every subscription of ``user`` up to its blog's latest post."""
+    latest = Post.objects.filter(blog=OuterRef('blog')).order_by('-posted').values('posted')[:1]
+    return user.subscription_set.filter(is_deleted=False).update(read_until=Subquery(latest))
+
+
+def mark_pulled_read(user, posts):
+    subscriptions = dict(user.subscription_set.filter(is_deleted=False).values_list('blog_id', 'pk'))
+    return Feed.objects.using(feed_db(user.pk)).bulk_create([
+        Feed(user=user, post=post, subscription_id=subscriptions[post.blog_id], blog_id=post.blog_id,
+             posted=post.posted, is_read=True)
+        for post in posts
+    ], ignore_conflicts=True)
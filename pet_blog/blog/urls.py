@@ -1,12 +1,22 @@
 from django.urls import path
-from .views import PostListView, MyPostsView, PostDetailView, BlogsView, SubscriptionsView, FeedView
+from .syndication import AtomFeed, JsonFeed, RssFeed
+from .views import (PostListView, MyPostsView, PostDetailView, BlogsView, SubscriptionsView, FeedView,
+                    FeedStreamView, NotificationsView, BlogSyndicationView, UserSyndicationView, SearchView, ExportView)
 
 app_name = 'blog'
 urlpatterns = [
     path('', PostListView.as_view(), name='posts'),
+    path('search/', SearchView.as_view(), name='search'),
     path('post/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('my-posts/', MyPostsView.as_view(), name='my-posts'),
     path('feed/', FeedView.as_view(), name='feed'),
+    path('feed/stream/', FeedStreamView.as_view(), name='feed-stream'),
     path('blogs/', BlogsView.as_view(), name='blogs'),
-    path('subscriptions/', SubscriptionsView.as_view(), name='subscriptions')
+    path('subscriptions/', SubscriptionsView.as_view(), name='subscriptions'),
+    path('notifications/', NotificationsView.as_view(), name='notifications'),
+    path('blog/<int:pk>/rss', BlogSyndicationView.as_view(feed_class=RssFeed), name='blog-rss'),
+    path('blog/<int:pk>/atom', BlogSyndicationView.as_view(feed_class=AtomFeed), name='blog-atom'),
+    path('blog/<int:pk>/feed.json', BlogSyndicationView.as_view(feed_class=JsonFeed), name='blog-json'),
+    path('feed.xml', UserSyndicationView.as_view(), name='feed-xml'),
+    path('export/<slug:section>.<slug:kind>', ExportView.as_view(), name='export'),
 ]
@@ -1,23 +1,123 @@
+from operator import attrgetter
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
-from django.views.generic import ListView, DetailView, CreateView, FormView
-from django.urls import reverse_lazy
+from django.views.decorators.cache import cache_control
+from django.views.generic import View, ListView, DetailView, CreateView, FormView, UpdateView, TemplateView
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import reverse, reverse_lazy
 from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from . import counters
+from .asyncviews import AsyncViewMixin
+from .cache import (cache_response, feed_versions, get_or_stream, list_versions, post_versions,
+                    versioned_key, versions)
+from .conditional import conditional, make_etag, viewer
+from .export import FORMATS, SECTIONS, export, gzipped
+from .directory import ORDERS
+from .fanout import backfill_feed
+from .forms import PostForm, SubscriptionForm, UnSubscriptionForm, FeedForm, NotificationPreferenceForm
+from .models import Blog, Post, Subscription, NotificationPreference
+from .pagination import KeysetPage, keyset, request_cursor
+from .search import SearchPage, decode_cursor
+from .stream import catch_up, last_event_id
+from .syndication import RssFeed, feed_token, post_item, user_for_token
+from .timeline import mark_all_read, mark_pulled_read, unread_feeds
+
+
+def post_list_versions(request):
+    blog = request.GET.get('blog', '')
+    return list_versions(int(blog) if blog.isdigit() else None)
+
+
+def post_detail_versions(request, pk):
+    return post_versions(pk)
+
+
+def post_list_etag(request):
+    return make_etag(versions(*post_list_versions(request)), *viewer(request))
+
 
-from .forms import PostForm, SubscriptionForm, UnSubscriptionForm, FeedForm
-from .models import Blog, Post, Feed, Subscription
+def post_detail_etag(request, pk):
+    return make_etag(versions(*post_detail_versions(request, pk)), *viewer(request))
 
 
+def feed_etag(request, *args, **kwargs):
+    user = request.user
+    # Editing a post bumps its blog's list version but not the feed version, and posts of
+    # fan-out-on-read blogs touch neither, so the latest of them is read along with the blogs.
+    latest = Post.objects.filter(blog=OuterRef('blog_id'), blog__fan_out_on_read=True).order_by(
+        '-posted').values('posted')[:1]
+    subscriptions = list(user.subscription_set.filter(is_deleted=False).annotate(
+        pulled=Subquery(latest)).values_list('blog_id', 'pulled'))
+    names = feed_versions(user.pk) + [name for blog, _ in subscriptions for name in list_versions(blog)]
+    pulled = max((posted for _, posted in subscriptions if posted is not None), default=None)
+    # The page's CSRF token is derived from the secret in the cookie.
+    return make_etag(versions(*names), pulled, request.META.get('CSRF_COOKIE'), *viewer(request))
+
+
+@method_decorator(conditional(post_list_etag), name='dispatch')
+@method_decorator(cache_response(post_list_versions), name='dispatch')
 class PostListView(ListView):
     model = Post
     template_name = 'blog/posts.html'
     context_object_name = 'posts'
 
+    def get_queryset(self):
+        posts = Post.objects.only('title', 'posted')
+        self.blog = None
+        blog = self.request.GET.get('blog')
+        if blog is not None:
+            if not blog.isdigit():
+                raise Http404('Invalid blog')
+            self.blog = get_object_or_404(Blog.objects.select_related('author'), pk=blog)
+            posts = posts.filter(blog=self.blog)
+        return posts
+
+    def get_paginate_by(self, queryset):
+        return settings.POSTS_PAGE_SIZE
 
+    def paginate_queryset(self, queryset, page_size):
+        cursor, newer = request_cursor(self.request)
+        rows = list(keyset(queryset, ('posted', 'id'), cursor, newer)[:page_size + 1])
+        page = KeysetPage(rows, page_size, attrgetter('posted', 'pk'), cursor, newer)
+        return None, page, page.items, page.has_older or page.has_newer
+
+    def get_context_data(self, **kwargs):
+        kwargs['blog'] = self.blog
+        # Page links keep the other parameters, such as the blog filter.
+        query = self.request.GET.copy()
+        for name in ('before', 'after'):
+            query.pop(name, None)
+        kwargs['query'] = query.urlencode()
+        kwargs['cache_version'] = versions(*post_list_versions(self.request))
+        kwargs['cache_timeout'] = settings.PAGE_CACHE_TIMEOUT
+        return super(PostListView, self).get_context_data(**kwargs)
+
+
+class SearchView(TemplateView):
+    template_name = 'blog/search.html'
+
+    def get_context_data(self, **kwargs):
+        kwargs['q'] = q = self.request.GET.get('q', '').strip()
+        kwargs['page'] = SearchPage(q, settings.SEARCH_PAGE_SIZE, decode_cursor(self.request.GET.get('after')))
+        return super(SearchView, self).get_context_data(**kwargs)
+
+
+@method_decorator(conditional(post_detail_etag), name='dispatch')
+@method_decorator(cache_response(post_detail_versions), name='dispatch')
 class PostDetailView(DetailView):
     model = Post
     context_object_name = 'post'
 
+    def get_context_data(self, **kwargs):
+        kwargs['cache_version'] = versions(*post_versions(self.object.pk))
+        kwargs['cache_timeout'] = settings.PAGE_CACHE_TIMEOUT
+        return super(PostDetailView, self).get_context_data(**kwargs)
+
 
 @method_decorator(login_required(login_url=reverse_lazy('admin:index')), name='dispatch')
 class MyPostsView(CreateView):
@@ -28,7 +128,7 @@ class MyPostsView(CreateView):
 
     def get_context_data(self, **kwargs):
         user = self.request.user
-        kwargs['posts'] = Post.objects.filter(blog__author=user)
+        kwargs['posts'] = Post.objects.filter(blog__author=user).only('title', 'posted')
         return super(MyPostsView, self).get_context_data(**kwargs)
 
     def form_valid(self, form):
@@ -37,6 +137,7 @@ class MyPostsView(CreateView):
 
 
 @method_decorator(login_required(login_url=reverse_lazy('admin:index')), name='dispatch')
+@method_decorator(conditional(feed_etag), name='dispatch')
 class FeedView(FormView):
     template_name = 'blog/feed.html'
     form_class = FeedForm
@@ -46,14 +147,63 @@ class FeedView(FormView):
         form_class = self.get_form_class()
         return form_class(self.request.user, **self.get_form_kwargs())
 
+    def get_form_kwargs(self):
+        kwargs = super(FeedView, self).get_form_kwargs()
+        kwargs['cursor'], kwargs['newer'] = request_cursor(self.request)
+        return kwargs
+
+    def get_success_url(self):
+        # Stay on the page the entries were marked on.
+        return self.request.get_full_path()
+
+    def get_context_data(self, **kwargs):
+        kwargs['feed_token'] = feed_token(self.request.user)
+        return super(FeedView, self).get_context_data(**kwargs)
+
+    def post(self, request, *args, **kwargs):
+        if 'mark_all' in request.POST:
+            mark_all_read(request.user)
+            counters.refresh(request.user)
+            return HttpResponseRedirect(reverse('blog:feed'))
+        return super(FeedView, self).post(request, *args, **kwargs)
+
     def form_valid(self, form):
-        feeds = form.cleaned_data['feeds']
-        for feed in feeds:
-            feed.is_read = True
-        Feed.objects.bulk_update(feeds, ['is_read'])
+        user = self.request.user
+        read = form.cleaned_data['feeds'].update(is_read=True)
+        counters.adjust([user.pk], -read)
+        if mark_pulled_read(user, form.cleaned_data['posts']):
+            counters.invalidate([user.pk])
         return super().form_valid(form)
 
 
+@method_decorator(login_required(login_url=reverse_lazy('admin:index')), name='dispatch')
+class FeedStreamView(View):
+    """
+    The feed stream under WSGI, which can't keep a connection per reader:
+    it answers at once with the entries after Last-Event-ID, and the browser
+    reconnects for more. Under ASGI, blog.stream.FeedStreamApp answers and
+    keeps the stream open instead.
+    """
+
+    def get(self, request):
+        body = catch_up(request.user, last_event_id(request.headers.get('Last-Event-ID')))
+        response = HttpResponse(body, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class AsyncPostListView(AsyncViewMixin, PostListView):
+    pass
+
+
+class AsyncPostDetailView(AsyncViewMixin, PostDetailView):
+    pass
+
+
+class AsyncFeedView(AsyncViewMixin, FeedView):
+    pass
+
+
 @method_decorator(login_required(login_url=reverse_lazy('admin:index')), name='dispatch')
 class BlogsView(FormView):
     template_name = 'blog/blogs.html'
@@ -64,18 +214,44 @@ class BlogsView(FormView):
         form_class = self.get_form_class()
         return form_class(self.request.user, **self.get_form_kwargs())
 
+    def get_order(self):
+        order = self.request.GET.get('order')
+        return order if order in ORDERS else 'subscribers'
+
+    def get_form_kwargs(self):
+        kwargs = super(BlogsView, self).get_form_kwargs()
+        kwargs['cursor'], kwargs['newer'] = request_cursor(self.request, parse=int)
+        kwargs['order'] = self.get_order()
+        kwargs['author'] = self.request.GET.get('author', '').strip()
+        return kwargs
+
+    def get_success_url(self):
+        return self.request.get_full_path()
+
+    def get_context_data(self, **kwargs):
+        kwargs['order'] = self.get_order()
+        kwargs['author'] = self.request.GET.get('author', '').strip()
+        # Page links keep the search and the order.
+        query = self.request.GET.copy()
+        for name in ('before', 'after'):
+            query.pop(name, None)
+        kwargs['query'] = query.urlencode()
+        return super(BlogsView, self).get_context_data(**kwargs)
+
     @transaction.atomic
     def form_valid(self, form):
         user = self.request.user
         blogs = form.cleaned_data['blogs']
 
+        counters.adjust_subscribers([blog.pk for blog in blogs], 1)
         for blog in blogs:
-            subscription = Subscription(user=user, blog=blog)
-            subscription.save()
-
-            posts = Post.objects.filter(blog=blog)
-            Feed.objects.bulk_create(
-                [Feed(user=user, post=post, subscription=subscription) for post in posts])
+            # Subscribing again revives the tombstone along with the Feed rows not purged yet.
+            subscription, created = Subscription.objects.update_or_create(
+                user=user, blog=blog, defaults={'is_deleted': False})
+            if not created:
+                counters.adjust([user.pk], unread_feeds(user).filter(subscription=subscription).count())
+            backfill_feed(subscription)
+        counters.invalidate([user.pk])
         return super().form_valid(form)
 
 
@@ -90,6 +266,117 @@ class SubscriptionsView(FormView):
         return form_class(self.request.user, **self.get_form_kwargs())
 
     def form_valid(self, form):
+        user = self.request.user
         subscriptions = form.cleaned_data['subscriptions']
-        subscriptions.delete()
+        # The feed may be on another database, so the ids are sent rather than a subquery.
+        ids = [subscription.pk for subscription in subscriptions]
+        unread = unread_feeds(user).filter(subscription__in=ids).count()
+        counters.adjust_subscribers(list(subscriptions.values_list('blog_id', flat=True)), -1)
+        subscriptions.update(is_deleted=True)
+        counters.adjust([user.pk], -unread)
+        counters.invalidate([user.pk])
         return super().form_valid(form)
+
+
+@method_decorator(login_required(login_url=reverse_lazy('admin:index')), name='dispatch')
+class NotificationsView(UpdateView):
+    template_name = 'blog/notifications.html'
+    form_class = NotificationPreferenceForm
+    success_url = reverse_lazy('blog:notifications')
+
+    def get_object(self, queryset=None):
+        user = self.request.user
+        return NotificationPreference.objects.filter(user=user).first() or NotificationPreference(user=user)
+
+
+def blog_syndication_etag(request, pk):
+    return make_etag(versions(*list_versions(pk)))
+
+
+@method_decorator(conditional(blog_syndication_etag), name='dispatch')
+class BlogSyndicationView(View):
+    feed_class = RssFeed
+
+    def get(self, request, pk):
+        blog = get_object_or_404(Blog.objects.select_related('author'), pk=pk)
+
+        def stream():
+            posts = list(keyset(Post.objects.filter(blog=blog), ('posted', 'id'))[:settings.SYNDICATION_POSTS])
+            feed = self.feed_class(
+                title=f'{blog} on Pet-Blog',
+                link=request.build_absolute_uri(f"{reverse('blog:posts')}?blog={blog.pk}"),
+                description=f'The latest posts by {blog}',
+                feed_url=request.build_absolute_uri(request.path),
+                latest=posts[0].posted if posts else None,
+            )
+            return feed.stream(post_item(request, post, blog) for post in posts)
+
+        key = versioned_key(f'syndication:{self.feed_class.__name__}:{request.get_host()}:{pk}', list_versions(pk))
+        return StreamingHttpResponse(get_or_stream(key, stream, settings.PAGE_CACHE_TIMEOUT),
+                                     content_type=self.feed_class.content_type)
+
+
+def user_syndication(request):
+    """
+    The user authenticated by the ``token`` parameter, the blogs they
+    subscribe to, and the versions their /feed.xml depends on.
+    """
+    if not hasattr(request, 'syndication'):
+        user = user_for_token(request.GET.get('token'))
+        blogs, names = [], []
+        if user is not None:
+            blogs = list(user.subscription_set.filter(is_deleted=False).values_list('blog_id', flat=True))
+            names = feed_versions(user.pk) + [name for blog in blogs for name in list_versions(blog)]
+        request.syndication = user, blogs, names
+    return request.syndication
+
+
+def user_syndication_etag(request):
+    user, blogs, names = user_syndication(request)
+    return make_etag(versions(*names)) if user is not None else None
+
+
+@method_decorator(cache_control(private=True), name='dispatch')
+@method_decorator(conditional(user_syndication_etag), name='dispatch')
+class UserSyndicationView(View):
+    def get(self, request):
+        user, blogs, names = user_syndication(request)
+        if user is None:
+            return HttpResponseForbidden()
+
+        def stream():
+            posts = list(keyset(Post.objects.filter(blog_id__in=blogs).select_related('blog__author'),
+                                ('posted', 'id'))[:settings.SYNDICATION_POSTS])
+            feed = RssFeed(
+                title=f'Feed of {user.get_username()} on Pet-Blog',
+                link=request.build_absolute_uri(reverse('blog:feed')),
+                description='The latest posts of the blogs you subscribe to',
+                feed_url=request.build_absolute_uri(),
+                latest=posts[0].posted if posts else None,
+            )
+            return feed.stream(post_item(request, post, post.blog) for post in posts)
+
+        key = versioned_key(f'syndication:user:{request.get_host()}:{user.pk}', names)
+        return StreamingHttpResponse(get_or_stream(key, stream, settings.PAGE_CACHE_TIMEOUT),
+                                     content_type=RssFeed.content_type)
+
+
+@method_decorator(login_required(login_url=reverse_lazy('admin:index')), name='dispatch')
+class ExportView(View):
+    """
+    Download the user's posts, feed or subscriptions, or all of them as
+    NDJSON, streamed as they are read. ``?gzip=1`` compresses the download.
+    """
+
+    def get(self, request, section, kind):
+        sections = list(SECTIONS) if section == 'all' and kind == 'ndjson' else [section]
+        if kind not in FORMATS or not set(sections) <= set(SECTIONS):
+            raise Http404('Unknown export')
+        filename = f'pet-blog-{section}.{kind}'
+        chunks = export(request.user, kind, sections)
+        content_type = FORMATS[kind]
+        if request.GET.get('gzip'):
+            chunks, content_type, filename = gzipped(chunks), 'application/gzip', f'{filename}.gz'
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
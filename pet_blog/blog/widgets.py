@@ -3,3 +3,11 @@ from django import forms
 
 class FeedWidget(forms.CheckboxSelectMultiple):
     option_template_name = 'blog/widgets/feed_option.html'
+
+
+class PostWidget(FeedWidget):
+    option_template_name = 'blog/widgets/post_option.html'
+
+
+class BlogWidget(forms.CheckboxSelectMultiple):
+    option_template_name = 'blog/widgets/blog_option.html'
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pet_blog.settings')
 
-application = get_asgi_application()
+# What get_asgi_application() does, with the handler serving the async views.
+django.setup(set_prefix=False)
+
+# Imported once the apps are loaded.
+from blog.asyncviews import AsyncViewsHandler  # noqa: E402
+from blog.stream import FeedStreamApp  # noqa: E402
+
+application = FeedStreamApp(AsyncViewsHandler())
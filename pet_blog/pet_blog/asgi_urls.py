@@ -0,0 +1,8 @@
+from django.contrib import admin
+from django.urls import path, include
+
+# The URLconf of the ASGI application: the same as pet_blog.urls, with some of the blog's pages as async views.
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include('blog.asgi_urls')),
+]
@@ -41,7 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'blog.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,6 +54,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'pet_blog.urls'
 
+# Used instead of ROOT_URLCONF by the ASGI application
+ASGI_URLCONF = 'pet_blog.asgi_urls'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -63,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'blog.context_processors.unread_count',
             ],
         },
     },
@@ -80,6 +86,55 @@ DATABASES = {
     }
 }
 
+# Read-only copies of the primary database, kept up to date outside Django (e.g. by Litestream),
+# as a comma-separated list of SQLite files. Safe requests read from them unless the user wrote
+# something in the last REPLICA_PIN_SECONDS seconds.
+REPLICA_DATABASES = []
+for number, name in enumerate(filter(None, environ.get('DATABASE_REPLICAS', default='').split(',')), 1):
+    REPLICA_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_PIN_SECONDS = int(environ.get('REPLICA_PIN_SECONDS', default=5))
+
+# Feed rows are spread by user over the primary database and the comma-separated list of
+# SQLite files FEED_SHARDS. Users are assigned to shards by id modulo their number, so it can't
+# change once feeds are stored.
+FEED_SHARDS = ['default']
+for number, name in enumerate(filter(None, environ.get('FEED_SHARDS', default='').split(',')), 1):
+    FEED_SHARDS.append(f'feed{number}')
+    DATABASES[f'feed{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name.strip(),
+    }
+DATABASE_ROUTERS = ['blog.routers.FeedShardRouter', 'blog.routers.ReplicaRouter']
+
+# SQLite tuned for concurrent requests, used by the primary database and the feed shards when
+# SQLITE_PRODUCTION is set: a WAL journal lets reads run alongside the writer, transactions take
+# the write lock as they begin and wait up to SQLITE_BUSY_TIMEOUT ms for it, and connections are
+# kept for CONN_MAX_AGE seconds instead of being opened for every request.
+SQLITE_PRODUCTION = int(environ.get('SQLITE_PRODUCTION', default=0))
+SQLITE_PRODUCTION_PROFILE = {
+    'ENGINE': 'pet_blog.sqlite',
+    'CONN_MAX_AGE': int(environ.get('CONN_MAX_AGE', default=600)),
+    'OPTIONS': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': int(environ.get('SQLITE_BUSY_TIMEOUT', default=5000)),
+            'mmap_size': int(environ.get('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024)),
+            # Negative sizes are in KiB.
+            'cache_size': -int(environ.get('SQLITE_CACHE_KB', default=64 * 1024)),
+        },
+        'transaction_mode': 'IMMEDIATE',
+    },
+}
+if SQLITE_PRODUCTION:
+    for alias in FEED_SHARDS:
+        DATABASES[alias].update(SQLITE_PRODUCTION_PROFILE)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -122,3 +177,74 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Console email backend
 # https://docs.djangoproject.com/en/4.0/topics/email/#console-backend
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Message broker for post-publish side effects
+# blog.messaging.db.DatabaseBroker keeps messages in the database until `manage.py run_worker` delivers them,
+# blog.messaging.local.ThreadPoolBroker delivers them in-process (development only).
+MESSAGE_BROKER = environ.get('MESSAGE_BROKER', default='blog.messaging.db.DatabaseBroker')
+MESSAGE_BROKER_WORKERS = int(environ.get('MESSAGE_BROKER_WORKERS', default=4))
+MESSAGE_LEASE_SECONDS = 60
+MESSAGE_MAX_ATTEMPTS = 5
+MESSAGE_RETRY_DELAY = 5
+
+# New post notifications are sent over one connection in batches
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_MAX_RETRIES = 3
+NOTIFICATION_RETRY_DELAY = 1
+
+# Posts of blogs with more subscribers than this are merged into feeds when they are read
+# instead of being copied into every subscriber's feed
+FEED_FANOUT_THRESHOLD = int(environ.get('FEED_FANOUT_THRESHOLD', default=10000))
+
+# History copied into the feed on subscribe: the latest FEED_BACKFILL_POSTS posts, of the last
+# FEED_BACKFILL_DAYS days unless it is 0. With FEED_BACKFILL_ASYNC the worker then copies
+# the rest, FEED_BACKFILL_BATCH_SIZE posts at a time.
+FEED_BACKFILL_POSTS = int(environ.get('FEED_BACKFILL_POSTS', default=50))
+FEED_BACKFILL_DAYS = int(environ.get('FEED_BACKFILL_DAYS', default=0))
+FEED_BACKFILL_ASYNC = int(environ.get('FEED_BACKFILL_ASYNC', default=0))
+FEED_BACKFILL_BATCH_SIZE = 1000
+
+# Number of entries on a page of the feed
+FEED_PAGE_SIZE = int(environ.get('FEED_PAGE_SIZE', default=50))
+
+# Number of posts on a page of the home page
+POSTS_PAGE_SIZE = int(environ.get('POSTS_PAGE_SIZE', default=50))
+
+# Number of blogs on a page of the blog directory
+BLOGS_PAGE_SIZE = int(environ.get('BLOGS_PAGE_SIZE', default=50))
+
+# Number of results on a page of the search
+SEARCH_PAGE_SIZE = int(environ.get('SEARCH_PAGE_SIZE', default=20))
+
+# Number of posts in the RSS, Atom and JSON feeds
+SYNDICATION_POSTS = int(environ.get('SYNDICATION_POSTS', default=20))
+
+# Threads running the async views under ASGI (see blog.asyncviews).
+ASYNC_VIEW_THREADS = int(environ.get('ASYNC_VIEW_THREADS', default=32))
+
+# Feed streams (/feed/stream/): the hub telling them about new entries, which polls the database every
+# FEED_HUB_POLL_SECONDS; use blog.hub.local.LocalHub when posts are fanned out by the web process itself.
+# Idle streams send a heartbeat every FEED_STREAM_HEARTBEAT seconds, and browsers reconnect after
+# FEED_STREAM_RETRY seconds.
+FEED_HUB = environ.get('FEED_HUB', default='blog.hub.db.DatabaseHub')
+FEED_HUB_POLL_SECONDS = int(environ.get('FEED_HUB_POLL_SECONDS', default=2))
+FEED_STREAM_HEARTBEAT = int(environ.get('FEED_STREAM_HEARTBEAT', default=15))
+FEED_STREAM_RETRY = int(environ.get('FEED_STREAM_RETRY', default=5))
+
+# Seconds an unread count is cached for. Posts merged in at read time can take this long to be counted.
+UNREAD_COUNT_TIMEOUT = 300
+
+# Cache shared by the web and worker processes. Use a cache every process can reach, such as
+# django.core.cache.backends.filebased.FileBasedCache, when running more than one.
+CACHES = {
+    'default': {
+        'BACKEND': environ.get('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': environ.get('CACHE_LOCATION', default=''),
+    }
+}
+
+# Public post pages are cached for PAGE_CACHE_TIMEOUT seconds, or until one of their posts changes.
+# A process rendering a missing page makes the others wait up to PAGE_CACHE_LOCK_TIMEOUT seconds.
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = int(environ.get('PAGE_CACHE_TIMEOUT', default=600))
+PAGE_CACHE_LOCK_TIMEOUT = 10
@@ -0,0 +1,33 @@
+from django.db.backends.sqlite3 import base
+
+# Options of this backend that are not sqlite3.connect() arguments.
+OPTIONS = ('pragmas', 'transaction_mode')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    The SQLite backend with two more OPTIONS: ``pragmas``, a dict of PRAGMA
+    statements run on every new connection, and ``transaction_mode``, such as
+    'IMMEDIATE', used to begin the transactions of atomic blocks.
+
+    A deferred transaction that reads first and then writes fails at once
+    with "database is locked" if another connection committed meanwhile;
+    an IMMEDIATE one takes the write lock when it begins, so it waits up to
+    busy_timeout for its turn instead.
+    """
+
+    def get_connection_params(self):
+        params = super(DatabaseWrapper, self).get_connection_params()
+        for name in OPTIONS:
+            params.pop(name, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')